@@ -1,18 +1,45 @@
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from typing import Optional
+from typing import NamedTuple, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import time
 
 # Change these in production!
 SECRET_KEY = "your-secret-key-here"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt work factor. Pinning min and max to the same value makes
+# needs_update() flag hashes made with any other factor, so they are
+# rehashed on the next successful login.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_rehash(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and, if the stored hash uses an outdated scheme or
+    work factor, return a fresh hash to store: (valid, new_hash or None).
+    """
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
 def get_password_hash(password):
     return pwd_context.hash(password)
 
@@ -24,4 +51,79 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt 
\ No newline at end of file
+    return encoded_jwt 
+
+def decode_access_token(token: str) -> dict:
+    """Verify the token signature and expiry and return its claims. Raises JWTError."""
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+class Principal(NamedTuple):
+    """The authenticated user behind a request."""
+    username: str
+    user_id: int
+
+class PrincipalCache:
+    """
+    LRU of verified token -> Principal, keyed by the token's sha256.
+    Entries live for at most ttl seconds and never past the token's own
+    expiry, so an expired token is always re-verified (and rejected).
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @classmethod
+    def from_env(cls) -> "PrincipalCache":
+        return cls(
+            max_entries=int(os.environ.get("PRINCIPAL_CACHE_SIZE", "10000")),
+            ttl=float(os.environ.get("PRINCIPAL_CACHE_TTL", "300")),
+        )
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Principal]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            principal, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return principal
+
+    def put(self, token: str, principal: Principal, token_expires_at: float) -> None:
+        expires_at = min(token_expires_at, time.time() + self.ttl)
+        with self._lock:
+            self._entries[self._key(token)] = (principal, expires_at)
+            self._entries.move_to_end(self._key(token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
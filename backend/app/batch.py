@@ -0,0 +1,121 @@
+import asyncio
+import json
+import zipfile
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from .options import QRCodeOptions
+
+options_list = TypeAdapter(List[QRCodeOptions])
+
+
+class BatchInputError(Exception):
+    """Raised when a batch body cannot be parsed into QRCodeOptions."""
+
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+def _errors(error: ValidationError) -> list:
+    # Without ctx and input, which may hold exceptions or bytes that cannot be sent as JSON
+    return error.errors(include_url=False, include_context=False, include_input=False)
+
+
+def parse_batch(body: bytes, content_type: str) -> List[QRCodeOptions]:
+    """
+    Parse a batch body: NDJSON (one options object per line) when the
+    content type says so, otherwise a JSON array or {"items": [...]}.
+    """
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        items = []
+        for line_number, line in enumerate(body.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(QRCodeOptions.model_validate_json(line))
+            except ValidationError as e:
+                raise BatchInputError({"line": line_number, "errors": _errors(e)})
+        return items
+
+    try:
+        data = json.loads(body or b"null")
+    except ValueError:
+        raise BatchInputError("Body must be a JSON array or NDJSON")
+    if isinstance(data, dict):
+        data = data.get("items")
+    try:
+        return options_list.validate_python(data)
+    except ValidationError as e:
+        raise BatchInputError(_errors(e))
+
+
+async def render_unordered(
+    items: List[QRCodeOptions],
+    render: Callable[[QRCodeOptions], Awaitable[bytes]],
+    window: int,
+) -> AsyncIterator[Tuple[int, Optional[bytes], Optional[str]]]:
+    """
+    Render items with at most window renders in flight, yielding
+    (index, png, error) as each one finishes rather than in input order.
+    """
+    async def render_one(index: int, options: QRCodeOptions):
+        try:
+            return index, await render(options), None
+        except Exception as e:
+            return index, None, getattr(e, "detail", None) or "QR generation failed"
+
+    pending = set()
+    queued = iter(enumerate(items))
+    try:
+        while True:
+            for index, options in queued:
+                pending.add(asyncio.ensure_future(render_one(index, options)))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class ZipStream:
+    """
+    Write-only, non-seekable file object for zipfile.
+
+    zipfile falls back to data descriptors when it cannot seek, so entries
+    can be sent as soon as they are written; drain() returns the bytes
+    produced since the last call.
+    """
+
+    def __init__(self):
+        # One buffer rather than a list of writes: zipfile writes headers
+        # and the central directory in many small pieces
+        self._buffer = bytearray()
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def open_zip(stream: ZipStream) -> zipfile.ZipFile:
+    # PNGs are already deflated, so storing them avoids a pointless second pass
+    return zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_STORED)
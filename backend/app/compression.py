@@ -0,0 +1,141 @@
+"""
+Negotiated response compression.
+
+Compresses text-like responses (JSON, NDJSON, SVG) with brotli or gzip,
+whichever the client prefers in Accept-Encoding, once they reach
+minimum_size bytes. PNG, WebP and ZIP bodies are already compressed and
+pass through untouched. Streamed responses are compressed chunk by chunk
+and flushed after each one, so NDJSON results still arrive as they are
+produced.
+"""
+import zlib
+from typing import Optional
+
+import brotli
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "image/svg+xml", "text/")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header, or None for identity."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    best = max(("br", "gzip"), key=lambda coding: weights.get(coding, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            # wbits 16+ writes a gzip header and trailer
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._brotli = None
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + (self._brotli.flush() if flush else b"")
+        return self._zlib.compress(data) + (self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else b"")
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """ASGI middleware applying negotiated brotli/gzip compression to responses."""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+
+        start = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                response_headers = {key.lower(): value for key, value in message.get("headers", [])}
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                compressible = content_type.startswith(COMPRESSIBLE_TYPES)
+                if compressible:
+                    message = {**message, "headers": _with_vary(message.get("headers", []))}
+                if encoding is None or not compressible or b"content-encoding" in response_headers:
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held back until the first body chunk shows whether it is worth compressing
+                    start = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                if not more_body:
+                    data = compressor.finish(body)
+                    await send(_compressed_start(start, encoding, len(data)))
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send(_compressed_start(start, encoding))
+
+            data = compressor.compress(body, flush=True) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _with_vary(headers: list) -> list:
+    vary = [value for key, value in headers if key.lower() == b"vary"]
+    if any(b"accept-encoding" in value.lower() for value in vary):
+        return headers
+    return [(key, value) for key, value in headers if key.lower() != b"vary"] + [
+        (b"vary", b", ".join(vary + [b"Accept-Encoding"]))
+    ]
+
+
+def _compressed_start(start: dict, encoding: str, length: Optional[int] = None) -> dict:
+    headers = []
+    for key, value in start.get("headers", []):
+        name = key.lower()
+        if name == b"content-length":
+            continue
+        if name == b"etag" and not value.startswith(b"W/"):
+            # The compressed bytes differ, so the tag can only match weakly
+            value = b"W/" + value
+        headers.append((key, value))
+    headers.append((b"content-encoding", encoding.encode()))
+    if length is not None:
+        headers.append((b"content-length", str(length).encode()))
+    return {**start, "headers": headers}
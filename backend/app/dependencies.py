@@ -0,0 +1,68 @@
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError
+
+from . import db as database
+from . import metrics, services
+from .auth import Principal, decode_access_token
+from .db import ConnectionPool
+from .queries import fetch_user_id
+
+# Database connection pool
+def get_db() -> ConnectionPool:
+    """Return the application-wide connection pool created at startup."""
+    return database.pool
+
+# OAuth2 scheme for token handling
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+# Function to decode and verify JWT token
+async def get_current_user(token: str = Depends(oauth2_scheme), db: ConnectionPool = Depends(get_db)) -> Principal:
+    """
+    Verify and decode JWT token to get current user
+    Args:
+        token: JWT token from request
+    Returns:
+        Principal: username and user id from the token
+    Raises:
+        HTTPException: If token is invalid or expired
+    """
+    principal = services.principal_cache.get(token)
+    if principal is not None:
+        return principal
+
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        # Decode JWT token
+        with metrics.stage("jwt_decode"):
+            payload = decode_access_token(token)
+    except JWTError:
+        raise credentials_exception
+    username: str = payload.get("sub")
+    if username is None:
+        raise credentials_exception
+
+    user_id = payload.get("uid")
+    if user_id is None:
+        # Tokens issued before the uid claim was added
+        user_id = await db.run(fetch_user_id, username)
+        if user_id is None:
+            raise credentials_exception
+
+    principal = Principal(username, user_id)
+    services.principal_cache.put(token, principal, payload["exp"])
+    return principal
+
+async def render_user(current_user: Principal = Depends(get_current_user)) -> Principal:
+    """The current user, once a token has been taken from their render budget."""
+    await services.rate_limiter.check("render", str(current_user.user_id))
+    return current_user
+
+async def api_user(current_user: Principal = Depends(get_current_user)) -> Principal:
+    """The current user, once a token has been taken from their API budget."""
+    await services.rate_limiter.check("api", str(current_user.user_id))
+    return current_user
@@ -0,0 +1,214 @@
+"""
+Vectorized QR module renderer.
+
+StyledPilImage draws every module with its own Python-level drawer call
+and then recolours the canvas pixel by pixel. Here each drawer paints a
+small bank of single-module sprites once (one per N/E/S/W neighbour
+combination), the module matrix is turned into sprite indices with NumPy,
+and the sprites are composited in a single array assignment. The
+greyscale coverage canvas is coloured with one lookup-table pass.
+"""
+from types import SimpleNamespace
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+from qrcode.main import ActiveWithNeighbors
+
+# Canvas values: modules are painted 0 on a 255 background, so a pixel's
+# coverage is (255 - value) / 255.
+PAINT = 0
+BACKGROUND = 255
+
+# Sprites are painted at this module offset (see build_sprites)
+SPRITE_OFFSET_MODULES = 4
+
+
+class _SpriteImage:
+    """Just enough of StyledPilImage for a module drawer to paint one module."""
+
+    mode = "L"
+    paint_color = PAINT
+
+    def __init__(self, box_size: int, size: int):
+        self.box_size = box_size
+        self.color_mask = SimpleNamespace(back_color=BACKGROUND)
+        self._img = Image.new(self.mode, (size, size), BACKGROUND)
+
+
+def neighbor_codes(modules: np.ndarray) -> np.ndarray:
+    """Encode each module's N/E/S/W neighbours as a 4-bit sprite index."""
+    padded = np.pad(modules, 1, constant_values=False)
+    north = padded[:-2, 1:-1]
+    east = padded[1:-1, 2:]
+    south = padded[2:, 1:-1]
+    west = padded[1:-1, :-2]
+    return (
+        (north.astype(np.uint8) << 3)
+        | (east.astype(np.uint8) << 2)
+        | (south.astype(np.uint8) << 1)
+        | west.astype(np.uint8)
+    )
+
+
+def eye_mask(width: int) -> np.ndarray:
+    """Boolean matrix of the three 7x7 finder patterns, as StyledPilImage.is_eye."""
+    mask = np.zeros((width, width), dtype=bool)
+    mask[:7, :7] = True
+    mask[:7, width - 7:] = True
+    mask[width - 7:, :7] = True
+    return mask
+
+
+def build_sprites(drawer, box_size: int) -> np.ndarray:
+    """
+    Paint one active module for every neighbour combination.
+
+    Returns a (16, box_size, box_size) uint8 array indexed by neighbor_codes().
+    Drawers that ignore neighbours are painted once and repeated.
+    """
+    # Paint away from the origin: drawers such as GappedSquareModuleDrawer use
+    # float insets, and their rounding matches real module positions only
+    # once the coordinates are a few pixels in (the default border is 4).
+    offset = SPRITE_OFFSET_MODULES * box_size
+    region = (offset, offset, offset + box_size, offset + box_size)
+    canvas = _SpriteImage(box_size, offset + box_size)
+    drawer.initialize(img=canvas)
+    box = ((offset, offset), (offset + box_size - 1, offset + box_size - 1))
+    codes = range(16) if drawer.needs_neighbors else range(1)
+    sprites = []
+    for code in codes:
+        canvas._img.paste(BACKGROUND, region)
+        north, east, south, west = (bool(code & bit) for bit in (8, 4, 2, 1))
+        drawer.drawrect(
+            box,
+            ActiveWithNeighbors(False, north, False, west, True, east, False, south, False),
+        )
+        sprites.append(np.asarray(canvas._img.crop(region), dtype=np.uint8))
+    if not drawer.needs_neighbors:
+        return np.repeat(sprites[0][np.newaxis], 16, axis=0)
+    return np.stack(sprites)
+
+
+class _EyeFactory:
+    """Geometry helpers BaseEyeDrawer expects from StyledPilImage2."""
+
+    def __init__(self, width: int, box_size: int, border: int):
+        self.width = width
+        self.box_size = box_size
+        self.border = border
+
+    def pixel_box(self, row: int, col: int):
+        x = (col + self.border) * self.box_size
+        y = (row + self.border) * self.box_size
+        return (x, y), (x + self.box_size - 1, y + self.box_size - 1)
+
+
+def build_finder_pattern(eye_drawer, box_size: int) -> np.ndarray:
+    """
+    Paint one finder pattern with an eye drawer that draws whole eyes
+    (CustomEyeDrawer). On a 7-module canvas all three eyes land on the
+    same spot. Returns a (7 * box_size, 7 * box_size) uint8 array.
+    """
+    size = 7 * box_size
+    canvas = Image.new("L", (size, size), BACKGROUND)
+    eye_drawer.initialize(img=canvas)
+    eye_drawer.factory = _EyeFactory(7, box_size, 0)
+    eye_drawer.draw()
+    return np.asarray(canvas, dtype=np.uint8)
+
+
+def render_coverage(
+    modules: Sequence[Sequence[bool]],
+    dot_sprites: np.ndarray,
+    eye_sprites: Optional[np.ndarray],
+    finder_pattern: Optional[np.ndarray],
+    box_size: int,
+    border: int,
+) -> Image.Image:
+    """
+    Render the module matrix as a greyscale ("L") coverage image.
+
+    Eye modules are stamped from eye_sprites, or, for eye styles that paint
+    whole eyes, the three finder patterns are stamped from finder_pattern.
+    """
+    active = np.asarray(modules, dtype=bool)
+    width = active.shape[0]
+    codes = neighbor_codes(active)
+    eyes = eye_mask(width)
+
+    tiles = np.full((width, width, box_size, box_size), BACKGROUND, dtype=np.uint8)
+    dots = active & ~eyes
+    tiles[dots] = dot_sprites[codes[dots]]
+    if finder_pattern is None:
+        eye_modules = active & eyes
+        tiles[eye_modules] = eye_sprites[codes[eye_modules]]
+
+    size = (width + 2 * border) * box_size
+    canvas = np.full((size, size), BACKGROUND, dtype=np.uint8)
+    offset = border * box_size
+    canvas[offset:offset + width * box_size, offset:offset + width * box_size] = (
+        tiles.swapaxes(1, 2).reshape(width * box_size, width * box_size)
+    )
+    if finder_pattern is not None:
+        # Eye modules were left blank, so the patterns can be copied over
+        eye_size = 7 * box_size
+        far = offset + (width - 7) * box_size
+        for y, x in ((offset, offset), (offset, far), (far, offset)):
+            canvas[y:y + eye_size, x:x + eye_size] = finder_pattern
+    return Image.fromarray(canvas)
+
+
+def color_lut(fill_color: Tuple[int, int, int], back_color: Tuple[int, int, int]) -> list:
+    """
+    Lookup table mapping coverage values to RGB.
+
+    Mirrors QRColorMask.apply_mask: on the stock canvas a channel holds
+    roughly back * value / 255, the blend factor is averaged over the
+    non-zero background channels and the result is truncated to int.
+    """
+    lut = [[], [], []]
+    for value in range(256):
+        normed = [
+            1 - round(back * value / 255) / back for back in back_color if back
+        ]
+        norm = sum(normed) / len(normed) if normed else 1 - value / 255
+        for channel in range(3):
+            lut[channel].append(
+                int(fill_color[channel] * norm + back_color[channel] * (1 - norm))
+            )
+    return lut[0] + lut[1] + lut[2]
+
+
+def colorize(
+    coverage: Image.Image,
+    fill_color: Tuple[int, int, int],
+    back_color: Tuple[int, int, int],
+) -> Image.Image:
+    """Map coverage to RGB in one pass: painted pixels to fill, background to back."""
+    return coverage.convert("RGB").point(color_lut(fill_color, back_color))
+
+
+def palettize(
+    coverage: Image.Image,
+    fill_color: Tuple[int, int, int],
+    back_color: Tuple[int, int, int],
+) -> Image.Image:
+    """
+    Map coverage to a palette ("P") image with the same colours as colorize().
+
+    Only coverage values that occur get a palette entry, so a code drawn
+    without anti-aliasing has two colours and Pillow writes a 1-bit PNG.
+    """
+    histogram = coverage.histogram()
+    values = [value for value in range(256) if histogram[value]]
+    indices = [0] * 256
+    for index, value in enumerate(values):
+        indices[value] = index
+    lut = color_lut(fill_color, back_color)
+    palette = []
+    for value in values:
+        palette.extend((lut[value], lut[256 + value], lut[512 + value]))
+    image = Image.frombytes("P", coverage.size, coverage.point(indices).tobytes())
+    image.putpalette(palette)
+    return image
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+
+class HashQueueFull(Exception):
+    """Raised when the password hashing queue is at capacity."""
+
+
+class HashThrottled(Exception):
+    """Raised when an account or client already has too many hashes in flight."""
+
+
+class HashExecutor:
+    """
+    Runs bcrypt off the event loop on a small dedicated thread pool.
+
+    bcrypt releases the GIL while hashing, so threads are enough to keep
+    the loop responsive. mode is "thread" (default) or "inline" (hash on
+    the event loop, the previous behaviour, kept for benchmarking).
+    Admission is bounded twice: at most workers + max_queue hashes overall
+    (HashQueueFull beyond that), and at most max_per_key in flight for any
+    one key, e.g. an account (HashThrottled), so a credential-stuffing
+    burst cannot take the whole pool. key_limits overrides max_per_key by
+    key prefix: keys are "prefix:value", and client addresses ("ip:...")
+    get more room, as everyone behind one NAT or proxy shares theirs.
+    """
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        workers: Optional[int] = None,
+        max_queue: int = 32,
+        max_per_key: int = 2,
+        key_limits: Optional[Dict[str, int]] = None,
+    ):
+        if mode not in ("thread", "inline"):
+            raise ValueError(f"Unknown hash executor mode: {mode}")
+        self.mode = mode
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_queue = max_queue
+        self.max_per_key = max_per_key
+        self.key_limits = key_limits or {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._running = 0
+        self._in_flight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.completed = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.queue_wait_total = 0.0
+        self.max_queue_wait = 0.0
+
+    @classmethod
+    def from_env(cls) -> "HashExecutor":
+        workers = os.environ.get("HASH_WORKERS")
+        return cls(
+            mode=os.environ.get("HASH_EXECUTOR", "thread"),
+            workers=int(workers) if workers else None,
+            max_queue=int(os.environ.get("HASH_MAX_QUEUE", "32")),
+            max_per_key=int(os.environ.get("HASH_MAX_PER_KEY", "2")),
+            key_limits={"ip": int(os.environ.get("HASH_MAX_PER_IP", "16"))},
+        )
+
+    def start(self) -> None:
+        if self.mode == "thread":
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="hash"
+            )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _timed(self, fn: Callable, submitted_at: float, *args):
+        # Runs on the worker: the time since submission is the queue wait
+        wait = time.perf_counter() - submitted_at
+        with self._lock:
+            self.queue_wait_total += wait
+            self.max_queue_wait = max(self.max_queue_wait, wait)
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def limit(self, key: str) -> int:
+        """Hashes key may have in flight."""
+        return self.key_limits.get(key.partition(":")[0], self.max_per_key)
+
+    async def submit(self, fn: Callable, *args, keys: Iterable[str] = ()):
+        """Run fn(*args) on the hash pool, enforcing the queue and per-key bounds."""
+        keys = list(keys)
+        if any(self._in_flight.get(key, 0) >= self.limit(key) for key in keys):
+            self.throttled += 1
+            raise HashThrottled()
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HashQueueFull()
+
+        self._pending += 1
+        for key in keys:
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            if self._executor is None:
+                result = self._timed(fn, time.perf_counter(), *args)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    self._executor, self._timed, fn, time.perf_counter(), *args
+                )
+            self.completed += 1
+            return result
+        finally:
+            self._pending -= 1
+            for key in keys:
+                if self._in_flight[key] <= 1:
+                    del self._in_flight[key]
+                else:
+                    self._in_flight[key] -= 1
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "max_per_key": self.max_per_key,
+            **{f"max_per_{prefix}": limit for prefix, limit in self.key_limits.items()},
+            "pending": self._pending,
+            "queued": max(0, self._pending - self._running),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "avg_queue_wait_ms": round(self.queue_wait_total / self.completed * 1000, 1)
+            if self.completed else 0.0,
+            "max_queue_wait_ms": round(self.max_queue_wait * 1000, 1),
+        }
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is offered to a queue that is at capacity."""
+
+
+class JobLeased(Exception):
+    """
+    Raised by a job handler when another run holds the job; it is checked
+    again after retry_after seconds without counting an attempt.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler for failures that retrying cannot fix."""
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class MemoryQueue:
+    """Bounded in-process queue of job ids, for a single app process."""
+
+    def __init__(self, max_depth: int):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_depth)
+
+    async def offer(self, job_id: int) -> None:
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            raise JobQueueFull()
+
+    async def put(self, job_id: int) -> None:
+        await self._queue.put(job_id)
+
+    async def get(self) -> int:
+        return await self._queue.get()
+
+    async def depth(self) -> int:
+        return self._queue.qsize()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisQueue:
+    """
+    Job ids in a Redis list, shared by every app process pointing at the
+    same Redis. The depth bound is checked before pushing, so concurrent
+    offers can overshoot it slightly.
+    """
+
+    def __init__(self, url: str, max_depth: int, key: str = "qr:save-jobs"):
+        import redis.asyncio
+
+        self.redis = redis.asyncio.Redis.from_url(url)
+        self.max_depth = max_depth
+        self.key = key
+
+    async def offer(self, job_id: int) -> None:
+        if await self.redis.llen(self.key) >= self.max_depth:
+            raise JobQueueFull()
+        await self.redis.lpush(self.key, job_id)
+
+    async def put(self, job_id: int) -> None:
+        await self.redis.lpush(self.key, job_id)
+
+    async def get(self) -> int:
+        # Short blocking pops, so a worker cancelled at shutdown is not left
+        # waiting on the server where it could still take a job
+        while True:
+            item = await self.redis.brpop([self.key], timeout=1)
+            if item is not None:
+                return int(item[1])
+
+    async def depth(self) -> int:
+        return await self.redis.llen(self.key)
+
+    async def claim_recovery(self, ttl: float) -> bool:
+        """Whether this process should re-queue pending jobs; only one per ttl seconds does."""
+        return bool(await self.redis.set(f"{self.key}:recovery", os.getpid(), nx=True, ex=int(ttl)))
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+class JobRunner:
+    """
+    Runs handler(job_id) for queued job ids on a fixed number of worker
+    tasks.
+
+    A handler that raises is retried with exponential backoff, up to
+    max_attempts runs in this process; then, or straight away for a
+    PermanentJobError, on_failure(job_id, detail) records the failure.
+    Jobs are plain ids: whatever a handler needs is loaded from its
+    durable record, so unfinished jobs can be recovered after a crash by
+    queueing their ids again.
+
+    An id can therefore be queued more than once. Handlers claim their
+    record for lease seconds before working on it and raise JobLeased
+    when another run holds it; that run is not counted as an attempt.
+    """
+
+    def __init__(
+        self,
+        backend: str = "memory",
+        workers: int = 2,
+        max_depth: int = 256,
+        max_attempts: int = 3,
+        retry_delay: float = 1.0,
+        redis_url: Optional[str] = None,
+        shutdown_grace: float = 10.0,
+        lease: float = 60.0,
+    ):
+        if backend not in ("memory", "redis"):
+            raise ValueError(f"Unknown job queue backend: {backend}")
+        self.backend = backend
+        self.workers = workers
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.redis_url = redis_url
+        self.shutdown_grace = shutdown_grace
+        self.lease = lease
+        self.queue = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._workers: Set[asyncio.Task] = set()
+        self._idle: Set[asyncio.Task] = set()
+        self._stopping = False
+        self._attempts: Dict[int, int] = {}
+
+        # Metrics
+        self.completed = 0
+        self.retried = 0
+        self.deferred = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> "JobRunner":
+        return cls(
+            backend=os.environ.get("SAVE_QUEUE", "memory"),
+            workers=int(os.environ.get("SAVE_WORKERS", "2")),
+            max_depth=int(os.environ.get("SAVE_QUEUE_MAX", "256")),
+            max_attempts=int(os.environ.get("SAVE_MAX_ATTEMPTS", "3")),
+            retry_delay=float(os.environ.get("SAVE_RETRY_DELAY", "1")),
+            redis_url=os.environ.get("REDIS_URL", "redis://localhost:6379/0"),
+            shutdown_grace=float(os.environ.get("SAVE_SHUTDOWN_GRACE", "10")),
+            lease=float(os.environ.get("SAVE_LEASE", "60")),
+        )
+
+    def start(
+        self,
+        handler: Callable[[int], Awaitable[None]],
+        on_failure: Callable[[int, str], Awaitable[None]],
+    ) -> None:
+        self.handler = handler
+        self.on_failure = on_failure
+        self._stopping = False
+        if self.backend == "redis":
+            self.queue = RedisQueue(self.redis_url, self.max_depth)
+        else:
+            self.queue = MemoryQueue(self.max_depth)
+        self._workers = {self._spawn(self._work()) for _ in range(self.workers)}
+
+    async def shutdown(self) -> None:
+        """
+        Stop taking jobs and give running ones up to shutdown_grace seconds
+        to finish. Jobs cut short, queued or waiting for a retry stay
+        pending in their records and are recovered on the next start.
+        """
+        self._stopping = True
+        for task in list(self._idle):
+            task.cancel()
+        running = [task for task in self._workers if task not in self._idle]
+        if running and self.shutdown_grace > 0:
+            await asyncio.wait(running, timeout=self.shutdown_grace)
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.queue is not None:
+            await self.queue.close()
+            self.queue = None
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def submit(self, job_id: int) -> None:
+        """Queue a new job, raising JobQueueFull when the queue is at capacity."""
+        try:
+            await self.queue.offer(job_id)
+        except JobQueueFull:
+            self.rejected += 1
+            raise
+
+    async def recover(self, load_ids: Callable[[], Awaitable[Iterable[int]]], lock_ttl: float = 60.0) -> None:
+        """Queue the ids of unfinished jobs, in the background, waiting for space as needed."""
+        if isinstance(self.queue, RedisQueue) and not await self.queue.claim_recovery(lock_ttl):
+            return
+
+        async def requeue():
+            try:
+                job_ids = list(await load_ids())
+            except Exception as e:
+                logger.error("Could not load unfinished save jobs: %s", e)
+                return
+            if job_ids:
+                logger.info("Recovering %d unfinished save jobs", len(job_ids))
+            for job_id in job_ids:
+                await self.queue.put(job_id)
+
+        self._spawn(requeue())
+
+    async def _retry_later(self, job_id: int, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self.queue.put(job_id)
+
+    async def _work(self) -> None:
+        task = asyncio.current_task()
+        while not self._stopping:
+            self._idle.add(task)
+            try:
+                job_id = await self.queue.get()
+            finally:
+                self._idle.discard(task)
+            try:
+                await self.handler(job_id)
+            except asyncio.CancelledError:
+                raise
+            except JobLeased as e:
+                self.deferred += 1
+                self._spawn(self._retry_later(job_id, e.retry_after))
+            except PermanentJobError as e:
+                await self._fail(job_id, e.detail)
+            except Exception as e:
+                attempts = self._attempts.get(job_id, 0) + 1
+                if attempts >= self.max_attempts:
+                    await self._fail(job_id, getattr(e, "detail", None) or "QR generation failed")
+                    continue
+                self._attempts[job_id] = attempts
+                self.retried += 1
+                logger.warning("Save job %s failed (attempt %d), retrying: %s", job_id, attempts, e)
+                self._spawn(self._retry_later(job_id, self.retry_delay * 2 ** (attempts - 1)))
+            else:
+                self._attempts.pop(job_id, None)
+                self.completed += 1
+
+    async def _fail(self, job_id: int, detail: str) -> None:
+        self._attempts.pop(job_id, None)
+        self.failed += 1
+        try:
+            await self.on_failure(job_id, detail)
+        except Exception as e:
+            logger.error("Could not record failure of save job %s: %s", job_id, e)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "workers": self.workers,
+            "max_depth": self.max_depth,
+            # Redis depth needs a round trip; see RedisQueue.depth
+            "depth": self.queue.qsize() if isinstance(self.queue, MemoryQueue) else None,
+            "completed": self.completed,
+            "retried": self.retried,
+            "deferred": self.deferred,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,169 @@
+"""
+Logging setup.
+
+Records are handed to a QueueHandler on the calling thread and written
+by a QueueListener thread, so a request never waits on stderr. Messages
+use %-style arguments, which are only interpolated for records that pass
+the level and sampling checks.
+
+LOG_LEVEL sets the root level (default INFO). LOG_FORMAT is "json" (one
+object per line, the default) or "text". LOG_DEBUG_SAMPLE_RATE keeps
+DEBUG records for that fraction of requests (default 1.0), so DEBUG can
+be left on under load.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+# Per-request context, set by RequestContextMiddleware
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+debug_sampled: ContextVar[bool] = ContextVar("debug_sampled", default=True)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Interpolate now, while the arguments are current; the writer
+        # thread does the formatting, including any traceback
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Drops DEBUG records of requests outside the debug sample and stamps
+    the rest with the request id. Runs on the calling thread, before the
+    record is queued and the context is lost.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and not debug_sampled.get():
+            return False
+        record.request_id = request_id.get()
+        return True
+
+
+def configure_logging(stream=None) -> None:
+    """Route all logging through a queue to one writer thread for stream (stderr). Safe to call again."""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = os.environ.get("LOG_LEVEL", "INFO").upper()
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if os.environ.get("LOG_FORMAT", "json").lower() == "text":
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    else:
+        handler.setFormatter(JsonFormatter())
+
+    # Unbounded, so a slow stderr delays output rather than requests
+    queue_handler = _QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+
+    # uvicorn installs its own synchronous handlers before importing the app;
+    # send its error and access logs through the queue as well
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Write out queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def debug_enabled(logger: logging.Logger) -> bool:
+    """
+    Whether a DEBUG record from logger would be kept for this request.
+    Guards hot-path debug calls: a record dropped by RequestContextFilter
+    has already cost its creation.
+    """
+    return debug_sampled.get() and logger.isEnabledFor(logging.DEBUG)
+
+
+def current_context() -> tuple:
+    return request_id.get(), debug_sampled.get()
+
+
+def call_in_context(context: tuple, fn, *args):
+    """Run fn(*args) under a request's log context from current_context(), e.g. on a render worker."""
+    id_token = request_id.set(context[0])
+    sampled_token = debug_sampled.set(context[1])
+    try:
+        return fn(*args)
+    finally:
+        debug_sampled.reset(sampled_token)
+        request_id.reset(id_token)
+
+
+def debug_sample_rate() -> float:
+    return float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "1"))
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware giving each request an id (X-Request-ID when the
+    client sends one) and deciding once whether its DEBUG logs are kept.
+    """
+
+    def __init__(self, app, sample_rate: Optional[float] = None):
+        self.app = app
+        self.sample_rate = debug_sample_rate() if sample_rate is None else sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id")
+        id_token = request_id.set(incoming.decode("latin-1")[:64] if incoming else uuid.uuid4().hex)
+        sampled_token = debug_sampled.set(self.sample_rate >= 1 or random.random() < self.sample_rate)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            debug_sampled.reset(sampled_token)
+            request_id.reset(id_token)
@@ -0,0 +1,102 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import numpy as np
+import qrcode
+from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q
+
+from . import metrics
+
+# QRCodeOptions.error_correction values
+ERROR_CORRECTION = {
+    "L": ERROR_CORRECT_L,
+    "M": ERROR_CORRECT_M,
+    "Q": ERROR_CORRECT_Q,
+    "H": ERROR_CORRECT_H,
+}
+
+
+class PackedMatrix(NamedTuple):
+    """A fitted QR module matrix, one bit per module, without the quiet zone."""
+
+    version: int
+    width: int
+    bits: bytes
+
+    def modules(self) -> np.ndarray:
+        """The (width, width) boolean module array."""
+        flat = np.unpackbits(np.frombuffer(self.bits, dtype=np.uint8), count=self.width * self.width)
+        return flat.view(bool).reshape(self.width, self.width)
+
+
+def encode(data: str, error_correction: str = "L", version: Optional[int] = None) -> PackedMatrix:
+    """
+    Encode data as a QR module matrix. version None picks the smallest
+    version that fits; an explicit version raises DataOverflowError when
+    the data does not fit it.
+    """
+    qr = qrcode.QRCode(version=version, error_correction=ERROR_CORRECTION[error_correction], border=0)
+    qr.add_data(data)
+    with metrics.stage("qr_make"):
+        qr.make(fit=version is None)
+    modules = np.asarray(qr.modules, dtype=bool)
+    return PackedMatrix(qr.version, modules.shape[0], np.packbits(modules).tobytes())
+
+
+class MatrixCache:
+    """
+    LRU of PackedMatrix by (data, error correction, version).
+
+    Fitting a version, Reed-Solomon coding and scoring all eight mask
+    patterns depend only on these, so restyling or recolouring a code
+    reuses the matrix. Bit-packed entries are small (under 4 KB at
+    version 40). The cache is per process, so each render worker keeps
+    its own.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "MatrixCache":
+        return cls(max_entries=int(os.environ.get("MATRIX_CACHE_SIZE", "2048")))
+
+    def get(self, data: str, error_correction: str = "L", version: Optional[int] = None) -> PackedMatrix:
+        key = (data, error_correction, version)
+        with self._lock:
+            matrix = self._entries.get(key)
+            if matrix is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return matrix
+            self.misses += 1
+
+        # Encoded outside the lock; concurrent misses for one key just both encode
+        matrix = encode(data, error_correction, version)
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = matrix
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return matrix
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+cache = MatrixCache.from_env()
@@ -0,0 +1,262 @@
+"""
+Request metrics in the Prometheus text format, with optional
+OpenTelemetry spans.
+
+Everything here is in-process and dependency-free: a metric update is a
+perf_counter() call plus a locked dict update, cheap enough to leave on
+in production. Spans are exported only when OTEL_EXPORTER_OTLP_ENDPOINT
+is set and the OpenTelemetry SDK and OTLP exporter are installed.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond token checks to slow renders
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        lines = self._header()
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {repr(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+# stats() providers exported at scrape time, by metric name prefix
+STATS: Dict[str, Callable[[], Optional[dict]]] = {}
+
+
+def register_stats(prefix: str, provider: Callable[[], Optional[dict]]) -> None:
+    """Export the numeric values of provider() as {prefix}_{key} on every scrape."""
+    STATS[prefix] = provider
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    for prefix, provider in STATS.items():
+        for key, value in (provider() or {}).items():
+            if isinstance(value, (int, float)):
+                name = f"{prefix}_{key}"
+                lines += [f"# TYPE {name} untyped", f"{name} {_number(int(value) if isinstance(value, bool) else value)}"]
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled", ["method"])
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time spent in each stage of request handling", ["stage"])
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Database helper latency including checkout wait", ["query"]
+)
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "Database helpers that raised", ["query"])
+
+# OpenTelemetry tracer, set by init_tracing when an OTLP endpoint is configured
+tracer = None
+_provider = None
+
+# Stages recorded in a render worker are collected here and reported by the
+# caller, since a worker process cannot update this process's metrics
+_collected: ContextVar[Optional[list]] = ContextVar("collected_stages", default=None)
+
+
+def span(name: str, start_ns: int, seconds: float, attributes: Optional[dict] = None) -> None:
+    """Export an already finished span, if tracing is enabled."""
+    if tracer is None:
+        return
+    finished = tracer.start_span(name, start_time=start_ns, attributes=attributes)
+    finished.end(end_time=start_ns + int(seconds * 1e9))
+
+
+def record_stage(name: str, start_ns: int, seconds: float) -> None:
+    collected = _collected.get()
+    if collected is not None:
+        collected.append((name, start_ns, seconds))
+        return
+    STAGE_SECONDS.observe(seconds, name)
+    span(name, start_ns, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as stage name."""
+    start_ns = time.time_ns()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, start_ns, time.perf_counter() - started)
+
+
+def collect_stages(fn: Callable, *args) -> Tuple[object, list]:
+    """Run fn(*args) and return (result, stages) for record_stages; used on render workers."""
+    token = _collected.set([])
+    try:
+        result = fn(*args)
+        return result, _collected.get()
+    finally:
+        _collected.reset(token)
+
+
+def record_stages(stages: list) -> None:
+    for name, start_ns, seconds in stages:
+        record_stage(name, start_ns, seconds)
+
+
+def init_tracing() -> None:
+    """Export spans over OTLP/HTTP when OTEL_EXPORTER_OTLP_ENDPOINT is set."""
+    global tracer, _provider
+    if not os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning(
+            "OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk and "
+            "opentelemetry-exporter-otlp-proto-http are not installed; spans are disabled"
+        )
+        return
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": os.environ.get("OTEL_SERVICE_NAME", "qr-backend")})
+    )
+    # Spans are exported in batches on a background thread
+    _provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    tracer = _provider.get_tracer(__name__)
+
+
+def shutdown_tracing() -> None:
+    global tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    tracer = _provider = None
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency per route template (so path
+    parameters do not multiply series) and requests in flight. With
+    tracing on, each request is a span that parents its stage spans.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method)
+        started = time.perf_counter()
+        with tracer.start_as_current_span(method) if tracer is not None else nullcontext() as current:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                HTTP_IN_FLIGHT.dec(method)
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                HTTP_REQUESTS.observe(time.perf_counter() - started, method, route, str(status_code))
+                if current is not None:
+                    current.update_name(f"{method} {route}")
+                    current.set_attribute("http.route", route)
+                    current.set_attribute("http.status_code", status_code)
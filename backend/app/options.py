@@ -0,0 +1,126 @@
+"""
+Request-side rendering types: QRCodeOptions, RenderError and the output
+formats, plus the built-in style names.
+
+Kept free of PIL, qrcode and NumPy so the web process can validate
+requests without loading the rendering stack; with process rendering
+only the render workers import app.rendering. Built-in drawers are
+registered as lazy factories and imported on first use.
+"""
+import os
+from typing import Optional
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from . import styles
+
+
+class RenderError(Exception):
+    """
+    Rendering failure carrying the HTTP status and detail to report.
+
+    Plain exception (rather than HTTPException) so it survives being
+    pickled back from a worker process.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# Built-in styles. Others can be added with styles.register_dot_style and
+# styles.register_eye_style and are validated and cached the same way.
+_PIL_DRAWERS = "qrcode.image.styles.moduledrawers.pil"
+styles.register_dot_style("square", styles.lazy_factory(_PIL_DRAWERS, "SquareModuleDrawer"))
+styles.register_dot_style("rounded", styles.lazy_factory(_PIL_DRAWERS, "RoundedModuleDrawer"))
+styles.register_dot_style("circle", styles.lazy_factory(_PIL_DRAWERS, "CircleModuleDrawer"))
+styles.register_dot_style("gapped", styles.lazy_factory(_PIL_DRAWERS, "GappedSquareModuleDrawer"))
+styles.register_dot_style("horizontal", styles.lazy_factory(_PIL_DRAWERS, "HorizontalBarsDrawer"))
+styles.register_dot_style("vertical", styles.lazy_factory(_PIL_DRAWERS, "VerticalBarsDrawer"))
+styles.register_eye_style("square", styles.lazy_factory(_PIL_DRAWERS, "SquareModuleDrawer"))
+styles.register_eye_style("rounded", styles.lazy_factory(_PIL_DRAWERS, "RoundedModuleDrawer"))
+styles.register_eye_style("circle", styles.lazy_factory(_PIL_DRAWERS, "CircleModuleDrawer"))
+styles.register_eye_style("gapped", styles.lazy_factory(_PIL_DRAWERS, "GappedSquareModuleDrawer"))
+styles.register_eye_style("custom", styles.lazy_factory(f"{__package__}.rendering", "CustomEyeDrawer"))
+
+
+# Widest image a request may produce, in pixels. The largest box size and
+# border at version 40 would give about 10,850 px a side (350 MB as RGB).
+MAX_IMAGE_SIZE = int(os.environ.get("QR_MAX_IMAGE_SIZE", "4096"))
+
+
+def image_size(modules: int, box_size: int, border: int) -> int:
+    """Side in pixels of a code modules wide, quiet zone included."""
+    return (modules + 2 * border) * box_size
+
+
+def check_image_size(options: "QRCodeOptions", modules: int) -> None:
+    """Raise RenderError if the code, once encoded modules wide, would exceed MAX_IMAGE_SIZE."""
+    if image_size(modules, options.box_size, options.border) > MAX_IMAGE_SIZE:
+        raise RenderError(
+            status_code=422,
+            detail=f"The QR code would be over {MAX_IMAGE_SIZE} pixels wide; use a smaller box_size or border",
+        )
+
+
+# Define the QRCodeOptions model
+class QRCodeOptions(BaseModel):
+    """
+    Pydantic model for QR code generation options
+
+    Attributes:
+        url (str): The URL to encode in the QR code
+        dot_style (str): Style of QR code dots (square, rounded, circle, gapped)
+        fill_color (str): Hex color code for QR code foreground
+        back_color (str): Hex color code for QR code background
+        eye_style (str): Style of QR code eyes (square, rounded, circle, gapped)
+        format (str): Output format (png, png-palette, webp, svg)
+        box_size (int): Pixels per module
+        border (int): Quiet zone width in modules
+        compression (int): Encoder effort from 0 (fastest) to 9 (smallest)
+        error_correction (str): Error correction level (L, M, Q, H)
+        version (int): QR version 1-40, or None for the smallest that fits
+    """
+    url: str
+    dot_style: str = "square"
+    fill_color: str = Field(..., pattern="^#[0-9A-Fa-f]{6}$")
+    back_color: str = Field(..., pattern="^#[0-9A-Fa-f]{6}$")
+    eye_style: str = "square"
+    format: str = Field("png", pattern="^(png|png-palette|webp|svg)$")
+    box_size: int = Field(10, ge=1, le=50)
+    border: int = Field(4, ge=0, le=20)
+    compression: int = Field(6, ge=0, le=9)
+    error_correction: str = Field("L", pattern="^[LMQH]$")
+    version: Optional[int] = Field(None, ge=1, le=40)
+
+    @field_validator("dot_style")
+    @classmethod
+    def registered_dot_style(cls, value: str) -> str:
+        if value not in styles.DOT_STYLES:
+            raise ValueError(f"must be one of: {', '.join(styles.DOT_STYLES)}")
+        return value
+
+    @field_validator("eye_style")
+    @classmethod
+    def registered_eye_style(cls, value: str) -> str:
+        if value not in styles.EYE_STYLES:
+            raise ValueError(f"must be one of: {', '.join(styles.EYE_STYLES)}")
+        return value
+
+    @model_validator(mode="after")
+    def bounded_image_size(self) -> "QRCodeOptions":
+        # Without a version the width depends on the URL, known once encoded:
+        # the smallest code (version 1) is checked here, the real one by the render
+        modules = 17 + 4 * (self.version or 1)
+        if image_size(modules, self.box_size, self.border) > MAX_IMAGE_SIZE:
+            raise ValueError(f"box_size and border give an image over {MAX_IMAGE_SIZE} pixels wide")
+        return self
+
+# Media type and file extension of each output format
+IMAGE_FORMATS = {
+    "png": ("image/png", "png"),
+    "png-palette": ("image/png", "png"),
+    "webp": ("image/webp", "webp"),
+    "svg": ("image/svg+xml", "svg"),
+}
@@ -0,0 +1,50 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Fields a client may request from /api/qr, mapped to the SELECT expression
+# that produces them. image_url is derived from id; image is the base64 PNG
+# and is only read when explicitly requested.
+QR_LIST_FIELDS = {
+    "id": "id",
+    "url": "qr_data AS url",
+    "dot_style": "dot_style",
+    "fill_color": "fill_color",
+    "back_color": "back_color",
+    "eye_style": "eye_style",
+    "image_hash": "image_hash",
+    "created_at": "created_at",
+    "status": "status",
+    "image_url": None,
+    "image": "qr_image",
+}
+DEFAULT_QR_LIST_FIELDS = [name for name in QR_LIST_FIELDS if name != "image"]
+
+
+class InvalidPageRequest(Exception):
+    """Raised for an unknown field or a malformed cursor."""
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(DEFAULT_QR_LIST_FIELDS)
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in QR_LIST_FIELDS]
+    if unknown:
+        raise InvalidPageRequest(f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque keyset cursor pointing just after the (created_at, id) row."""
+    raw = f"{created_at}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except ValueError:
+        raise InvalidPageRequest("Invalid cursor")
@@ -0,0 +1,438 @@
+import base64
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from .jobs import JobLeased
+from .options import QRCodeOptions
+from .pagination import DEFAULT_QR_LIST_FIELDS, QR_LIST_FIELDS, encode_cursor
+from .storage import image_hash, storage_from_env
+
+# Where QR image bytes are kept: MEDIUMBLOB column or content-addressed files
+image_storage = storage_from_env()
+
+# Query helpers. These run on the database thread pool via ConnectionPool.run,
+# each receiving a pooled connection as the first argument.
+
+def insert_user(conn, username: str, email: str, password_hash: str) -> int:
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
+        (username, email, password_hash)
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+def fetch_user_by_username(conn, username: str) -> Optional[dict]:
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+    return cursor.fetchone()
+
+def fetch_user_id(conn, username: str) -> Optional[int]:
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+    user = cursor.fetchone()
+    return user["id"] if user else None
+
+def update_password_hash(conn, user_id: int, password_hash: str) -> None:
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE users SET password_hash = %s WHERE id = %s",
+        (password_hash, user_id)
+    )
+    conn.commit()
+
+def utc_now() -> datetime:
+    """The app's clock as naive UTC, like the TIMESTAMP columns it is compared with."""
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+# Each user's list version, users.qr_version, moves on in the same transaction
+# whenever one of their codes is inserted, deleted or changes status; the
+# /api/qr ETag is derived from it, so building it is one primary key read.
+def bump_qr_version(cursor, user_id: int) -> None:
+    cursor.execute(
+        "UPDATE users SET qr_version = qr_version + 1, qr_changed_at = %s WHERE id = %s",
+        (utc_now(), user_id)
+    )
+
+def bump_owner_qr_version(cursor, qr_id: int) -> None:
+    """bump_qr_version for the owner of code qr_id, for the save workers that only know the code."""
+    cursor.execute(
+        """UPDATE users SET qr_version = qr_version + 1, qr_changed_at = %s 
+           WHERE id = (SELECT user_id FROM qr_codes WHERE id = %s)""",
+        (utc_now(), qr_id)
+    )
+
+def insert_qr_code(conn, user_id: int, options: QRCodeOptions, png: bytes) -> None:
+    stored = image_storage.store(png)
+    cursor = conn.cursor()
+    cursor.execute(
+        """INSERT INTO qr_codes 
+           (user_id, qr_data, dot_style, fill_color, back_color, qr_image, image_hash, image_type, eye_style) 
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+        (user_id, options.url, options.dot_style, options.fill_color, options.back_color, stored.blob, stored.image_hash, stored.image_type, options.eye_style)
+    )
+    bump_qr_version(cursor, user_id)
+    conn.commit()
+
+def insert_pending_qr_code(conn, user_id: int, options: QRCodeOptions) -> int:
+    """Insert a code whose image a save worker renders later; returns its id."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """INSERT INTO qr_codes 
+           (user_id, qr_data, dot_style, fill_color, back_color, eye_style, status, render_options) 
+           VALUES (%s, %s, %s, %s, %s, %s, 'pending', %s)""",
+        (user_id, options.url, options.dot_style, options.fill_color, options.back_color, options.eye_style, options.model_dump_json())
+    )
+    qr_id = cursor.lastrowid
+    bump_qr_version(cursor, user_id)
+    conn.commit()
+    return qr_id
+
+def claim_qr_job(conn, qr_id: int, lease: float) -> Optional[tuple]:
+    """
+    Claim pending code qr_id for lease seconds and count an attempt at
+    rendering it. Returns (render_options, attempts), attempts doubling as
+    the claim's token, or None once the code is no longer pending
+    (finished by an earlier run, failed or deleted). Raises JobLeased
+    while another run's claim is live, so a duplicate queue entry neither
+    renders the code again nor uses up its attempts.
+    """
+    # Both ends of the lease come from the app's clock
+    now = utc_now()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        """UPDATE qr_codes SET claimed_at = %s, attempts = attempts + 1 
+           WHERE id = %s AND status = 'pending' AND (claimed_at IS NULL OR claimed_at < %s)""",
+        (now, qr_id, now - timedelta(seconds=lease))
+    )
+    conn.commit()
+    if cursor.rowcount == 0:
+        cursor.execute("SELECT 1 FROM qr_codes WHERE id = %s AND status = 'pending'", (qr_id,))
+        if cursor.fetchone() is None:
+            return None
+        raise JobLeased(lease)
+    cursor.execute("SELECT render_options, attempts FROM qr_codes WHERE id = %s", (qr_id,))
+    row = cursor.fetchone()
+    return row["render_options"], row["attempts"]
+
+def release_qr_job(conn, qr_id: int, attempts: int) -> None:
+    """Give up the claim made by attempt number attempts, so the code can be claimed again at once."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE qr_codes SET claimed_at = NULL WHERE id = %s AND status = 'pending' AND attempts = %s",
+        (qr_id, attempts)
+    )
+    conn.commit()
+
+def complete_qr_job(conn, qr_id: int, attempts: int, png: bytes) -> None:
+    stored = image_storage.store(png)
+    cursor = conn.cursor()
+    # Only while the claim is still ours; a later claim has its own attempt number
+    cursor.execute(
+        """UPDATE qr_codes 
+           SET qr_image = %s, image_hash = %s, image_type = %s, status = 'ready', render_options = NULL, claimed_at = NULL 
+           WHERE id = %s AND status = 'pending' AND attempts = %s""",
+        (stored.blob, stored.image_hash, stored.image_type, qr_id, attempts)
+    )
+    if cursor.rowcount > 0:
+        bump_owner_qr_version(cursor, qr_id)
+    conn.commit()
+
+def fail_qr_job(conn, qr_id: int, detail: str) -> None:
+    cursor = conn.cursor()
+    # A code claimed by another run is left to that run
+    cursor.execute(
+        "UPDATE qr_codes SET status = 'failed', error = %s WHERE id = %s AND status = 'pending' AND claimed_at IS NULL",
+        (detail[:255], qr_id)
+    )
+    if cursor.rowcount > 0:
+        bump_owner_qr_version(cursor, qr_id)
+    conn.commit()
+
+def fetch_pending_qr_ids(conn) -> list:
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM qr_codes WHERE status = 'pending' ORDER BY id")
+    return [row[0] for row in cursor.fetchall()]
+
+def fetch_qr_status(conn, user_id: int, qr_id: int) -> Optional[dict]:
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        "SELECT id, qr_data AS url, status, error, created_at FROM qr_codes WHERE id = %s AND user_id = %s",
+        (qr_id, user_id)
+    )
+    return cursor.fetchone()
+
+def insert_qr_codes(conn, user_id: int, rows: list, chunk_size: int = 500) -> int:
+    """
+    Insert (options, png) rows with multi-row INSERTs of up to
+    chunk_size rows, committing once so the rows are saved all-or-nothing.
+    """
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(chunk))
+            params = []
+            for options, png in chunk:
+                stored = image_storage.store(png)
+                params.extend((user_id, options.url, options.dot_style, options.fill_color, options.back_color, stored.blob, stored.image_hash, stored.image_type, options.eye_style))
+            cursor.execute(
+                f"""INSERT INTO qr_codes 
+                   (user_id, qr_data, dot_style, fill_color, back_color, qr_image, image_hash, image_type, eye_style) 
+                   VALUES {placeholders}""",
+                params
+            )
+        bump_qr_version(cursor, user_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
+
+def fetch_user_qr_codes(
+    conn,
+    user_id: int,
+    limit: int = 50,
+    after: Optional[tuple] = None,
+    fields: Optional[list] = None,
+) -> tuple:
+    """
+    One page of a user's QR codes, newest first, using keyset pagination on
+    (created_at, id) so deep pages cost the same as the first one.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    fields = fields or DEFAULT_QR_LIST_FIELDS
+    # id and created_at are always needed for the cursor; image_hash and image_type to load files
+    columns = {"id", "created_at"} | {QR_LIST_FIELDS[name] for name in fields if QR_LIST_FIELDS[name]}
+    if "image" in fields:
+        columns.update(("image_hash", "image_type"))
+
+    cursor = conn.cursor(dictionary=True)
+
+    # Served by the (user_id, created_at, id) index without a filesort
+    where = "user_id = %s"
+    params = [user_id]
+    if after:
+        where += " AND (created_at < %s OR (created_at = %s AND id < %s))"
+        params.extend((after[0], after[0], after[1]))
+    cursor.execute(f"""
+        SELECT {", ".join(sorted(columns))}
+        FROM qr_codes 
+        WHERE {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s
+    """, (*params, limit + 1))
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+    qr_codes = []
+    for row in rows:
+        if "image_url" in fields:
+            row["image_url"] = f"/api/qr/{row['id']}/image"
+        if "image" in fields:
+            blob = row.pop("qr_image")
+            png = image_storage.load(bytes(blob) if blob is not None else None, row.get("image_hash"), row.get("image_type"))
+            row["image"] = base64.b64encode(png).decode() if png is not None else None
+        qr_codes.append({name: row.get(name) for name in fields})
+    return qr_codes, next_cursor
+
+def fetch_user_qr_page(
+    conn,
+    user_id: int,
+    limit: int,
+    after: Optional[tuple],
+    fields: list,
+    etags: set,
+    query: str,
+) -> tuple:
+    """
+    Validators of a user's QR code list plus one page of it. Returns
+    (etag, last_modified, page) with page as from fetch_user_qr_codes, or
+    None when the ETag is in etags, so a revalidation reads no rows.
+    query identifies the page requested (limit, cursor, fields).
+    """
+    cursor = conn.cursor(dictionary=True)
+    # The list version, by primary key: constant cost however many codes
+    # the user has and however deep the page
+    cursor.execute("SELECT qr_version, qr_changed_at FROM users WHERE id = %s", (user_id,))
+    version = cursor.fetchone() or {"qr_version": 0, "qr_changed_at": None}
+    digest = hashlib.sha256(f"{user_id}:{version['qr_version']}:{query}".encode()).hexdigest()[:32]
+    if digest in etags or "*" in etags:
+        return digest, version["qr_changed_at"], None
+    return digest, version["qr_changed_at"], fetch_user_qr_codes(conn, user_id, limit, after, fields)
+
+def fetch_qr_image(conn, user_id: int, qr_id: int, etags: set) -> Optional[tuple]:
+    """
+    Return (image_hash, png) for a QR code owned by user_id, or None if
+    not found. png is None when the image hash is in etags, so a
+    conditional GET never reads the image bytes.
+    """
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        "SELECT image_hash, image_type FROM qr_codes WHERE id = %s AND user_id = %s",
+        (qr_id, user_id)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    if row["image_hash"] and (row["image_hash"] in etags or "*" in etags):
+        return row["image_hash"], None
+
+    cursor.execute("SELECT qr_image FROM qr_codes WHERE id = %s", (qr_id,))
+    blob = cursor.fetchone()["qr_image"]
+    png = image_storage.load(bytes(blob) if blob is not None else None, row["image_hash"], row["image_type"])
+    if png is None:
+        return None
+    return row["image_hash"] or image_hash(png), png
+
+def delete_user_qr_code(conn, user_id: int, qr_id: int) -> bool:
+    """Delete qr_id if it belongs to user_id. Returns False if it was not found."""
+    cursor = conn.cursor()
+    # Ownership is part of the statement; the affected row count tells a
+    # missing or foreign code apart from a deleted one
+    cursor.execute("DELETE FROM qr_codes WHERE id = %s AND user_id = %s", (qr_id, user_id))
+    deleted = cursor.rowcount > 0
+    if deleted:
+        bump_qr_version(cursor, user_id)
+    conn.commit()
+    return deleted
+
+def delete_user_qr_codes(conn, user_id: int, qr_ids: list) -> list:
+    """Delete those of qr_ids that belong to user_id in one transaction. Returns the ids deleted."""
+    placeholders = ", ".join(["%s"] * len(qr_ids))
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT id FROM qr_codes WHERE user_id = %s AND id IN ({placeholders})",
+        (user_id, *qr_ids)
+    )
+    found = [row[0] for row in cursor.fetchall()]
+    if found:
+        placeholders = ", ".join(["%s"] * len(found))
+        cursor.execute(
+            f"DELETE FROM qr_codes WHERE user_id = %s AND id IN ({placeholders})",
+            (user_id, *found)
+        )
+        bump_qr_version(cursor, user_id)
+    conn.commit()
+    return found
+
+def delete_user_qr_codes_before(conn, user_id: int, cutoff: datetime, limit: int) -> list:
+    """
+    Delete up to limit of user_id's codes created before cutoff, oldest
+    first, in one transaction. Returns the ids deleted.
+    """
+    cursor = conn.cursor()
+    # Read from the (user_id, created_at, id) index in order
+    cursor.execute(
+        """SELECT id FROM qr_codes 
+           WHERE user_id = %s AND created_at < %s 
+           ORDER BY created_at, id 
+           LIMIT %s""",
+        (user_id, cutoff, limit)
+    )
+    ids = [row[0] for row in cursor.fetchall()]
+    if ids:
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(
+            f"DELETE FROM qr_codes WHERE user_id = %s AND id IN ({placeholders})",
+            (user_id, *ids)
+        )
+        bump_qr_version(cursor, user_id)
+    conn.commit()
+    return ids
+
+def insert_dynamic_qr_code(conn, user_id: int, slug: str, destination: str,
+                           options: QRCodeOptions, png: bytes) -> int:
+    """Insert a code encoding its short URL and its link in one transaction; returns the code id."""
+    stored = image_storage.store(png)
+    cursor = conn.cursor()
+    cursor.execute(
+        """INSERT INTO qr_codes
+           (user_id, qr_data, dot_style, fill_color, back_color, qr_image, image_hash, image_type, eye_style)
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+        (user_id, options.url, options.dot_style, options.fill_color, options.back_color, stored.blob, stored.image_hash, stored.image_type, options.eye_style)
+    )
+    qr_id = cursor.lastrowid
+    cursor.execute(
+        "INSERT INTO qr_links (slug, user_id, qr_code_id, destination) VALUES (%s, %s, %s, %s)",
+        (slug, user_id, qr_id, destination)
+    )
+    bump_qr_version(cursor, user_id)
+    conn.commit()
+    return qr_id
+
+def fetch_link(conn, slug: str) -> Optional[tuple]:
+    """(destination, code id) of slug, or None if there is no such link."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT destination, qr_code_id FROM qr_links WHERE slug = %s", (slug,))
+    row = cursor.fetchone()
+    return tuple(row) if row else None
+
+def fetch_user_link(conn, user_id: int, slug: str) -> Optional[dict]:
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT qr_code_id AS id, slug, destination AS url, scans, last_scan_at, created_at, updated_at
+        FROM qr_links
+        WHERE slug = %s AND user_id = %s
+    """, (slug, user_id))
+    return cursor.fetchone()
+
+def update_link_destination(conn, user_id: int, slug: str, destination: str) -> bool:
+    """Point the user's link at destination; False if the user has no such link."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE qr_links SET destination = %s, updated_at = CURRENT_TIMESTAMP WHERE slug = %s AND user_id = %s",
+        (destination, slug, user_id)
+    )
+    conn.commit()
+    if cursor.rowcount:
+        return True
+    # MySQL counts changed rows only, so an unchanged destination also gives 0
+    cursor.execute("SELECT 1 FROM qr_links WHERE slug = %s AND user_id = %s", (slug, user_id))
+    return cursor.fetchone() is not None
+
+def add_link_scans(conn, counts: dict) -> None:
+    """Add counts (slug -> scans) to qr_links in one UPDATE."""
+    slugs = list(counts)
+    cases = " ".join(["WHEN %s THEN %s"] * len(slugs))
+    placeholders = ", ".join(["%s"] * len(slugs))
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""UPDATE qr_links
+            SET scans = scans + CASE slug {cases} ELSE 0 END, last_scan_at = CURRENT_TIMESTAMP
+            WHERE slug IN ({placeholders})""",
+        (*(value for slug in slugs for value in (slug, counts[slug])), *slugs)
+    )
+    conn.commit()
+
+def iter_user_qr_export(conn, user_id: int, chunk_size: int):
+    """
+    Yield a user's codes, oldest first, in lists of up to chunk_size rows
+    read from one unbuffered cursor, so only one chunk is ever in memory.
+    Each row carries its image bytes as "image" (None if missing).
+    """
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    cursor.execute("""
+        SELECT id, qr_data AS url, dot_style, fill_color, back_color, eye_style,
+               status, created_at, image_hash, image_type, qr_image
+        FROM qr_codes
+        WHERE user_id = %s
+        ORDER BY created_at, id
+    """, (user_id,))
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        for row in rows:
+            blob = row.pop("qr_image")
+            row["image"] = image_storage.load(
+                bytes(blob) if blob is not None else None, row["image_hash"], row.pop("image_type")
+            )
+            if isinstance(row["created_at"], datetime):
+                row["created_at"] = row["created_at"].isoformat()
+        yield rows
@@ -0,0 +1,194 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(Exception):
+    """Raised when a key has used up its budget; retry_after is in seconds."""
+
+    def __init__(self, budget: str, retry_after: float):
+        super().__init__(budget, retry_after)
+        self.budget = budget
+        self.retry_after = retry_after
+
+
+class Budget(NamedTuple):
+    """Token bucket refilling at rate tokens per second, holding at most burst."""
+    rate: float
+    burst: int
+
+
+def _take(tokens: float, budget: Budget, cost: float) -> Tuple[float, float]:
+    """
+    (tokens left, seconds to wait) for a request costing cost tokens.
+
+    A request is admitted once the bucket holds min(cost, burst) tokens
+    and then pays its full cost, so a request larger than the burst is
+    not refused forever but leaves the bucket in debt until refilled.
+    """
+    needed = min(cost, budget.burst)
+    if tokens >= needed:
+        return tokens - cost, 0.0
+    return tokens, (needed - tokens) / budget.rate
+
+
+class MemoryBuckets:
+    """
+    Token buckets in this process's memory, for a single app process.
+    Keeps the max_keys most recently used buckets; an evicted bucket
+    starts full again, which is where an idle one would be anyway.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, budget: Budget, cost: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (budget.burst, now))
+        tokens = min(budget.burst, tokens + (now - updated) * budget.rate)
+        tokens, wait = _take(tokens, budget, cost)
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def size(self) -> int:
+        return len(self._buckets)
+
+    async def close(self) -> None:
+        pass
+
+
+# Same arithmetic as MemoryBuckets and _take, atomically on the server and
+# with its clock, so every app process sharing the Redis shares the buckets
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local needed = math.min(cost, burst)
+local wait = 0
+if tokens >= needed then
+    tokens = tokens - cost
+else
+    wait = (needed - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+-- Gone once it would have refilled anyway
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    """Token buckets in Redis hashes, shared by every app process pointing at the same Redis."""
+
+    def __init__(self, url: str, prefix: str = "qr:rate"):
+        import redis.asyncio
+
+        # Checked on every request: short timeouts, as a slow Redis fails open anyway
+        self.redis = redis.asyncio.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.prefix = prefix
+        self._script = self.redis.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, budget: Budget, cost: float) -> float:
+        wait = await self._script(keys=[f"{self.prefix}:{key}"], args=[budget.rate, budget.burst, cost])
+        return float(wait)
+
+    def size(self) -> Optional[int]:
+        return None
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+class RateLimiter:
+    """
+    Per-key token buckets, one set per named budget (e.g. "render" for
+    routes that draw codes, "api" for the cheap ones).
+
+    backend is "memory" (each process limits on its own, so with several
+    workers a key gets up to that many times its budget) or "redis"
+    (shared). A budget with rate 0 is not limited. If Redis cannot be
+    reached, requests are let through and counted as errors rather than
+    failing the API.
+    """
+
+    def __init__(
+        self,
+        budgets: Dict[str, Budget],
+        backend: str = "memory",
+        redis_url: Optional[str] = None,
+        max_keys: int = 100_000,
+    ):
+        if backend not in ("memory", "redis"):
+            raise ValueError(f"Unknown rate limit backend: {backend}")
+        self.budgets = {name: budget for name, budget in budgets.items() if budget.rate > 0}
+        self.backend = backend
+        if backend == "redis":
+            self.buckets = RedisBuckets(redis_url)
+        else:
+            self.buckets = MemoryBuckets(max_keys)
+
+        # Metrics
+        self.allowed = {name: 0 for name in budgets}
+        self.limited = {name: 0 for name in budgets}
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        return cls(
+            budgets={
+                "render": Budget(
+                    rate=float(os.environ.get("RATE_LIMIT_RENDER_RATE", "5")),
+                    burst=int(os.environ.get("RATE_LIMIT_RENDER_BURST", "20")),
+                ),
+                "api": Budget(
+                    rate=float(os.environ.get("RATE_LIMIT_API_RATE", "50")),
+                    burst=int(os.environ.get("RATE_LIMIT_API_BURST", "200")),
+                ),
+            },
+            backend=os.environ.get("RATE_LIMIT_BACKEND", "memory"),
+            redis_url=os.environ.get("REDIS_URL", "redis://localhost:6379/0"),
+            max_keys=int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000")),
+        )
+
+    async def check(self, budget: str, key: str, cost: float = 1) -> None:
+        """Take cost tokens from key's bucket for budget, raising RateLimited when it is empty."""
+        limit = self.budgets.get(budget)
+        if limit is None:
+            return
+        try:
+            wait = await self.buckets.take(f"{budget}:{key}", limit, cost)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Rate limit check failed, letting the request through: %s", e)
+            return
+        if wait > 0:
+            self.limited[budget] += 1
+            raise RateLimited(budget, wait)
+        self.allowed[budget] += 1
+
+    async def close(self) -> None:
+        await self.buckets.close()
+
+    def stats(self) -> dict:
+        stats = {"backend": self.backend, "keys": self.buckets.size(), "errors": self.errors}
+        for name in self.allowed:
+            budget = self.budgets.get(name)
+            stats[f"{name}_rate"] = budget.rate if budget else 0
+            stats[f"{name}_burst"] = budget.burst if budget else 0
+            stats[f"{name}_allowed"] = self.allowed[name]
+            stats[f"{name}_limited"] = self.limited[name]
+        return stats
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+def new_slug(nbytes: int = 6) -> str:
+    """Random URL-safe slug, 8 characters for the default 48 bits."""
+    return secrets.token_urlsafe(nbytes)
+
+
+def valid_destination(url: str) -> bool:
+    """Whether url may be redirected to: absolute http(s), and safe to put in a Location header."""
+    if any(ord(char) < 0x21 or ord(char) == 0x7f for char in url):
+        return False
+    parts = urlsplit(url)
+    return parts.scheme in ("http", "https") and bool(parts.netloc)
+
+
+class RedirectCache:
+    """
+    LRU of slug -> destination URL for the redirect path, used from the
+    event loop only.
+
+    Entries live for ttl seconds, so a destination changed through another
+    worker process is picked up within that time; this process's own
+    updates and deletes take effect at once. Unknown slugs are remembered for
+    negative_ttl seconds so scans of a deleted code do not each query the
+    database. Concurrent misses for one slug share a single load. Entries
+    know the id of their code, so deleting a code can drop its slug
+    without looking the slug up.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl: float = 30.0, negative_ttl: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._invalidated: Set[str] = set()
+        # Code id -> slug of the entries held, and codes invalidated while loads run
+        self._slugs: Dict[int, str] = {}
+        self._invalidated_codes: Set[int] = set()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    @classmethod
+    def from_env(cls) -> "RedirectCache":
+        return cls(
+            max_entries=int(os.environ.get("REDIRECT_CACHE_SIZE", "100000")),
+            ttl=float(os.environ.get("REDIRECT_CACHE_TTL", "30")),
+            negative_ttl=float(os.environ.get("REDIRECT_NEGATIVE_TTL", "5")),
+        )
+
+    def put(self, slug: str, destination: Optional[str], code_id: Optional[int] = None) -> None:
+        """Cache destination for slug, the link of code code_id; None records that the slug does not exist."""
+        ttl = self.ttl if destination is not None else self.negative_ttl
+        self._drop(slug)
+        if ttl <= 0:
+            return
+        self._entries[slug] = (destination, time.monotonic() + ttl, code_id)
+        if code_id is not None:
+            self._slugs[code_id] = slug
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, slug: str) -> None:
+        entry = self._entries.pop(slug, None)
+        if entry is not None and entry[2] is not None:
+            self._slugs.pop(entry[2], None)
+
+    def invalidate(self, slug: str) -> None:
+        """Forget slug, e.g. once its destination changes; a load already under way is not cached either."""
+        self._drop(slug)
+        if slug in self._loading:
+            self._invalidated.add(slug)
+
+    def invalidate_code(self, code_id: int) -> None:
+        """Forget the slug of code code_id, if it has one, e.g. once the code is deleted."""
+        slug = self._slugs.get(code_id)
+        if slug is not None:
+            self.invalidate(slug)
+        if self._loading:
+            # Which slug a running load is for is only known once it returns
+            self._invalidated_codes.add(code_id)
+
+    async def get(self, slug: str, load: Callable[[str], Awaitable[Optional[Tuple[str, int]]]]) -> Optional[str]:
+        """
+        The destination of slug, or None if there is none. On a miss
+        load(slug) is awaited for (destination, code id), or None.
+        """
+        entry = self._entries.get(slug)
+        if entry is not None:
+            destination, expires_at, _ = entry
+            if time.monotonic() < expires_at:
+                self._entries.move_to_end(slug)
+                self.hits += 1
+                return destination
+            self._drop(slug)
+        self.misses += 1
+
+        future = self._loading.get(slug)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._loading[slug] = future
+        try:
+            self.loads += 1
+            link = await load(slug)
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here so a load nobody else waited for is not reported as unhandled
+            future.exception()
+            raise
+        else:
+            destination, code_id = link if link is not None else (None, None)
+            entry = self._entries.get(slug)
+            if entry is not None:
+                # Updated while loading, so newer than what the load read
+                destination = entry[0]
+            elif slug not in self._invalidated and code_id not in self._invalidated_codes:
+                # Not kept if invalidated meanwhile: the load may have read it before the delete
+                self.put(slug, destination, code_id)
+            future.set_result(destination)
+            return destination
+        finally:
+            del self._loading[slug]
+            self._invalidated.discard(slug)
+            if not self._loading:
+                self._invalidated_codes.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class ScanCounter:
+    """
+    Scans per slug, counted in memory and written by write(counts) every
+    interval seconds, at most max_batch slugs per call.
+
+    Counts that fail to be written are kept for the next flush. Each
+    process counts its own scans and writes increments, so several
+    workers add up; a process that is killed loses at most one
+    interval's worth.
+    """
+
+    def __init__(self, interval: float = 5.0, max_batch: int = 500):
+        self.interval = interval
+        self.max_batch = max_batch
+        self._counts: Dict[str, int] = {}
+        self._write: Optional[Callable[[Dict[str, int]], Awaitable[None]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        # Metrics
+        self.scans = 0
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+
+    @classmethod
+    def from_env(cls) -> "ScanCounter":
+        return cls(
+            interval=float(os.environ.get("SCAN_FLUSH_INTERVAL", "5")),
+            max_batch=int(os.environ.get("SCAN_FLUSH_BATCH", "500")),
+        )
+
+    def start(self, write: Callable[[Dict[str, int]], Awaitable[None]]) -> None:
+        self._write = write
+        self._task = asyncio.ensure_future(self._run())
+
+    async def shutdown(self) -> None:
+        """Stop the periodic flush and write what has been counted since the last one."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._write is not None:
+            await self.flush()
+
+    def add(self, slug: str, count: int = 1) -> None:
+        self._counts[slug] = self._counts.get(slug, 0) + count
+        self.scans += count
+
+    def pending(self, slug: str) -> int:
+        """Scans of slug counted here but not written yet."""
+        return self._counts.get(slug, 0)
+
+    async def flush(self) -> None:
+        async with self._lock:
+            counts, self._counts = self._counts, {}
+            if not counts:
+                return
+            slugs = list(counts)
+            for start in range(0, len(slugs), self.max_batch):
+                batch = {slug: counts[slug] for slug in slugs[start:start + self.max_batch]}
+                try:
+                    await self._write(batch)
+                except Exception as e:
+                    self.failures += 1
+                    logger.warning("Could not write scan counts of %d codes, retrying later: %s", len(batch), e)
+                    for slug, count in batch.items():
+                        self._counts[slug] = self._counts.get(slug, 0) + count
+                else:
+                    self.written += sum(batch.values())
+            self.flushes += 1
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            # Shielded: a flush cut short by shutdown would drop the counts it holds
+            await asyncio.shield(self.flush())
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "pending_codes": len(self._counts),
+            "scans": self.scans,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failures": self.failures,
+        }
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from pydantic import BaseModel
+
+# Bump when the rendering output changes so stale disk entries are ignored
+RENDER_CACHE_VERSION = "1"
+
+
+def cache_key(options: BaseModel) -> str:
+    """
+    Canonical content hash of the render options.
+
+    Keys are sorted and colors lower-cased so that equivalent requests
+    (e.g. "#FFFFFF" and "#ffffff") share one entry.
+    """
+    data = options.model_dump()
+    for name, value in data.items():
+        if name.endswith("_color") and isinstance(value, str):
+            data[name] = value.lower()
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{RENDER_CACHE_VERSION}:{canonical}".encode()).hexdigest()
+
+
+class RenderCache:
+    """
+    Two-tier cache of encoded QR images keyed by cache_key().
+
+    The memory tier is an LRU bounded by the total size of the stored
+    images. The optional disk tier stores one file per key under disk_dir,
+    so several worker processes on the same host can share renders. It is
+    kept to about disk_max_bytes: once a process's writes may have taken
+    it past that, a background sweep deletes the least recently used
+    files (by mtime, which disk hits refresh) down to 90% of it. Each
+    process only counts its own writes between sweeps, so with several
+    processes the directory can overshoot by a little per process.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Size of the disk tier at the last sweep (None until the first one)
+        # and bytes this process has written since
+        self._disk_bytes: Optional[int] = None
+        self._disk_written = 0
+        self._sweeper: Optional[threading.Thread] = None
+
+        # Metrics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "RenderCache":
+        return cls(
+            max_bytes=int(os.environ.get("RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            disk_dir=os.environ.get("RENDER_CACHE_DIR") or None,
+            disk_max_bytes=int(os.environ.get("RENDER_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024))),
+        )
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Recently used, so swept last
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, data: bytes) -> None:
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so readers never see partial files
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_written += len(data)
+            over = self._disk_bytes is None or self._disk_bytes + self._disk_written > self.disk_max_bytes
+            if not over or (self._sweeper is not None and self._sweeper.is_alive()):
+                return
+            self._sweeper = threading.Thread(target=self.sweep_disk, name="render-cache-sweep", daemon=True)
+            self._sweeper.start()
+
+    def sweep_disk(self) -> None:
+        """Delete the least recently used disk entries until the tier is under 90% of disk_max_bytes."""
+        with self._lock:
+            written = self._disk_written
+        files = []
+        for shard in os.scandir(self.disk_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                # mkstemp files are still being written by some process
+                if entry.name.startswith("tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        if total > self.disk_max_bytes:
+            files.sort()
+            for _, size, path in files:
+                if total <= self.disk_max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                evicted += 1
+        with self._lock:
+            self._disk_bytes = total
+            # Writes made while sweeping may not have been seen
+            self._disk_written -= written
+            self.disk_evictions += evicted
+
+    def _store(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.disk_dir:
+            data = self._read_disk(key)
+            if data is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._store(key, data)
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        self._store(key, data)
+        if self.disk_dir:
+            self._write_disk(key, data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_enabled": bool(self.disk_dir),
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes,
+                "disk_evictions": self.disk_evictions,
+            }
@@ -0,0 +1,186 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+from . import logs
+
+
+class RenderQueueFull(Exception):
+    """Raised when the render queue is at capacity."""
+
+
+class RenderThrottled(Exception):
+    """Raised when a user already has too many renders in flight."""
+
+
+class RenderTimeout(Exception):
+    """Raised when a render does not finish within the per-request timeout."""
+
+
+def render_qr(options) -> bytes:
+    """
+    rendering.render_qr_bytes, imported on first use by whichever process
+    runs it, so submitting renders does not load PIL, qrcode or NumPy.
+    """
+    from .rendering import render_qr_bytes
+
+    return render_qr_bytes(options)
+
+
+def _warm_worker() -> None:
+    # Import the rendering stack and build the style masks for the default
+    # box size once per worker instead of on the first job
+    from . import rendering, styles
+
+    logs.configure_logging()
+
+    styles.warm(rendering.QRCodeOptions.model_fields["box_size"].default)
+
+
+def _warm_render() -> int:
+    # One small render loads the PIL encoders and the QR matrix code paths
+    from .options import QRCodeOptions
+
+    render_qr(QRCodeOptions(url="https://example.com", fill_color="#000000", back_color="#ffffff"))
+    return os.getpid()
+
+
+class RenderExecutor:
+    """
+    Runs CPU-bound rendering off the event loop with bounded admission.
+
+    mode is "process" (default, sidesteps the GIL for the pure-Python
+    drawing code), "thread" or "inline" (render on the event loop, the
+    previous behaviour, kept for benchmarking). At most workers + max_queue
+    renders are admitted at once; further submissions fail fast with
+    RenderQueueFull rather than queueing without bound. At most
+    max_per_key are in flight for any one key, e.g. a user
+    (RenderThrottled), so one client cannot take every worker and queue
+    slot and the wait of everyone else stays about one render long.
+    """
+
+    def __init__(
+        self,
+        mode: str = "process",
+        workers: Optional[int] = None,
+        max_queue: int = 64,
+        timeout: float = 10.0,
+        max_per_key: Optional[int] = None,
+    ):
+        if mode not in ("process", "thread", "inline"):
+            raise ValueError(f"Unknown render executor mode: {mode}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_per_key = max_per_key or max(2, self.workers // 2)
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._in_flight: Dict[str, int] = {}
+
+        # Metrics
+        self.completed = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_env(cls) -> "RenderExecutor":
+        workers = os.environ.get("RENDER_WORKERS")
+        max_per_key = os.environ.get("RENDER_MAX_PER_KEY")
+        return cls(
+            mode=os.environ.get("RENDER_EXECUTOR", "process"),
+            workers=int(workers) if workers else None,
+            max_queue=int(os.environ.get("RENDER_MAX_QUEUE", "64")),
+            timeout=float(os.environ.get("RENDER_TIMEOUT", "10")),
+            max_per_key=int(max_per_key) if max_per_key else None,
+        )
+
+    def start(self) -> None:
+        if self.mode == "process":
+            # spawn avoids forking a process that already runs DB threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+            )
+        elif self.mode == "thread":
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="render"
+            )
+
+    async def warm(self) -> None:
+        """
+        Start every worker and render a sample code on each, so the first
+        requests do not pay for process start-up, imports and style masks.
+        """
+        if self.mode != "process":
+            # Threads and inline renders share this process's masks
+            _warm_worker()
+        if self._executor is None:
+            _warm_render()
+            return
+        loop = asyncio.get_running_loop()
+        # Workers are started on demand; concurrent jobs start all of them
+        await asyncio.gather(
+            *(loop.run_in_executor(self._executor, _warm_render) for _ in range(self.workers))
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def submit(self, fn: Callable, *args, keys: Iterable[str] = ()):
+        """Run fn(*args) on the render pool, enforcing queue and per-key bounds and timeout."""
+        keys = list(keys)
+        if any(self._in_flight.get(key, 0) >= self.max_per_key for key in keys):
+            self.throttled += 1
+            raise RenderThrottled()
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise RenderQueueFull()
+
+        self._pending += 1
+        for key in keys:
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            if self._executor is None:
+                result = fn(*args)
+            else:
+                loop = asyncio.get_running_loop()
+                # Worker logs keep the request id and debug sampling decision
+                future = loop.run_in_executor(
+                    self._executor, logs.call_in_context, logs.current_context(), fn, *args
+                )
+                try:
+                    # A process worker cannot be interrupted; on timeout the job
+                    # finishes in the background but its result is discarded.
+                    result = await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise RenderTimeout()
+            self.completed += 1
+            return result
+        finally:
+            self._pending -= 1
+            for key in keys:
+                if self._in_flight[key] <= 1:
+                    del self._in_flight[key]
+                else:
+                    self._in_flight[key] -= 1
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "max_per_key": self.max_per_key,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "timeouts": self.timeouts,
+        }
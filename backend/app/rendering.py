@@ -0,0 +1,364 @@
+import logging
+import qrcode
+import io
+from PIL import Image, ImageDraw
+from qrcode.image.styles.colormasks import SolidFillColorMask
+from qrcode.image.styledpil import StyledPilImage
+from qrcode.image.styles.moduledrawers.pil import RoundedModuleDrawer
+
+
+##### custom rounded eye factory.
+
+import abc
+from typing import TYPE_CHECKING, Any, Union
+from qrcode.exceptions import DataOverflowError
+from qrcode.main import QRCode
+from . import fast_render, logs, matrix, metrics, styles, svg_render
+# Re-exported: the request-side types live in options so the web process can skip this module
+from .options import QRCodeOptions, RenderError, check_image_size
+
+if TYPE_CHECKING:
+    from qrcode.image.base import BaseImage
+    from qrcode.main import ActiveWithNeighbors, QRCode
+
+
+class BaseEyeDrawer(abc.ABC):
+    needs_processing = True
+    needs_neighbors = False
+    factory: "StyledPilImage2"
+
+    def initialize(self, img: "BaseImage") -> None:
+        self.img = img
+
+    def draw(self):
+        (nw_eye_top, _), (_, nw_eye_bottom) = (
+            self.factory.pixel_box(0, 0),
+            self.factory.pixel_box(6, 6),
+        )
+        (nw_eyeball_top, _), (_, nw_eyeball_bottom) = (
+            self.factory.pixel_box(2, 2),
+            self.factory.pixel_box(4, 4),
+        )
+        self.draw_nw_eye((nw_eye_top, nw_eye_bottom))
+        self.draw_nw_eyeball((nw_eyeball_top, nw_eyeball_bottom))
+
+        (ne_eye_top, _), (_, ne_eye_bottom) = (
+            self.factory.pixel_box(0, self.factory.width - 7),
+            self.factory.pixel_box(6, self.factory.width - 1),
+        )
+        (ne_eyeball_top, _), (_, ne_eyeball_bottom) = (
+            self.factory.pixel_box(2, self.factory.width - 5),
+            self.factory.pixel_box(4, self.factory.width - 3),
+        )
+        self.draw_ne_eye((ne_eye_top, ne_eye_bottom))
+        self.draw_ne_eyeball((ne_eyeball_top, ne_eyeball_bottom))
+
+        (sw_eye_top, _), (_, sw_eye_bottom) = (
+            self.factory.pixel_box(self.factory.width - 7, 0),
+            self.factory.pixel_box(self.factory.width - 1, 6),
+        )
+        (sw_eyeball_top, _), (_, sw_eyeball_bottom) = (
+            self.factory.pixel_box(self.factory.width - 5, 2),
+            self.factory.pixel_box(self.factory.width - 3, 4),
+        )
+        self.draw_sw_eye((sw_eye_top, sw_eye_bottom))
+        self.draw_sw_eyeball((sw_eyeball_top, sw_eyeball_bottom))
+
+    @abc.abstractmethod
+    def draw_nw_eye(self, position): ...
+
+    @abc.abstractmethod
+    def draw_nw_eyeball(self, position): ...
+
+    @abc.abstractmethod
+    def draw_ne_eye(self, position): ...
+
+    @abc.abstractmethod
+    def draw_ne_eyeball(self, position): ...
+
+    @abc.abstractmethod
+    def draw_sw_eye(self, position): ...
+
+    @abc.abstractmethod
+    def draw_sw_eyeball(self, position): ...
+
+
+class CustomEyeDrawer(BaseEyeDrawer):
+    def initialize(self, img: "BaseImage") -> None:
+        super().initialize(img)
+        # One ImageDraw for all six shapes instead of one per shape
+        self.img_draw = ImageDraw.Draw(img)
+
+    def draw_nw_eye(self, position):
+        self.img_draw.rounded_rectangle(
+            position,
+            fill=None,
+            width=self.factory.box_size,
+            outline="black",
+            radius=self.factory.box_size * 2,
+            corners=[True, True, True, True],
+        )
+
+    def draw_nw_eyeball(self, position):
+        self.img_draw.rounded_rectangle(
+            position,
+            fill=True,
+            outline="black",
+            radius=self.factory.box_size,
+            corners=[True, True, True, True],
+        )
+
+    def draw_ne_eye(self, position):
+        self.img_draw.rounded_rectangle(
+            position,
+            fill=None,
+            width=self.factory.box_size,
+            outline="black",
+            radius=self.factory.box_size * 2,
+            corners=[True, True, True, True],
+        )
+
+    def draw_ne_eyeball(self, position):
+        self.img_draw.rounded_rectangle(
+            position,
+            fill=True,
+            outline="black",
+            radius=self.factory.box_size,
+            corners=[True, True, True, True],
+        )
+
+    def draw_sw_eye(self, position):
+        self.img_draw.rounded_rectangle(
+            position,
+            fill=None,
+            width=self.factory.box_size,
+            outline="black",
+            radius=self.factory.box_size * 2,
+            corners=[True, True, True, True],
+        )
+
+    def draw_sw_eyeball(self, position):
+        self.img_draw.rounded_rectangle(
+            position,
+            fill=True,
+            outline="black",
+            radius=self.factory.box_size,
+            corners=[True, True, True, True],
+        )
+
+
+class StyledPilImage2(StyledPilImage):
+    def drawrect_context(self, row: int, col: int, qr: QRCode[Any]):
+        box = self.pixel_box(row, col)
+        if self.is_eye(row, col):
+            drawer = self.eye_drawer
+            if getattr(self.eye_drawer, "needs_processing", False):
+                return
+        else:
+            drawer = self.module_drawer
+
+        is_active: Union[bool, ActiveWithNeighbors] = (
+            qr.active_with_neighbors(row, col)
+            if drawer.needs_neighbors
+            else bool(qr.modules[row][col])
+        )
+
+        drawer.drawrect(box, is_active)
+
+    def process(self) -> None:
+        if getattr(self.eye_drawer, "needs_processing", False):
+            self.eye_drawer.factory = self
+            self.eye_drawer.draw()
+        super().process()
+
+
+
+
+
+
+
+
+class RoundedEyeDrawer(RoundedModuleDrawer):
+    def draw(self, box, image, fill_color):
+        """
+        Draw a rounded rectangle for the QR eye using the given box dimensions.
+        This overrides the default square drawing.
+        """
+        draw = ImageDraw.Draw(image)
+        # Calculate a suitable radius based on the box size
+        radius = (box[2] - box[0]) // 4  # adjust this fraction as needed
+        draw.rounded_rectangle(box, radius=radius, fill=fill_color)
+
+
+# The built-in styles are registered in options
+svg_render.EYE_PATHS[CustomEyeDrawer] = svg_render.rounded_eyes
+
+
+logger = logging.getLogger(__name__)
+
+
+# Function to convert hex color to RGB tuple
+def hex_to_rgb(hex_color: str) -> tuple:
+    """Convert hex color string to RGB tuple"""
+    # Remove the '#' if present
+    hex_color = hex_color.lstrip('#')
+    # Convert hex to RGB
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+def make_qr(options: QRCodeOptions) -> QRCode:
+    """Build and fit a QRCode for the options' URL, for rendering through qrcode itself."""
+    qr = qrcode.QRCode(
+        version=options.version,
+        error_correction=matrix.ERROR_CORRECTION[options.error_correction],
+        box_size=options.box_size,
+        border=options.border,
+    )
+    qr.add_data(options.url)
+    try:
+        with metrics.stage("qr_make"):
+            qr.make(fit=options.version is None)
+    except (DataOverflowError, ValueError):
+        # qrcode raises ValueError when no version up to 40 fits
+        raise RenderError(status_code=400, detail=data_overflow_detail(options))
+    return qr
+
+def data_overflow_detail(options: QRCodeOptions) -> str:
+    if options.version is None:
+        return "The URL is too long for a QR code at this error correction level"
+    return f"The URL does not fit in a version {options.version} QR code at this error correction level"
+
+def qr_matrix(options: QRCodeOptions) -> matrix.PackedMatrix:
+    """
+    The module matrix for the options' URL, encoded once per URL and error
+    correction level. Raises RenderError before anything is drawn if the
+    image would be too large.
+    """
+    try:
+        packed = matrix.cache.get(options.url, options.error_correction, options.version)
+    except (DataOverflowError, ValueError):
+        raise RenderError(status_code=400, detail=data_overflow_detail(options))
+    check_image_size(options, packed.width)
+    return packed
+
+def get_drawers(options: QRCodeOptions):
+    """Return new (module_drawer, eye_drawer) instances for the options' styles."""
+    try:
+        module_drawer = styles.create_drawer("dot", options.dot_style)
+        eye_drawer = styles.create_drawer("eye", options.eye_style)
+    except styles.UnknownStyle:
+        logger.error("Invalid style - Dot: %s, Eye: %s", options.dot_style, options.eye_style)
+        raise RenderError(status_code=400, detail="Invalid style options")
+
+    if logs.debug_enabled(logger):
+        logger.debug("Using styles - Module: %s, Eye: %s", type(module_drawer).__name__, type(eye_drawer).__name__)
+    return module_drawer, eye_drawer
+
+def render_qr_image(options: QRCodeOptions, palette: bool = False) -> Image.Image:
+    """
+    Render the styled QR code with the vectorized sprite renderer, as an
+    RGB image or, with palette=True, a palette image of the colours used.
+    """
+    # Convert hex colors to RGB tuples
+    fill_color_rgb = hex_to_rgb(options.fill_color)
+    back_color_rgb = hex_to_rgb(options.back_color)
+    if logs.debug_enabled(logger):
+        logger.debug("Converted colors - Fill: %s, Back: %s", fill_color_rgb, back_color_rgb)
+
+    modules = qr_matrix(options).modules()
+
+    try:
+        # Cached per style and box size; no drawer runs per module or per call
+        dot_sprites = styles.masks("dot", options.dot_style, options.box_size)
+        eye_masks = styles.masks("eye", options.eye_style, options.box_size)
+        whole_eyes = styles.paints_finder_patterns("eye", options.eye_style)
+        with metrics.stage("draw"):
+            coverage = fast_render.render_coverage(
+                modules,
+                dot_sprites,
+                None if whole_eyes else eye_masks,
+                eye_masks if whole_eyes else None,
+                options.box_size,
+                options.border,
+            )
+            if palette:
+                return fast_render.palettize(coverage, fill_color_rgb, back_color_rgb)
+            return fast_render.colorize(coverage, fill_color_rgb, back_color_rgb)
+    except styles.UnknownStyle:
+        raise RenderError(status_code=400, detail="Invalid style options")
+    except Exception as img_error:
+        logger.error("QR generation error: %s", img_error)
+        raise RenderError(status_code=500, detail="QR generation failed")
+
+def render_qr_svg(options: QRCodeOptions) -> bytes:
+    """Render the styled QR code as an SVG document."""
+    modules = qr_matrix(options).modules()
+    try:
+        module_drawer = styles.drawer("dot", options.dot_style)
+        eye_drawer = styles.drawer("eye", options.eye_style)
+    except styles.UnknownStyle:
+        raise RenderError(status_code=400, detail="Invalid style options")
+    if not (svg_render.supports(module_drawer) and svg_render.supports(eye_drawer)):
+        raise RenderError(status_code=400, detail="These styles are not available as SVG")
+    try:
+        with metrics.stage("draw"):
+            return svg_render.render_svg(
+                modules, module_drawer, eye_drawer, options.box_size, options.border,
+                options.fill_color.lower(), options.back_color.lower(),
+            )
+    except Exception as img_error:
+        logger.error("QR generation error: %s", img_error)
+        raise RenderError(status_code=500, detail="QR generation failed")
+
+def render_qr_image_styled(options: QRCodeOptions) -> Image.Image:
+    """
+    Render through qrcode's StyledPilImage2, one drawer call per module.
+    Kept as the reference output for render_qr_image.
+    """
+    fill_color_rgb = hex_to_rgb(options.fill_color)
+    back_color_rgb = hex_to_rgb(options.back_color)
+    qr = make_qr(options)
+    module_drawer, eye_drawer = get_drawers(options)
+
+    # Generate the QR code image with styling
+    try:
+        qr_image = qr.make_image(
+            image_factory=StyledPilImage2,
+            module_drawer=module_drawer,
+            eye_drawer=eye_drawer,
+            color_mask=SolidFillColorMask(
+                front_color=fill_color_rgb,
+                back_color=back_color_rgb
+            )
+        )
+    except Exception as img_error:
+        logger.error("QR generation error: %s", img_error)
+        raise RenderError(status_code=500, detail="QR generation failed")
+    return qr_image.get_image()
+
+# Renders the QR code and encodes it in options.format
+def render_qr_bytes(options: QRCodeOptions) -> bytes:
+    if options.format == "svg":
+        return render_qr_svg(options)
+
+    qr_image = render_qr_image(options, palette=options.format == "png-palette")
+
+    # Encode QR image; QR codes must stay sharp, so WebP is always lossless
+    try:
+        buffered = io.BytesIO()
+        with metrics.stage("encode"):
+            if options.format == "webp":
+                qr_image.save(
+                    buffered,
+                    format="WEBP",
+                    lossless=True,
+                    quality=round(options.compression * 100 / 9),
+                    # Methods 5-6 cost 10-100x the time for under 1% smaller files
+                    method=min(4, round(options.compression * 6 / 9)),
+                )
+            else:
+                qr_image.save(buffered, format="PNG", compress_level=options.compression)
+    except Exception as conv_error:
+        logger.error("Image conversion failed: %s", conv_error)
+        raise RenderError(status_code=500, detail="Failed to convert QR image")
+
+    return buffered.getvalue()
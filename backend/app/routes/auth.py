@@ -0,0 +1,111 @@
+import logging
+from datetime import timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from pydantic import BaseModel
+
+from .. import metrics, services
+from ..auth import create_access_token, get_password_hash, verify_and_rehash
+from ..db import ConnectionPool, PoolTimeout, duplicate_key
+from ..dependencies import get_db
+from ..queries import fetch_user_by_username, insert_user, update_password_hash
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+class UserCreate(BaseModel):
+    username: str
+    email: str
+    password: str
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+
+# Signup errors by the UNIQUE key a duplicate insert violates. When both
+# are taken MySQL reports the first key, so username wins as before.
+SIGNUP_CONFLICTS = {
+    "username": "This username is already taken",
+    "email": "An account with this email already exists",
+}
+
+# Keys limiting how many hashes one account or client address can have in
+# flight (HASH_MAX_PER_KEY and HASH_MAX_PER_IP). Behind a proxy listed in
+# FORWARDED_ALLOW_IPS the server sets request.client from X-Forwarded-For.
+def hash_keys(request: Request, username: str) -> tuple:
+    client = request.client.host if request.client else "unknown"
+    return (f"user:{username.lower()}", f"ip:{client}")
+
+@router.post("/api/signup", response_model=Token)
+async def signup(user: UserCreate, request: Request, db: ConnectionPool = Depends(get_db)):
+    with metrics.stage("password_hash"):
+        hashed_password = await services.hash_executor.submit(
+            get_password_hash, user.password, keys=hash_keys(request, user.username)
+        )
+
+    # A single INSERT; the UNIQUE constraints on username and email reject
+    # duplicates atomically, even for concurrent signups
+    try:
+        user_id = await db.run(insert_user, user.username, user.email, hashed_password)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        conflict = SIGNUP_CONFLICTS.get(duplicate_key(e))
+        if conflict:
+            raise HTTPException(
+                status_code=400,
+                detail=conflict
+            )
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to create account. Please try again."
+        )
+    
+    # Generate JWT token for the new user
+    access_token = create_access_token(
+        data={"sub": user.username, "uid": user_id},
+        expires_delta=timedelta(minutes=30)
+    )
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@router.post("/api/login", response_model=Token)
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: ConnectionPool = Depends(get_db)):
+    # Check if user exists in database
+    user = await db.run(fetch_user_by_username, form_data.username)
+    
+    # Return error if username not found
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Username not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Verify password against stored hash
+    with metrics.stage("password_verify"):
+        valid, new_hash = await services.hash_executor.submit(
+            verify_and_rehash, form_data.password, user["password_hash"],
+            keys=hash_keys(request, form_data.username),
+        )
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Upgrade hashes made with an old work factor; the login succeeds regardless
+    if new_hash:
+        try:
+            await db.run(update_password_hash, user["id"], new_hash)
+        except Exception as e:
+            logger.warning("Password rehash failed for user %s: %s", user["id"], e)
+    
+    # Generate JWT token for successful login
+    access_token = create_access_token(
+        data={"sub": user["username"], "uid": user["id"]},
+        expires_delta=timedelta(minutes=30)
+    )
+    return {"access_token": access_token, "token_type": "bearer"}
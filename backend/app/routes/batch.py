@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from .. import services
+from ..auth import Principal
+from ..batch import BatchInputError, ZipStream, open_zip, parse_batch, render_unordered
+from ..db import ConnectionPool
+from ..dependencies import get_current_user, get_db
+from ..options import IMAGE_FORMATS, QRCodeOptions, RenderError
+from ..queries import insert_qr_codes
+from ..render_pool import RenderQueueFull, RenderThrottled
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Upper bound on the number of codes accepted by one batch request
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "10000"))
+# Seconds a batch item waits for room in the render pool before it is
+# reported as failed, and codes saved per transaction with save=true
+BATCH_ADMISSION_TIMEOUT = float(os.environ.get("BATCH_ADMISSION_TIMEOUT", "30"))
+BATCH_SAVE_CHUNK = int(os.environ.get("BATCH_SAVE_CHUNK", "100"))
+
+# Endpoint to render many QR codes in one request, streaming results as they finish
+@router.post("/api/qr/batch")
+async def batch_qr(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|zip)$"),
+    save: bool = False,
+    current_user: Principal = Depends(get_current_user),
+    db: ConnectionPool = Depends(get_db)
+):
+    try:
+        items = parse_batch(await request.body(), request.headers.get("content-type", ""))
+    except BatchInputError as e:
+        raise HTTPException(status_code=422, detail=e.detail)
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {BATCH_MAX_ITEMS} QR codes")
+    # Every code costs a render token, as if sent separately
+    await services.rate_limiter.check("render", str(current_user.user_id), cost=len(items))
+
+    # Keep the render workers busy without tripping the queue limit, within
+    # this user's share of them
+    window = max(1, min(
+        services.render_executor.workers * 2,
+        services.render_executor.workers + services.render_executor.max_queue,
+        services.render_executor.max_per_key,
+    ))
+
+    async def render(options: QRCodeOptions) -> bytes:
+        # A full render pool is backpressure from all traffic, not a problem
+        # with the item: wait for room instead of failing it
+        deadline = time.monotonic() + BATCH_ADMISSION_TIMEOUT
+        delay = 0.05
+        while True:
+            try:
+                return await services.render_image(options, current_user.user_id)
+            except (RenderQueueFull, RenderThrottled):
+                if time.monotonic() + delay > deadline:
+                    raise RenderError(503, "Too many QR codes are being rendered, please retry")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 1.0)
+
+    # With save=true codes are inserted BATCH_SAVE_CHUNK at a time as they
+    # finish, so only one chunk of images is held; each chunk commits on its own
+    totals = {"saved": 0, "unsaved": 0}
+
+    async def persist(rows: list) -> None:
+        if not rows:
+            return
+        try:
+            totals["saved"] += await db.run(insert_qr_codes, current_user.user_id, rows)
+        except Exception as db_error:
+            logger.error("Batch insert failed: %s", db_error)
+            totals["unsaved"] += len(rows)
+        rows.clear()
+
+    def saved_summary() -> dict:
+        if not save:
+            return {}
+        summary = {"saved": totals["saved"]}
+        if totals["unsaved"]:
+            summary.update(unsaved=totals["unsaved"], error="Database operation failed")
+        return summary
+
+    async def stream_ndjson():
+        rows, failed = [], 0
+        async for index, image, error in render_unordered(items, render, window):
+            if error:
+                failed += 1
+                yield json.dumps({"index": index, "error": error}) + "\n"
+                continue
+            if save:
+                rows.append((items[index], image))
+                if len(rows) >= BATCH_SAVE_CHUNK:
+                    await persist(rows)
+            yield json.dumps({
+                "index": index,
+                "url": items[index].url,
+                "qr_code": services.data_url(items[index], image),
+            }) + "\n"
+        await persist(rows)
+        summary = {"done": True, "rendered": len(items) - failed, "failed": failed}
+        summary.update(saved_summary())
+        yield json.dumps(summary) + "\n"
+
+    async def stream_zip():
+        stream = ZipStream()
+        rows, manifest = [], []
+        with open_zip(stream) as archive:
+            async for index, image, error in render_unordered(items, render, window):
+                if error:
+                    manifest.append({"index": index, "url": items[index].url, "error": error})
+                    continue
+                _, extension = IMAGE_FORMATS[items[index].format]
+                name = f"qr_{index:05d}.{extension}"
+                archive.writestr(name, image)
+                manifest.append({"index": index, "url": items[index].url, "file": name})
+                if save:
+                    rows.append((items[index], image))
+                    if len(rows) >= BATCH_SAVE_CHUNK:
+                        await persist(rows)
+                yield stream.drain()
+            await persist(rows)
+            summary = {"items": sorted(manifest, key=lambda item: item["index"])}
+            summary.update(saved_summary())
+            archive.writestr("manifest.json", json.dumps(summary))
+        yield stream.drain()
+
+    if format == "zip":
+        return StreamingResponse(
+            stream_zip(),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="qr_codes.zip"'},
+        )
+    return StreamingResponse(stream_ndjson(), media_type="application/x-ndjson")
@@ -0,0 +1,129 @@
+import logging
+import os
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel
+
+from .. import db as database
+from .. import services
+from ..auth import Principal
+from ..db import ConnectionPool, PoolTimeout, duplicate_key
+from ..dependencies import api_user, get_db, render_user
+from ..options import QRCodeOptions
+from ..queries import fetch_link, fetch_user_link, insert_dynamic_qr_code, update_link_destination
+from ..redirects import new_slug, valid_destination
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Dynamic codes encode REDIRECT_BASE_URL/r/{slug} (by default the address the
+# API was called on); the destination is kept in qr_links and can be changed
+REDIRECT_BASE_URL = os.environ.get("REDIRECT_BASE_URL", "").rstrip("/")
+
+class DynamicQRUpdate(BaseModel):
+    url: str
+
+def short_url(request: Request, slug: str) -> str:
+    return f"{REDIRECT_BASE_URL or str(request.base_url).rstrip('/')}/r/{slug}"
+
+def link_response(request: Request, link: dict) -> dict:
+    link = dict(link)
+    link["short_url"] = short_url(request, link["slug"])
+    # Scans this process has counted but not written yet
+    link["scans"] = int(link["scans"]) + services.scan_counter.pending(link["slug"])
+    for name in ("last_scan_at", "created_at", "updated_at"):
+        if isinstance(link[name], datetime):
+            link[name] = link[name].isoformat()
+    return link
+
+# Creates a dynamic code: the image encodes a short URL that redirects to options.url
+@router.post("/api/qr/dynamic", response_class=ORJSONResponse)
+async def create_dynamic_qr(
+    options: QRCodeOptions,
+    request: Request,
+    current_user: Principal = Depends(render_user),
+    db: ConnectionPool = Depends(get_db)
+):
+    if not valid_destination(options.url):
+        raise HTTPException(status_code=422, detail="url must be an absolute http or https URL")
+
+    # Slugs are random, so a collision is unlikely; the image encodes the
+    # slug, so one means rendering again
+    for attempt in range(3):
+        slug = new_slug()
+        encoded = options.model_copy(update={"url": short_url(request, slug)})
+        image = await services.render_image(encoded, current_user.user_id)
+        try:
+            qr_id = await db.run(insert_dynamic_qr_code, current_user.user_id, slug, options.url, encoded, image)
+            break
+        except PoolTimeout:
+            raise
+        except Exception as db_error:
+            if duplicate_key(db_error) == "slug" and attempt < 2:
+                continue
+            logger.error("Database operation failed: %s", db_error)
+            raise HTTPException(status_code=500, detail="Database operation failed")
+
+    services.redirect_cache.put(slug, options.url, qr_id)
+    return {
+        "id": qr_id,
+        "slug": slug,
+        "short_url": encoded.url,
+        "url": options.url,
+        "qr_code": services.data_url(encoded, image),
+    }
+
+# A dynamic code's destination and scan count
+@router.get("/api/qr/dynamic/{slug}", response_class=ORJSONResponse)
+async def get_dynamic_qr(
+    slug: str,
+    request: Request,
+    current_user: Principal = Depends(api_user),
+    db: ConnectionPool = Depends(get_db)
+):
+    link = await db.run(fetch_user_link, current_user.user_id, slug)
+    if link is None:
+        raise HTTPException(status_code=404, detail="QR code not found")
+    return link_response(request, link)
+
+# Changes where a dynamic code leads; the image stays valid
+@router.put("/api/qr/dynamic/{slug}", response_class=ORJSONResponse)
+async def update_dynamic_qr(
+    slug: str,
+    update: DynamicQRUpdate,
+    request: Request,
+    current_user: Principal = Depends(api_user),
+    db: ConnectionPool = Depends(get_db)
+):
+    if not valid_destination(update.url):
+        raise HTTPException(status_code=422, detail="url must be an absolute http or https URL")
+    try:
+        found = await db.run(update_link_destination, current_user.user_id, slug, update.url)
+    except PoolTimeout:
+        raise
+    except Exception as db_error:
+        logger.error("Database operation failed: %s", db_error)
+        raise HTTPException(status_code=500, detail="Database operation failed")
+    if not found:
+        raise HTTPException(status_code=404, detail="QR code not found")
+    # Loaded again on the next scan; other worker processes pick the change
+    # up within REDIRECT_CACHE_TTL
+    services.redirect_cache.invalidate(slug)
+    return {"slug": slug, "short_url": short_url(request, slug), "url": update.url}
+
+async def load_link(slug: str) -> Optional[tuple]:
+    return await database.pool.run(fetch_link, slug)
+
+# Where a scanned dynamic code lands. A cached slug is answered without the
+# database; the scan is counted in memory and written later in a batch.
+@router.get("/r/{slug}", include_in_schema=False)
+async def follow_dynamic_qr(slug: str):
+    destination = await services.redirect_cache.get(slug, load_link) if len(slug) <= 32 else None
+    if destination is None:
+        return JSONResponse(status_code=404, content={"detail": "QR code not found"})
+    services.scan_counter.add(slug)
+    return Response(status_code=302, headers={"Location": destination, "Cache-Control": "no-store"})
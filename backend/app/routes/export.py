@@ -0,0 +1,102 @@
+import base64
+import json
+import os
+import tempfile
+import time
+import zipfile
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ..auth import Principal
+from ..batch import ZipStream, open_zip
+from ..db import ConnectionPool
+from ..dependencies import api_user, get_db
+from ..options import IMAGE_FORMATS
+from ..queries import iter_user_qr_export
+from ..storage import media_type
+
+router = APIRouter()
+
+# Rows fetched per step of an export, and exports allowed at once. Each
+# running export keeps one pooled connection for as long as it streams.
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "100"))
+EXPORT_MAX_CONCURRENT = int(os.environ.get("EXPORT_MAX_CONCURRENT", "2"))
+exports_running = 0
+
+class ExportResponse(StreamingResponse):
+    """Streaming response that frees its export slot once sent, however it ends."""
+
+    async def __call__(self, scope, receive, send):
+        global exports_running
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            exports_running -= 1
+
+# File extension of each stored image type in ZIP exports
+EXPORT_EXTENSIONS = {mime: extension for mime, extension in IMAGE_FORMATS.values()}
+
+# Streams every code of the user, as NDJSON with base64 images or as a ZIP of
+# the images plus manifest.ndjson. Memory stays at about one chunk of rows
+# whatever the library size.
+@router.get("/api/qr/export")
+async def export_qr_codes(
+    format: str = Query("ndjson", pattern="^(ndjson|zip)$"),
+    current_user: Principal = Depends(api_user),
+    db: ConnectionPool = Depends(get_db)
+):
+    global exports_running
+    if exports_running >= EXPORT_MAX_CONCURRENT:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Too many exports in progress, please retry"},
+            headers={"Retry-After": "5"},
+        )
+    # Taken here, before anything is awaited, so concurrent requests cannot
+    # all pass the check; ExportResponse gives it back
+    exports_running += 1
+
+    async def chunks():
+        async for rows in db.stream(iter_user_qr_export, current_user.user_id, EXPORT_CHUNK_ROWS):
+            yield rows
+
+    async def stream_ndjson():
+        async for rows in chunks():
+            lines = []
+            for row in rows:
+                image = row.pop("image")
+                row["image"] = base64.b64encode(image).decode() if image is not None else None
+                lines.append(json.dumps(row))
+            yield "\n".join(lines) + "\n"
+
+    async def stream_zip():
+        stream = ZipStream()
+        # zipfile keeps every entry's record for the central directory until
+        # the end; sharing one timestamp keeps those small
+        written = time.localtime()[:6]
+        # Spills to disk past 1 MB, so a large manifest does not stay in memory
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+b") as manifest:
+            with open_zip(stream) as archive:
+                async for rows in chunks():
+                    for row in rows:
+                        image = row.pop("image")
+                        if image is not None:
+                            row["file"] = f"qr_{row['id']}.{EXPORT_EXTENSIONS[media_type(image)]}"
+                            archive.writestr(zipfile.ZipInfo(row["file"], written), image)
+                        manifest.write(json.dumps(row).encode() + b"\n")
+                    yield stream.drain()
+                manifest.seek(0)
+                with archive.open("manifest.ndjson", "w") as entry:
+                    for block in iter(lambda: manifest.read(64 * 1024), b""):
+                        entry.write(block)
+                        yield stream.drain()
+            yield stream.drain()
+
+    if format == "zip":
+        return ExportResponse(
+            stream_zip(),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="qr_export.zip"'},
+        )
+    return ExportResponse(stream_ndjson(), media_type="application/x-ndjson")
@@ -0,0 +1,296 @@
+import email.utils
+import logging
+import os
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel
+
+from .. import logs, services
+from ..auth import Principal
+from ..db import ConnectionPool, PoolTimeout
+from ..dependencies import api_user, get_db, render_user
+from ..jobs import JobQueueFull
+from ..options import QRCodeOptions
+from ..pagination import InvalidPageRequest, decode_cursor, parse_fields
+from ..queries import (
+    delete_user_qr_code, delete_user_qr_codes, delete_user_qr_codes_before,
+    fetch_qr_image, fetch_qr_status, fetch_user_qr_page, insert_pending_qr_code, insert_qr_code,
+)
+from ..render_cache import cache_key
+from ..storage import media_type
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def parse_etags(header: Optional[str]) -> set:
+    """Entity tags from an If-None-Match header, without quotes or W/ prefixes."""
+    if not header:
+        return set()
+    return {tag.strip().removeprefix("W/").strip('"') for tag in header.split(",")}
+
+# Endpoint to generate QR code without saving to the database
+@router.post("/api/qr/create", response_class=ORJSONResponse)
+async def generate_qr(
+    options: QRCodeOptions,
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(render_user)
+):
+    # Note: This endpoint only returns the generated QR code.
+    # The response depends on the options alone, so their hash is its ETag
+    # and a client revalidating with If-None-Match skips the render.
+    digest = cache_key(options)
+    response.headers["ETag"] = f'"{digest}"'
+    etags = parse_etags(request.headers.get("if-none-match"))
+    if digest in etags or "*" in etags:
+        return Response(status_code=304, headers={"ETag": f'"{digest}"'})
+
+    image = await services.render_image(options, current_user.user_id)
+    return {
+        "qr_code": services.data_url(options, image),
+        "url": options.url
+    }
+
+# New endpoint to save the generated QR code to the database
+@router.post("/api/qr/save", response_class=ORJSONResponse)
+async def save_qr(
+    options: QRCodeOptions,
+    async_render: bool = Query(False, alias="async"),
+    current_user: Principal = Depends(render_user),
+    db: ConnectionPool = Depends(get_db)
+):
+    if async_render:
+        return await save_qr_later(options, current_user, db)
+
+    # Generate QR code using the same logic
+    image = await services.render_image(options, current_user.user_id)
+    
+    # Database operations to save QR code only when explicitly requested
+    try:
+        await db.run(insert_qr_code, current_user.user_id, options, image)
+    except PoolTimeout:
+        raise
+    except Exception as db_error:
+        logger.error("Database operation failed: %s", db_error)
+        raise HTTPException(status_code=500, detail="Database operation failed")
+
+    if logs.debug_enabled(logger):
+        logger.debug("QR code saved to database successfully")
+
+    return {
+        "qr_code": services.data_url(options, image),
+        "url": options.url,
+        "message": "QR code saved successfully"
+    }
+
+# Saves the code as pending and answers 202; a save worker renders the image
+async def save_qr_later(options: QRCodeOptions, current_user: Principal, db: ConnectionPool):
+    try:
+        qr_id = await db.run(insert_pending_qr_code, current_user.user_id, options)
+    except PoolTimeout:
+        raise
+    except Exception as db_error:
+        logger.error("Database operation failed: %s", db_error)
+        raise HTTPException(status_code=500, detail="Database operation failed")
+
+    try:
+        await services.save_jobs.submit(qr_id)
+    except JobQueueFull:
+        # Nothing will render it, so it must not be left pending
+        await db.run(delete_user_qr_code, current_user.user_id, qr_id)
+        raise
+
+    status_url = f"/api/qr/{qr_id}"
+    return JSONResponse(
+        status_code=202,
+        content={"id": qr_id, "status": "pending", "url": options.url, "status_url": status_url},
+        headers={"Location": status_url},
+    )
+
+# Status of a saved code; pending ones are polled here until ready or failed
+@router.get("/api/qr/{qr_id}", response_class=ORJSONResponse)
+async def get_qr_code(
+    qr_id: int,
+    response: Response,
+    current_user: Principal = Depends(api_user),
+    db: ConnectionPool = Depends(get_db)
+):
+    row = await db.run(fetch_qr_status, current_user.user_id, qr_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="QR code not found")
+
+    error = row.pop("error")
+    if row["status"] == "ready":
+        row["image_url"] = f"/api/qr/{qr_id}/image"
+    elif row["status"] == "failed":
+        row["error"] = error
+    else:
+        response.headers["Retry-After"] = "1"
+    return row
+
+# Cache policy for the list: clients keep it but revalidate on every use
+QR_LIST_CACHE_CONTROL = os.environ.get("QR_LIST_CACHE_CONTROL", "private, no-cache")
+
+@router.get("/api/qr", response_class=ORJSONResponse)
+async def get_user_qr_codes(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: Principal = Depends(api_user),
+    db: ConnectionPool = Depends(get_db)
+):
+    try:
+        after = decode_cursor(cursor) if cursor else None
+        field_names = parse_fields(fields)
+    except InvalidPageRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    etags = parse_etags(request.headers.get("if-none-match"))
+    query = f"{limit}:{cursor or ''}:{','.join(field_names)}"
+    try:
+        # Return QR code metadata; clients fetch each image from its image_url
+        digest, latest, page = await db.run(
+            fetch_user_qr_page, current_user.user_id, limit, after, field_names, etags, query
+        )
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        logger.error("Error retrieving QR codes: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+    # Last-Modified is when the list last changed, to the second only, so
+    # revalidation goes by the ETag
+    headers = {"ETag": f'"{digest}"', "Cache-Control": QR_LIST_CACHE_CONTROL}
+    if isinstance(latest, datetime):
+        if latest.tzinfo is None:
+            latest = latest.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = email.utils.format_datetime(latest, usegmt=True)
+    if page is None:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    qr_codes, next_cursor = page
+
+    # The body stays a plain list; the next page is advertised in headers
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        next_url = f"/api/qr?limit={limit}&cursor={next_cursor}"
+        if fields:
+            next_url += f"&fields={','.join(field_names)}"
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return qr_codes
+
+# Cache policy for QR images. Images of a saved code never change, so clients
+# may keep them; revalidation with If-None-Match is answered without reading them.
+QR_IMAGE_CACHE_CONTROL = os.environ.get("QR_IMAGE_CACHE_CONTROL", "private, max-age=86400")
+
+@router.get("/api/qr/{qr_id}/image")
+async def get_qr_image(
+    qr_id: int,
+    request: Request,
+    current_user: Principal = Depends(api_user),
+    db: ConnectionPool = Depends(get_db)
+):
+    etags = parse_etags(request.headers.get("if-none-match"))
+    result = await db.run(fetch_qr_image, current_user.user_id, qr_id, etags)
+    if result is None:
+        raise HTTPException(status_code=404, detail="QR code not found")
+
+    digest, png = result
+    headers = {"ETag": f'"{digest}"', "Cache-Control": QR_IMAGE_CACHE_CONTROL}
+    if png is None:
+        return Response(status_code=304, headers=headers)
+    return Response(content=png, media_type=media_type(png), headers=headers)
+
+@router.delete("/api/qr/{qr_id}")
+async def delete_qr_code(
+    qr_id: int, 
+    current_user: Principal = Depends(api_user), 
+    db: ConnectionPool = Depends(get_db)
+):
+    try:
+        deleted = await db.run(delete_user_qr_code, current_user.user_id, qr_id)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+    if not deleted:
+        raise HTTPException(
+            status_code=404,
+            detail="QR code not found or you don't have permission to delete it"
+        )
+    # If it was a dynamic code, its short URL stops redirecting here at once;
+    # other worker processes may serve it until REDIRECT_CACHE_TTL runs out
+    services.redirect_cache.invalidate_code(qr_id)
+    
+    return {"message": "QR code deleted successfully"}
+
+# Codes deleted per transaction by DELETE /api/qr, so a large deletion
+# never holds locks on qr_codes for long
+QR_DELETE_CHUNK = int(os.environ.get("QR_DELETE_CHUNK", "500"))
+# Upper bound on the ids accepted by one DELETE /api/qr request
+QR_DELETE_MAX_IDS = int(os.environ.get("QR_DELETE_MAX_IDS", "10000"))
+
+class QRCodeDeletion(BaseModel):
+    ids: Optional[List[int]] = None
+    created_before: Optional[datetime] = None
+
+# Bulk deletion, by id or of every code created before a cutoff. Each chunk
+# commits on its own: after a failure the earlier chunks stay deleted and
+# the request can simply be repeated.
+@router.delete("/api/qr", response_class=ORJSONResponse)
+async def delete_qr_codes(
+    deletion: QRCodeDeletion,
+    current_user: Principal = Depends(api_user),
+    db: ConnectionPool = Depends(get_db)
+):
+    if (deletion.ids is None) == (deletion.created_before is None):
+        raise HTTPException(status_code=400, detail="Give either ids or created_before")
+
+    deleted = []
+    try:
+        if deletion.ids is not None:
+            qr_ids = list(dict.fromkeys(deletion.ids))
+            if len(qr_ids) > QR_DELETE_MAX_IDS:
+                raise HTTPException(status_code=400, detail=f"At most {QR_DELETE_MAX_IDS} ids per request")
+            for start in range(0, len(qr_ids), QR_DELETE_CHUNK):
+                chunk = await db.run(
+                    delete_user_qr_codes, current_user.user_id, qr_ids[start:start + QR_DELETE_CHUNK]
+                )
+                deleted.extend(chunk)
+                for qr_id in chunk:
+                    services.redirect_cache.invalidate_code(qr_id)
+            found = set(deleted)
+            results = [{"id": qr_id, "status": "deleted" if qr_id in found else "not_found"} for qr_id in qr_ids]
+        else:
+            cutoff = deletion.created_before
+            if cutoff.tzinfo is not None:
+                # created_at is stored as naive UTC
+                cutoff = cutoff.astimezone(timezone.utc).replace(tzinfo=None)
+            while True:
+                chunk = await db.run(delete_user_qr_codes_before, current_user.user_id, cutoff, QR_DELETE_CHUNK)
+                deleted.extend(chunk)
+                for qr_id in chunk:
+                    services.redirect_cache.invalidate_code(qr_id)
+                if len(chunk) < QR_DELETE_CHUNK:
+                    break
+            results = [{"id": qr_id, "status": "deleted"} for qr_id in deleted]
+    except (HTTPException, PoolTimeout):
+        raise
+    except Exception as e:
+        logger.error("Bulk deletion failed after %d codes: %s", len(deleted), e)
+        raise HTTPException(status_code=500, detail=f"Deletion failed after {len(deleted)} codes")
+
+    return {"deleted": len(deleted), "results": results}
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from .. import metrics, services
+from ..db import ConnectionPool
+from ..dependencies import get_db
+
+router = APIRouter()
+
+@router.get("/api/hello")
+def read_root():
+    return {"message": "Hello from FastAPI!"}
+
+@router.get("/api/time")
+def read_root():
+    return {"time": datetime.now().isoformat()}
+
+class EchoRequest(BaseModel):
+    text: str
+    number: int
+
+@router.post("/api/echo")
+def echo(request: EchoRequest):
+    return {"message": request.text, "number": request.number}
+
+# Readiness probe: 503 until warm-up has finished
+@router.get("/api/ready", include_in_schema=False)
+def read_ready():
+    if not services.ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
+
+@router.get("/api/stats")
+def read_stats(db: ConnectionPool = Depends(get_db)):
+    return {
+        "db_pool": db.stats(),
+        "render_cache": services.render_cache.stats(),
+        "render_executor": services.render_executor.stats(),
+        "principal_cache": services.principal_cache.stats(),
+        "hash_executor": services.hash_executor.stats(),
+        "save_jobs": services.save_jobs.stats(),
+        "rate_limiter": services.rate_limiter.stats(),
+        "redirect_cache": services.redirect_cache.stats(),
+        "scan_counter": services.scan_counter.stats(),
+    }
+
+# Prometheus scrape endpoint; the component stats above are exported as well
+@router.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
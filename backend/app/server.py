@@ -0,0 +1,72 @@
+"""
+Production entry point: python -m app.server
+
+Runs WEB_CONCURRENCY uvicorn worker processes on uvloop and httptools
+(default: one per core). Each
+worker warms up before it accepts requests (render workers started, a
+sample code rendered, DB connections opened) and /api/ready answers 503
+until then.
+
+Client addresses (used to limit sign-ins per client) are taken from
+X-Forwarded-For when the connection comes from a proxy listed in
+FORWARDED_ALLOW_IPS (comma-separated addresses or networks, default
+127.0.0.1); set it to the reverse proxy's address when there is one.
+
+On SIGTERM the workers stop accepting connections and give open requests
+up to GRACEFUL_TIMEOUT seconds (default 30) to finish; running save jobs
+and renders are then drained as the app shuts down.
+
+Every worker has its own render pool, DB pool and save queue. Unless
+RENDER_WORKERS is set, the cores are split between the render pools.
+SAVE_QUEUE=redis shares save jobs between the workers and lets one of
+them recover pending codes at startup. With the in-process queue every
+worker queues every pending code it finds at startup; the claim on each
+code lets one of them render it while the others skip it, so the
+duplicates cost a read each rather than a render or an attempt.
+"""
+import logging
+import os
+
+import uvicorn
+
+from . import logs
+
+logger = logging.getLogger(__name__)
+
+
+def worker_count() -> int:
+    workers = os.environ.get("WEB_CONCURRENCY")
+    if workers:
+        return int(workers)
+    return os.cpu_count() or 1
+
+
+def main() -> None:
+    logs.configure_logging()
+    workers = worker_count()
+
+    # Read by each worker when it creates its render pool
+    if "RENDER_WORKERS" not in os.environ:
+        os.environ["RENDER_WORKERS"] = str(max(1, (os.cpu_count() or 1) // workers))
+
+    logger.info("Starting %d workers with %s render workers each", workers, os.environ["RENDER_WORKERS"])
+    uvicorn.run(
+        "app.main:app",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "8000")),
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        proxy_headers=True,
+        forwarded_allow_ips=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        # Logging is set up by the app (app.logs), not uvicorn's dictConfig
+        log_config=None,
+        access_log=os.environ.get("ACCESS_LOG", "1") not in ("0", "false", "no"),
+        backlog=int(os.environ.get("BACKLOG", "2048")),
+        timeout_keep_alive=int(os.environ.get("KEEPALIVE_TIMEOUT", "5")),
+        timeout_graceful_shutdown=int(os.environ.get("GRACEFUL_TIMEOUT", "30")),
+    )
+
+
+if __name__ == "__main__":
+    main()
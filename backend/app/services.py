@@ -0,0 +1,112 @@
+import base64
+import logging
+from typing import Optional
+
+from . import db as database
+from . import logs, metrics
+from .auth import PrincipalCache
+from .hash_pool import HashExecutor
+from .jobs import JobRunner, PermanentJobError
+from .options import IMAGE_FORMATS, QRCodeOptions, RenderError
+from .queries import claim_qr_job, complete_qr_job, fail_qr_job, release_qr_job
+from .rate_limit import RateLimiter
+from .redirects import RedirectCache, ScanCounter
+from .render_cache import RenderCache, cache_key
+from .render_pool import RenderExecutor, render_qr
+
+logger = logging.getLogger(__name__)
+
+# The process-wide components the routes share, each configured from the
+# environment. Routes reach them as services.<name>, so a replacement
+# assigned here is what every route sees.
+
+# bcrypt runs here so signup and login never block the event loop
+hash_executor = HashExecutor.from_env()
+
+# Verified tokens are cached so hot paths skip signature checks and user lookups
+principal_cache = PrincipalCache.from_env()
+
+# Token buckets per user: "render" for routes that draw codes, "api" for the
+# other authenticated ones. In memory per process, or shared through Redis.
+rate_limiter = RateLimiter.from_env()
+
+# Renders of identical options are served from this cache instead of being redrawn
+render_cache = RenderCache.from_env()
+
+# CPU-bound rendering runs here so it never blocks the event loop
+render_executor = RenderExecutor.from_env()
+
+# Renders and stores the images of codes saved with ?async=true
+save_jobs = JobRunner.from_env()
+
+# Destinations of dynamic codes by slug, so /r/{slug} rarely reaches the database
+redirect_cache = RedirectCache.from_env()
+
+# Scans of dynamic codes, written to qr_links in batches every SCAN_FLUSH_INTERVAL seconds
+scan_counter = ScanCounter.from_env()
+
+# Set once this process has warmed up; reported by /api/ready
+ready = False
+
+metrics.register_stats("db_pool", lambda: database.pool.stats() if database.pool else None)
+metrics.register_stats("render_cache", render_cache.stats)
+metrics.register_stats("render_executor", render_executor.stats)
+metrics.register_stats("principal_cache", principal_cache.stats)
+metrics.register_stats("hash_executor", hash_executor.stats)
+metrics.register_stats("save_jobs", save_jobs.stats)
+metrics.register_stats("rate_limiter", rate_limiter.stats)
+metrics.register_stats("redirect_cache", redirect_cache.stats)
+metrics.register_stats("scan_counter", scan_counter.stats)
+
+# Returns the encoded QR code image, rendering only on a cache miss. Renders
+# for a user count towards their limit of renders in flight.
+async def render_image(options: QRCodeOptions, user_id: Optional[int] = None) -> bytes:
+    key = cache_key(options)
+    image = render_cache.get(key)
+    if image is None:
+        keys = (f"user:{user_id}",) if user_id is not None else ()
+        # Stage timings come back with the image, as workers may be other processes
+        image, stages = await render_executor.submit(metrics.collect_stages, render_qr, options, keys=keys)
+        metrics.record_stages(stages)
+        render_cache.put(key, image)
+    return image
+
+# Returns the QR code image as a data URL in the requested format
+def data_url(options: QRCodeOptions, image: bytes) -> str:
+    mime, _ = IMAGE_FORMATS[options.format]
+    with metrics.stage("base64"):
+        return f"data:{mime};base64,{base64.b64encode(image).decode()}"
+
+# Renders the image of a code saved with ?async=true and stores it; run by save_jobs
+async def process_save_job(qr_id: int) -> None:
+    claimed = await database.pool.run(claim_qr_job, qr_id, save_jobs.lease)
+    if claimed is None:
+        return
+    render_options, attempts = claimed
+    try:
+        # Counted in the row, so a code that keeps crashing its process is given up on too
+        if attempts > save_jobs.max_attempts:
+            raise PermanentJobError("QR generation failed")
+
+        options = QRCodeOptions.model_validate_json(render_options)
+        try:
+            image = await render_image(options)
+        except RenderError as e:
+            if e.status_code < 500:
+                raise PermanentJobError(e.detail)
+            raise
+        await database.pool.run(complete_qr_job, qr_id, attempts, image)
+    except Exception:
+        # Released for the retry or the failure to be recorded; a run cut
+        # short by shutdown keeps its claim until the lease runs out
+        try:
+            await database.pool.run(release_qr_job, qr_id, attempts)
+        except Exception as e:
+            logger.warning("Could not release save job %s: %s", qr_id, e)
+        raise
+    if logs.debug_enabled(logger):
+        logger.debug("QR code %s rendered and saved", qr_id)
+
+async def fail_save_job(qr_id: int, detail: str) -> None:
+    logger.error("Giving up on saving QR code %s: %s", qr_id, detail)
+    await database.pool.run(fail_qr_job, qr_id, detail)
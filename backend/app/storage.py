@@ -0,0 +1,111 @@
+import hashlib
+import os
+import tempfile
+from typing import NamedTuple, Optional
+
+
+class StoredImage(NamedTuple):
+    # Value for the qr_codes.qr_image column (None when kept outside MySQL)
+    blob: Optional[bytes]
+    # sha256 of the PNG, stored in qr_codes.image_hash and used as the ETag
+    image_hash: str
+    # Media type of the image, stored in qr_codes.image_type
+    image_type: str
+
+
+def image_hash(png: bytes) -> str:
+    return hashlib.sha256(png).hexdigest()
+
+
+def media_type(data: bytes) -> str:
+    """Media type of a QR image, sniffed from its first bytes (rows stored before image_type have none)."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:4] == b"<svg" or data[:5] == b"<?xml":
+        return "image/svg+xml"
+    return "image/png"
+
+
+# File extension of each media type stored
+EXTENSIONS = {"image/png": "png", "image/webp": "webp", "image/svg+xml": "svg"}
+
+
+class ImageStorage:
+    """
+    Where QR image bytes live. store() runs before the row is inserted and
+    returns the column values; load() gets them back from a row.
+    Both are called on the database thread pool.
+    """
+
+    name = "base"
+
+    def store(self, png: bytes) -> StoredImage:
+        raise NotImplementedError
+
+    def load(self, blob: Optional[bytes], image_hash: Optional[str], image_type: Optional[str] = None) -> Optional[bytes]:
+        raise NotImplementedError
+
+
+class BlobStorage(ImageStorage):
+    """Raw PNG bytes in the qr_codes.qr_image MEDIUMBLOB column."""
+
+    name = "blob"
+
+    def store(self, png: bytes) -> StoredImage:
+        return StoredImage(png, image_hash(png), media_type(png))
+
+    def load(self, blob: Optional[bytes], image_hash: Optional[str], image_type: Optional[str] = None) -> Optional[bytes]:
+        return blob
+
+
+class FileStorage(ImageStorage):
+    """
+    Content-addressed image files on local disk, named by their sha256
+    with the extension of their media type. Identical images are stored
+    once. Rows that still carry a blob (e.g. written before switching
+    backends) are served from the blob.
+    """
+
+    name = "file"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path_for(self, image_hash: str, image_type: Optional[str] = None) -> str:
+        # Rows stored before image_type was recorded have their files named .png
+        extension = EXTENSIONS.get(image_type, "png")
+        return os.path.join(self.root, image_hash[:2], f"{image_hash}.{extension}")
+
+    def store(self, png: bytes) -> StoredImage:
+        digest = image_hash(png)
+        image_type = media_type(png)
+        path = self.path_for(digest, image_type)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so readers never see partial files
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        return StoredImage(None, digest, image_type)
+
+    def load(self, blob: Optional[bytes], image_hash: Optional[str], image_type: Optional[str] = None) -> Optional[bytes]:
+        if blob is not None:
+            return blob
+        if not image_hash:
+            return None
+        try:
+            with open(self.path_for(image_hash, image_type), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+def storage_from_env() -> ImageStorage:
+    """QR_STORAGE selects "blob" (default) or "file" under QR_STORAGE_DIR."""
+    backend = os.environ.get("QR_STORAGE", "blob")
+    if backend == "file":
+        return FileStorage(os.environ.get("QR_STORAGE_DIR", "/app/data/qr_images"))
+    if backend != "blob":
+        raise ValueError(f"Unknown QR_STORAGE backend: {backend}")
+    return BlobStorage()
@@ -0,0 +1,123 @@
+"""
+Registry of dot and eye styles.
+
+A style is a name mapped to a factory for its module drawer. The raster
+renderer never calls drawers per module: for each (style, box_size) it
+asks the drawer once for its masks (the 16 neighbour sprites, or the
+finder pattern of an eye drawer that paints whole eyes) and caches them,
+so every style registered here, built-in or not, is stamped from cache.
+"""
+import importlib
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DOT_STYLES: Dict[str, Callable[[], object]] = {}
+EYE_STYLES: Dict[str, Callable[[], object]] = {}
+_REGISTRIES = {"dot": DOT_STYLES, "eye": EYE_STYLES}
+
+# (kind, name, box_size) -> mask array; (kind, name) -> shared drawer
+_masks: Dict[Tuple[str, str, int], "np.ndarray"] = {}
+_drawers: Dict[Tuple[str, str], object] = {}
+_lock = threading.Lock()
+
+
+class UnknownStyle(KeyError):
+    """Raised for a style name that is not registered."""
+
+
+def _register(kind: str, name: str, factory: Callable[[], object]) -> None:
+    with _lock:
+        _REGISTRIES[kind][name] = factory
+        # Re-registering a name replaces its drawer and cached masks
+        _drawers.pop((kind, name), None)
+        for key in [key for key in _masks if key[:2] == (kind, name)]:
+            del _masks[key]
+
+
+def register_dot_style(name: str, factory: Callable[[], object]) -> None:
+    """Register a module drawer factory under name for QRCodeOptions.dot_style."""
+    _register("dot", name, factory)
+
+
+def register_eye_style(name: str, factory: Callable[[], object]) -> None:
+    """
+    Register a drawer factory under name for QRCodeOptions.eye_style.
+    Either a module drawer, or an eye drawer with needs_processing that
+    paints the three finder patterns in draw().
+    """
+    _register("eye", name, factory)
+
+
+def lazy_factory(module: str, name: str) -> Callable[[], object]:
+    """
+    A factory for module.name that imports module on first use, so
+    registering a style does not load its drawer code.
+    """
+    def factory():
+        return getattr(importlib.import_module(module), name)()
+    return factory
+
+
+def create_drawer(kind: str, name: str):
+    """A new drawer instance, for renderers that initialize it on their own image."""
+    try:
+        return _REGISTRIES[kind][name]()
+    except KeyError:
+        raise UnknownStyle(f"Unknown {kind} style: {name}")
+
+
+def drawer(kind: str, name: str):
+    """
+    The shared drawer instance of a style. Only for reading its class and
+    parameters; drawing needs create_drawer().
+    """
+    key = (kind, name)
+    with _lock:
+        if key not in _drawers:
+            _drawers[key] = create_drawer(kind, name)
+        return _drawers[key]
+
+
+def paints_finder_patterns(kind: str, name: str) -> bool:
+    """True for eye drawers that paint whole finder patterns instead of modules."""
+    return bool(getattr(drawer(kind, name), "needs_processing", False))
+
+
+def masks(kind: str, name: str, box_size: int) -> "np.ndarray":
+    """
+    Cached coverage masks of a style at box_size: (16, box, box) neighbour
+    sprites for module drawers, one (7 * box, 7 * box) finder pattern for
+    drawers that paint whole eyes.
+    """
+    key = (kind, name, box_size)
+    mask = _masks.get(key)
+    if mask is None:
+        # Built outside the lock from a private drawer; racing builders
+        # produce identical arrays, so the last one in simply wins.
+        factory = _REGISTRIES[kind].get(name)
+        if factory is None:
+            raise UnknownStyle(f"Unknown {kind} style: {name}")
+        from . import fast_render
+
+        style_drawer = factory()
+        if getattr(style_drawer, "needs_processing", False):
+            mask = fast_render.build_finder_pattern(style_drawer, box_size)
+        else:
+            mask = fast_render.build_sprites(style_drawer, box_size)
+        mask.setflags(write=False)
+        with _lock:
+            # Drop the result if the style was re-registered meanwhile
+            if _REGISTRIES[kind].get(name) is factory:
+                _masks[key] = mask
+    return mask
+
+
+def warm(box_size: int) -> None:
+    """Build the masks of every registered style at box_size."""
+    for kind, registry in _REGISTRIES.items():
+        for name in list(registry):
+            masks(kind, name, box_size)
+
@@ -0,0 +1,194 @@
+"""
+Vector QR renderer.
+
+Emits the module matrix as SVG paths in module units (the viewBox maps
+one unit to one module, scaled to box_size pixels), following the shapes
+of the PIL module and eye drawers: squares are merged into horizontal
+runs, every other style contributes one small sub-path per module.
+"""
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+from qrcode.image.styles.moduledrawers.pil import (
+    CircleModuleDrawer,
+    GappedSquareModuleDrawer,
+    HorizontalBarsDrawer,
+    RoundedModuleDrawer,
+    SquareModuleDrawer,
+    VerticalBarsDrawer,
+)
+
+from .fast_render import eye_mask, neighbor_codes
+
+# Neighbour bits as encoded by fast_render.neighbor_codes
+NORTH, EAST, SOUTH, WEST = 8, 4, 2, 1
+
+
+def _n(value: float) -> str:
+    """Shortest decimal form of a coordinate."""
+    return f"{value:.3f}".rstrip("0").rstrip(".") or "0"
+
+
+def _gapped(x: int, y: int, code: int, drawer) -> str:
+    inset = (1 - drawer.size_ratio) / 2
+    side = _n(drawer.size_ratio)
+    return f"M{_n(x + inset)} {_n(y + inset)}h{side}v{side}h-{side}z"
+
+
+def _circle(x: int, y: int, code: int, drawer) -> str:
+    return f"M{x} {_n(y + 0.5)}a.5 .5 0 1 0 1 0a.5 .5 0 1 0 -1 0z"
+
+
+def _rounded(x: int, y: int, code: int, drawer) -> str:
+    # A corner is rounded when neither of the two modules beside it is active
+    r = drawer.radius_ratio / 2
+    nw = not code & (NORTH | WEST)
+    ne = not code & (NORTH | EAST)
+    se = not code & (SOUTH | EAST)
+    sw = not code & (SOUTH | WEST)
+    arc = f"A{_n(r)} {_n(r)} 0 0 1 "
+    path = f"M{x} {_n(y + r) if nw else y}"
+    if nw:
+        path += f"{arc}{_n(x + r)} {y}"
+    path += f"H{_n(x + 1 - r) if ne else x + 1}"
+    if ne:
+        path += f"{arc}{x + 1} {_n(y + r)}"
+    path += f"V{_n(y + 1 - r) if se else y + 1}"
+    if se:
+        path += f"{arc}{_n(x + 1 - r)} {y + 1}"
+    path += f"H{_n(x + r) if sw else x}"
+    if sw:
+        path += f"{arc}{x} {_n(y + 1 - r)}"
+    return path + "z"
+
+
+def _horizontal(x: int, y: int, code: int, drawer) -> str:
+    # Bars are capped with half ellipses where the run ends
+    half = drawer.vertical_shrink / 2
+    top, bottom, middle = _n(y + 0.5 - half), _n(y + 0.5 + half), _n(x + 0.5)
+    arc = f"A.5 {_n(half)} 0 0 1 "
+    path = f"M{middle} {top}"
+    path += f"{arc}{middle} {bottom}" if not code & EAST else f"H{x + 1}V{bottom}H{middle}"
+    path += f"{arc}{middle} {top}" if not code & WEST else f"H{x}V{top}H{middle}"
+    return path + "z"
+
+
+def _vertical(x: int, y: int, code: int, drawer) -> str:
+    half = drawer.horizontal_shrink / 2
+    left, right, middle = _n(x + 0.5 - half), _n(x + 0.5 + half), _n(y + 0.5)
+    arc = f"A{_n(half)} .5 0 0 1 "
+    path = f"M{left} {middle}"
+    path += f"{arc}{right} {middle}" if not code & NORTH else f"V{y}H{right}V{middle}"
+    path += f"{arc}{left} {middle}" if not code & SOUTH else f"V{y + 1}H{left}V{middle}"
+    return path + "z"
+
+
+# Per-module path builders by drawer class. SquareModuleDrawer is handled
+# separately because its modules merge into runs.
+MODULE_PATHS: Dict[type, Callable[[int, int, int, object], str]] = {
+    GappedSquareModuleDrawer: _gapped,
+    CircleModuleDrawer: _circle,
+    RoundedModuleDrawer: _rounded,
+    HorizontalBarsDrawer: _horizontal,
+    VerticalBarsDrawer: _vertical,
+}
+
+
+def _paths_for(registry: dict, drawer):
+    for cls, build in registry.items():
+        if isinstance(drawer, cls):
+            return build
+    return None
+
+
+def supports(drawer) -> bool:
+    """Whether drawer has an SVG shape."""
+    if getattr(drawer, "needs_processing", False):
+        return _paths_for(EYE_PATHS, drawer) is not None
+    return type(drawer) is SquareModuleDrawer or _paths_for(MODULE_PATHS, drawer) is not None
+
+
+def _square_runs(mask: np.ndarray, border: int) -> List[str]:
+    paths = []
+    for row in range(mask.shape[0]):
+        # Start and end columns of each run of set modules in this row
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], mask[row].view(np.int8), [0]))))
+        for start, end in zip(edges[::2], edges[1::2]):
+            paths.append(f"M{start + border} {row + border}h{end - start}v1h-{end - start}z")
+    return paths
+
+
+def _module_paths(mask: np.ndarray, codes: np.ndarray, drawer, border: int) -> List[str]:
+    if type(drawer) is SquareModuleDrawer:
+        return _square_runs(mask, border)
+    build = _paths_for(MODULE_PATHS, drawer)
+    if build is None:
+        raise ValueError(f"No SVG shape for {type(drawer).__name__}")
+    return [
+        build(int(col) + border, int(row) + border, int(codes[row, col]), drawer)
+        for row, col in zip(*np.nonzero(mask))
+    ]
+
+
+def _rounded_rect(x: float, y: float, size: float, r: float) -> str:
+    return (
+        f"M{_n(x + r)} {_n(y)}H{_n(x + size - r)}A{_n(r)} {_n(r)} 0 0 1 {_n(x + size)} {_n(y + r)}"
+        f"V{_n(y + size - r)}A{_n(r)} {_n(r)} 0 0 1 {_n(x + size - r)} {_n(y + size)}"
+        f"H{_n(x + r)}A{_n(r)} {_n(r)} 0 0 1 {_n(x)} {_n(y + size - r)}"
+        f"V{_n(y + r)}A{_n(r)} {_n(r)} 0 0 1 {_n(x + r)} {_n(y)}z"
+    )
+
+
+def rounded_eyes(width: int, border: int) -> List[str]:
+    """Rounded 7x7 rings around rounded 3x3 eyeballs (drawn evenodd), as CustomEyeDrawer."""
+    paths = []
+    for row, col in ((0, 0), (0, width - 7), (width - 7, 0)):
+        x, y = col + border, row + border
+        paths.append(_rounded_rect(x, y, 7, 2))
+        paths.append(_rounded_rect(x + 1, y + 1, 5, 1))
+        paths.append(_rounded_rect(x + 2, y + 2, 3, 1))
+    return paths
+
+
+# Finder pattern path builders, by class of eye drawers that paint whole
+# eyes (needs_processing). Filled in where those drawers are defined.
+EYE_PATHS: Dict[type, Callable[[int, int], List[str]]] = {}
+
+
+def render_svg(
+    modules: Sequence[Sequence[bool]],
+    module_drawer,
+    eye_drawer,
+    box_size: int,
+    border: int,
+    fill_color: str,
+    back_color: str,
+) -> bytes:
+    """Render the module matrix as a standalone SVG document."""
+    active = np.asarray(modules, dtype=bool)
+    width = active.shape[0]
+    codes = neighbor_codes(active)
+    eyes = eye_mask(width)
+    size = width + 2 * border
+
+    if getattr(eye_drawer, "needs_processing", False):
+        paths = _module_paths(active & ~eyes, codes, module_drawer, border)
+        eye_paths = _paths_for(EYE_PATHS, eye_drawer)(width, border)
+    elif type(module_drawer) is type(eye_drawer):
+        paths = _module_paths(active, codes, module_drawer, border)
+        eye_paths = []
+    else:
+        paths = _module_paths(active & ~eyes, codes, module_drawer, border)
+        paths += _module_paths(active & eyes, codes, eye_drawer, border)
+        eye_paths = []
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" '
+        f'width="{size * box_size}" height="{size * box_size}">',
+        f'<rect width="{size}" height="{size}" fill="{back_color}"/>',
+        f'<path fill="{fill_color}" d="{"".join(paths)}"/>',
+    ]
+    if eye_paths:
+        parts.append(f'<path fill="{fill_color}" fill-rule="evenodd" d="{"".join(eye_paths)}"/>')
+    parts.append("</svg>")
+    return "".join(parts).encode()
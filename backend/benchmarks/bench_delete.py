@@ -0,0 +1,145 @@
+"""
+Deleting --rows codes of one user, through the app's query helpers on a
+ConnectionPool:
+
+- per-code-legacy: the previous delete_user_qr_code, an ownership SELECT,
+  a DELETE and a commit for every code
+- per-code: one DELETE ... WHERE id AND user_id and a commit per code
+- bulk-ids: DELETE /api/qr with ids, --chunk codes per transaction
+- bulk-cutoff: DELETE /api/qr with created_before, same chunking
+
+Runs against the SQLite shim by default; --mysql uses the app's
+connection settings (e.g. DB_HOST=127.0.0.1) and a schema from
+database/init.sql, where round trips make the gap much wider. Also
+reports the longest single transaction, which bounds how long the bulk
+cases hold row locks.
+
+    cd backend && python -m benchmarks.bench_delete --output delete.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from app import queries
+from app.db import ConnectionPool, load_db_settings
+from app.routes.qr import QR_DELETE_CHUNK
+
+from benchmarks import sqlite_shim
+from benchmarks.common import summarize, write_results
+
+CASES = ["per-code-legacy", "per-code", "bulk-ids", "bulk-cutoff"]
+PNG_STUB = b"\x89PNG\r\n\x1a\n" + bytes(1200)
+CUTOFF = datetime(2030, 1, 1)
+
+
+def legacy_delete(conn, user_id: int, qr_id: int) -> bool:
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT id FROM qr_codes WHERE id = %s AND user_id = %s", (qr_id, user_id))
+    if not cursor.fetchone():
+        return False
+    cursor.execute("DELETE FROM qr_codes WHERE id = %s", (qr_id,))
+    conn.commit()
+    return True
+
+
+def seed(conn, username: str, rows: int) -> tuple:
+    """A fresh user owning rows codes, all created before CUTOFF. Returns (user_id, ids)."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+    row = cursor.fetchone()
+    if row:
+        user_id = row[0]
+        cursor.execute("DELETE FROM qr_codes WHERE user_id = %s", (user_id,))
+    else:
+        cursor.execute(
+            "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, 'x')",
+            (username, f"{username}@bench.local"),
+        )
+        user_id = cursor.lastrowid
+    chunk = 500
+    for start in range(0, rows, chunk):
+        count = min(chunk, rows - start)
+        values = ", ".join(["(%s, %s, 'square', '#000000', '#ffffff', %s, %s, 'square')"] * count)
+        params = []
+        for i in range(start, start + count):
+            params.extend((user_id, f"https://example.com/{i}", PNG_STUB, "0" * 64))
+        cursor.execute(
+            "INSERT INTO qr_codes (user_id, qr_data, dot_style, fill_color, back_color, "
+            f"qr_image, image_hash, eye_style) VALUES {values}",
+            params,
+        )
+    conn.commit()
+    cursor.execute("SELECT id FROM qr_codes WHERE user_id = %s ORDER BY id", (user_id,))
+    return user_id, [row[0] for row in cursor.fetchall()]
+
+
+async def timed(transactions: list, call):
+    started = time.perf_counter()
+    result = await call
+    transactions.append(time.perf_counter() - started)
+    return result
+
+
+async def run_case(pool: ConnectionPool, case: str, rows: int, chunk: int) -> dict:
+    user_id, ids = await pool.run(seed, "bench_delete", rows)
+    transactions = []
+    deleted = 0
+    started = time.perf_counter()
+    if case == "per-code-legacy":
+        for qr_id in ids:
+            deleted += await timed(transactions, pool.run(legacy_delete, user_id, qr_id))
+    elif case == "per-code":
+        for qr_id in ids:
+            deleted += await timed(transactions, pool.run(queries.delete_user_qr_code, user_id, qr_id))
+    elif case == "bulk-ids":
+        for start in range(0, len(ids), chunk):
+            deleted += len(await timed(
+                transactions, pool.run(queries.delete_user_qr_codes, user_id, ids[start:start + chunk])
+            ))
+    else:
+        while True:
+            done = await timed(transactions, pool.run(queries.delete_user_qr_codes_before, user_id, CUTOFF, chunk))
+            deleted += len(done)
+            if len(done) < chunk:
+                break
+    elapsed = time.perf_counter() - started
+    if deleted != rows:
+        raise RuntimeError(f"{case} deleted {deleted} of {rows} codes")
+    return {
+        "case": case,
+        "rows": rows,
+        "chunk": chunk if case.startswith("bulk") else 1,
+        "seconds": round(elapsed, 3),
+        "codes_per_second": round(rows / elapsed),
+        "transactions": len(transactions),
+        "transaction": summarize(transactions),
+    }
+
+
+async def run(args) -> list:
+    if args.mysql:
+        pool = ConnectionPool(load_db_settings(), max_size=2)
+    else:
+        pool = ConnectionPool({}, max_size=2, connect=sqlite_shim.connector(sqlite_shim.create_database()))
+    results = []
+    try:
+        for case in args.cases:
+            results.append(await run_case(pool, case, args.rows, args.chunk))
+            print(json.dumps(results[-1]))
+    finally:
+        pool.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--chunk", type=int, default=QR_DELETE_CHUNK)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--mysql", action="store_true", help="use the app's MySQL instead of the SQLite shim")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    write_results(args.output, "delete", vars(args), results)
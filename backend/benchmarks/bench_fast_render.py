@@ -0,0 +1,79 @@
+"""
+Compare the vectorized renderer with the per-module StyledPilImage2 path.
+
+For each dot style and a range of QR versions this reports the time per
+image for both renderers, the speedup, and the largest per-channel pixel
+difference, failing if it exceeds the tolerance.
+
+    cd backend && python -m benchmarks.bench_fast_render
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.rendering import (
+    QRCodeOptions,
+    make_qr,
+    render_qr_image,
+    render_qr_image_styled,
+)
+
+DOT_STYLES = ["square", "rounded", "circle", "gapped", "horizontal", "vertical"]
+# Payload sizes chosen to land on roughly versions 2, 6, 14, 27 and 40
+PAYLOAD_LENGTHS = [20, 100, 400, 1200, 2900]
+# Antialiased edges may differ slightly: StyledPilImage keeps LANCZOS
+# overshoot above the background colour, the coverage canvas clips it.
+TOLERANCE = 8
+
+
+def best_of(fn, options, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(options)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(args) -> list:
+    results = []
+    for length in args.lengths:
+        url = ("https://example.com/" + "x" * length)[:length]
+        for dot_style in args.dot_styles:
+            options = QRCodeOptions(
+                url=url,
+                dot_style=dot_style,
+                eye_style=args.eye_style,
+                fill_color="#1a2b3c",
+                back_color="#ffeedd",
+            )
+            fast = np.asarray(render_qr_image(options), dtype=np.int16)
+            reference = np.asarray(render_qr_image_styled(options).convert("RGB"), dtype=np.int16)
+            max_diff = int(np.abs(fast - reference).max())
+
+            fast_time = best_of(render_qr_image, options, args.repeat)
+            reference_time = best_of(render_qr_image_styled, options, args.repeat)
+            result = {
+                "version": make_qr(options).version,
+                "dot_style": dot_style,
+                "styled_ms": round(reference_time * 1000, 2),
+                "vectorized_ms": round(fast_time * 1000, 2),
+                "speedup": round(reference_time / fast_time, 1),
+                "max_pixel_diff": max_diff,
+            }
+            print(json.dumps(result))
+            results.append(result)
+            if max_diff > TOLERANCE:
+                raise SystemExit(f"Pixel difference {max_diff} exceeds tolerance {TOLERANCE}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lengths", nargs="+", type=int, default=PAYLOAD_LENGTHS)
+    parser.add_argument("--dot-styles", nargs="+", default=DOT_STYLES)
+    parser.add_argument("--eye-style", default="rounded")
+    parser.add_argument("--repeat", type=int, default=3)
+    run(parser.parse_args())
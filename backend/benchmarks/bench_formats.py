@@ -0,0 +1,101 @@
+"""
+Output size and render+encode time of each image format.
+
+For QR versions 1-40 this finds the longest URL that still fits the
+version, renders it in every format (and optionally several compression
+levels) and reports the encoded size and the best-of time of
+render_qr_bytes. Palette PNG and WebP must decode to exactly the pixels
+of the RGB PNG; the run fails otherwise.
+
+    cd backend && python -m benchmarks.bench_formats
+"""
+import argparse
+import io
+import json
+import time
+
+import numpy as np
+import qrcode
+from PIL import Image
+
+from app.options import IMAGE_FORMATS
+from app.rendering import QRCodeOptions, make_qr, render_qr_bytes
+
+URL_PREFIX = "https://example.com/"
+
+
+def url_for_version(version: int) -> str:
+    """Longest URL whose QR code (error correction L, as make_qr) is the given version."""
+    low, high = 1, 3000
+    while low < high:
+        length = (low + high + 1) // 2
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L)
+        qr.add_data((URL_PREFIX + "x" * length)[:length])
+        try:
+            fits = qr.best_fit() <= version
+        except ValueError:
+            # Too long for any version
+            fits = False
+        if fits:
+            low = length
+        else:
+            high = length - 1
+    return (URL_PREFIX + "x" * low)[:low]
+
+
+def best_of(options, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        data = render_qr_bytes(options)
+        timings.append(time.perf_counter() - started)
+    return data, min(timings)
+
+
+def decoded(data: bytes) -> np.ndarray:
+    return np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+
+
+def run(args) -> list:
+    results = []
+    for version in args.versions:
+        url = url_for_version(version)
+        for compression in args.compression:
+            reference = None
+            for image_format in args.formats:
+                options = QRCodeOptions(
+                    url=url,
+                    dot_style=args.dot_style,
+                    eye_style=args.eye_style,
+                    fill_color="#1a2b3c",
+                    back_color="#ffeedd",
+                    format=image_format,
+                    compression=compression,
+                )
+                data, elapsed = best_of(options, args.repeat)
+                if image_format == "png":
+                    reference = decoded(data)
+                elif image_format != "svg" and reference is not None:
+                    if not np.array_equal(decoded(data), reference):
+                        raise SystemExit(f"{image_format} output differs from png at version {version}")
+                result = {
+                    "version": make_qr(options).version,
+                    "format": image_format,
+                    "compression": compression,
+                    "bytes": len(data),
+                    "ms": round(elapsed * 1000, 2),
+                }
+                print(json.dumps(result))
+                results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--versions", nargs="+", type=int, default=[1, 2, 5, 10, 15, 20, 25, 30, 35, 40])
+    parser.add_argument("--formats", nargs="+", default=list(IMAGE_FORMATS))
+    parser.add_argument("--compression", nargs="+", type=int, default=[6])
+    parser.add_argument("--dot-style", default="square")
+    parser.add_argument("--eye-style", default="square")
+    parser.add_argument("--repeat", type=int, default=3)
+    run(parser.parse_args())
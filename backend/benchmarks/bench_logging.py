@@ -0,0 +1,99 @@
+"""
+Per-request cost of logging on the render and save path.
+
+Replays the log calls one /api/qr/save request makes (colour conversion,
+drawer choice, save confirmation) under:
+
+- eager: the previous setup, basicConfig(level=DEBUG) with f-string
+  messages written synchronously by the request thread
+- queue-info: logs.configure_logging at the default INFO level, with
+  the lazy %-style, debug_enabled-guarded calls the app now makes
+- queue-debug: the same at DEBUG, every request sampled
+- queue-debug-sampled: DEBUG with LOG_DEBUG_SAMPLE_RATE=0.01
+
+Output goes to a temporary file rather than a terminal, which flatters
+the eager case. Reports the time spent in log calls per request.
+
+    cd backend && python -m benchmarks.bench_logging
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+from app import logs
+
+from benchmarks.common import percentile
+
+FILL, BACK = (26, 43, 60), (255, 255, 255)
+
+
+def eager_request(logger: logging.Logger) -> None:
+    logger.debug(f"Converted colors - Fill: {FILL}, Back: {BACK}")
+    logger.debug(f"Using styles - Module: {'RoundedModuleDrawer'}, Eye: {'CustomEyeDrawer'}")
+    logger.debug("QR code saved to database successfully")
+
+
+def lazy_request(logger: logging.Logger) -> None:
+    if logs.debug_enabled(logger):
+        logger.debug("Converted colors - Fill: %s, Back: %s", FILL, BACK)
+    if logs.debug_enabled(logger):
+        logger.debug("Using styles - Module: %s, Eye: %s", "RoundedModuleDrawer", "CustomEyeDrawer")
+    if logs.debug_enabled(logger):
+        logger.debug("QR code saved to database successfully")
+
+
+def time_requests(request, logger: logging.Logger, requests: int, sample_rate: float) -> list:
+    timings = []
+    for _ in range(requests):
+        # What RequestContextMiddleware does once per request
+        context = (uuid.uuid4().hex, sample_rate >= 1 or random.random() < sample_rate)
+        started = time.perf_counter()
+        logs.call_in_context(context, request, logger)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run_case(name: str, output, requests: int) -> dict:
+    root = logging.getLogger()
+    logs.shutdown_logging()
+    root.handlers.clear()
+    logger = logging.getLogger("app.bench")
+    sample_rate = 1.0
+
+    if name == "eager":
+        logging.basicConfig(level=logging.DEBUG, stream=output, force=True)
+        request = eager_request
+    else:
+        os.environ["LOG_LEVEL"] = "INFO" if name == "queue-info" else "DEBUG"
+        sample_rate = 0.01 if name == "queue-debug-sampled" else 1.0
+        logs.configure_logging(output)
+        request = lazy_request
+
+    time_requests(request, logger, min(requests, 1000), sample_rate)
+    timings = time_requests(request, logger, requests, sample_rate)
+    logs.shutdown_logging()
+    # Microseconds; summarize's milliseconds are too coarse here
+    us = [value * 1e6 for value in timings]
+    return {
+        "case": name,
+        "requests": requests,
+        "mean_us": round(statistics.fmean(us), 2),
+        "p50_us": round(percentile(us, 50), 2),
+        "p99_us": round(percentile(us, 99), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--cases", nargs="+", default=["eager", "queue-info", "queue-debug", "queue-debug-sampled"])
+    args = parser.parse_args()
+    with tempfile.TemporaryFile("w") as output:
+        for case in args.cases:
+            print(json.dumps(run_case(case, output, args.requests)))
@@ -0,0 +1,123 @@
+"""
+Compare bcrypt inline on the event loop against the hash executor.
+
+Drives /api/login in-process through httpx's ASGI transport at 1, 8 and
+32 concurrent clients while a probe measures /api/hello latency, which
+shows how much password hashing stalls unrelated requests. The users
+table is replaced by an in-memory lookup so only hashing is measured;
+each client logs in as its own user from its own address, so per-key
+throttling does not kick in.
+
+    cd backend && python -m benchmarks.bench_login
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from app import dependencies, main, queries, services
+from app.auth import get_password_hash
+from app.hash_pool import HashExecutor
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class InMemoryUsers:
+    """Stands in for the connection pool: db.run(fn, ...) calls fn without a connection."""
+
+    def __init__(self, users: dict):
+        self.users = users
+
+    async def run(self, fn, *args):
+        if fn is queries.fetch_user_by_username:
+            return self.users.get(args[0])
+        raise NotImplementedError(fn.__name__)
+
+
+async def run_case(mode: str, concurrency: int, requests: int, users: InMemoryUsers) -> dict:
+    services.hash_executor = HashExecutor(mode=mode, max_queue=requests)
+    services.hash_executor.start()
+    latencies, probe_latencies = [], []
+    done = asyncio.Event()
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async def client_loop(client_id: int):
+        transport = httpx.ASGITransport(app=main.app, client=(f"10.0.0.{client_id}", 1234))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            while True:
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                response = await client.post("/api/login", data={
+                    "username": f"user{client_id}", "password": "correct horse",
+                })
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+    async def probe():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            while not done.is_set():
+                # Time from when the probe is due, so a blocked loop counts
+                due = time.perf_counter() + 0.01
+                await asyncio.sleep(0.01)
+                await client.get("/api/hello")
+                probe_latencies.append(time.perf_counter() - due)
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe_task
+
+    stats = services.hash_executor.stats()
+    services.hash_executor.shutdown()
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+        "login_p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "login_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "hello_p95_ms": round(percentile(probe_latencies, 95) * 1000, 1),
+        "avg_queue_wait_ms": stats["avg_queue_wait_ms"],
+    }
+
+
+async def run(args) -> list:
+    # Hash once and share it: every benchmark user has the same password
+    password_hash = get_password_hash("correct horse")
+    users = InMemoryUsers({
+        f"user{i}": {"id": i, "username": f"user{i}", "password_hash": password_hash}
+        for i in range(max(args.concurrency))
+    })
+    main.app.dependency_overrides[dependencies.get_db] = lambda: users
+    results = []
+    for mode in args.modes:
+        for concurrency in args.concurrency:
+            requests = max(args.requests, concurrency * 2)
+            results.append(await run_case(mode, concurrency, requests, users))
+            print(json.dumps(results[-1]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", nargs="+", default=["inline", "thread"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=32)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,76 @@
+"""
+Restyle-heavy workload with and without the QR matrix cache.
+
+Renders each of --urls URLs in every dot_style x eye_style combination
+and --colors colour pairs, the pattern of a user trying out styles for
+one link, once with the matrix cache disabled (every render re-encodes
+the URL, as before) and once enabled. Reports mean time per render and
+the speedup, per payload length.
+
+    cd backend && python -m benchmarks.bench_matrix
+"""
+import argparse
+import itertools
+import json
+import time
+
+from app import matrix, styles
+from app.rendering import QRCodeOptions, qr_matrix, render_qr_bytes
+
+COLORS = [("#000000", "#ffffff"), ("#1a2b3c", "#ffeedd"), ("#aa0000", "#fafafa"), ("#004400", "#eeffee")]
+
+
+def workload(length: int, urls: int, colors: int, image_format: str) -> list:
+    return [
+        QRCodeOptions(
+            url=(f"https://example.com/{n}/" + "x" * length)[:length],
+            dot_style=dot_style,
+            eye_style=eye_style,
+            fill_color=fill,
+            back_color=back,
+            format=image_format,
+        )
+        for n, dot_style, eye_style, (fill, back) in itertools.product(
+            range(urls), styles.DOT_STYLES, styles.EYE_STYLES, COLORS[:colors]
+        )
+    ]
+
+
+def time_renders(options: list) -> float:
+    started = time.perf_counter()
+    for item in options:
+        render_qr_bytes(item)
+    return (time.perf_counter() - started) / len(options)
+
+
+def run(args) -> list:
+    results = []
+    for length in args.lengths:
+        options = workload(length, args.urls, args.colors, args.format)
+        # Build every style mask first so both runs measure the same thing
+        styles.warm(options[0].box_size)
+        matrix.cache = matrix.MatrixCache(max_entries=0)
+        uncached = time_renders(options)
+        matrix.cache = matrix.MatrixCache()
+        cached = time_renders(options)
+        result = {
+            "url_length": length,
+            "version": qr_matrix(options[0]).version,
+            "renders": len(options),
+            "uncached_ms": round(uncached * 1000, 3),
+            "cached_ms": round(cached * 1000, 3),
+            "speedup": round(uncached / cached, 2),
+            "matrix_cache": matrix.cache.stats(),
+        }
+        print(json.dumps(result))
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lengths", nargs="+", type=int, default=[40, 300, 1200])
+    parser.add_argument("--urls", type=int, default=3)
+    parser.add_argument("--colors", type=int, default=4)
+    parser.add_argument("--format", default="png")
+    run(parser.parse_args())
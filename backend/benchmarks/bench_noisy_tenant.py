@@ -0,0 +1,137 @@
+"""
+Whether one noisy tenant degrades everyone else's renders.
+
+--quiet users each send POST /api/qr/create about --quiet-rate times a
+second, well within their budget, while one noisy user keeps
+--noisy-concurrency requests in flight with no pause. Every URL is new
+and the render cache is off, so every request renders. Cases, each run
+for --duration seconds:
+
+- baseline: the quiet users alone
+- unlimited: with the noisy user, rate limits and the per-user render
+  cap lifted (the previous behaviour)
+- limited: with the noisy user and the limits as configured
+  (RATE_LIMIT_RENDER_*, RENDER_MAX_PER_KEY, or their defaults)
+
+Reports latency and statuses of the quiet users' requests, and the
+statuses the noisy user got. The client runs in the same process as the
+app, so the noisy user pauses --reject-pause seconds after a 429 or 503
+instead of spinning on the event loop it shares with the server. Needs no
+database: tokens carry the user id.
+
+    cd backend && python -m benchmarks.bench_noisy_tenant --output noisy.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.common import summarize, write_results
+
+CASES = ["baseline", "unlimited", "limited"]
+
+
+def options(user: str, i: int) -> dict:
+    return {
+        "url": f"https://example.com/noisy/{user}/{i}/{os.urandom(4).hex()}",
+        "dot_style": "rounded",
+        "fill_color": "#1a2b3c",
+        "back_color": "#ffffff",
+    }
+
+
+async def run_case(case: str, args) -> dict:
+    from app import main, services
+    from app.auth import create_access_token
+    from app.rate_limit import RateLimiter
+    from app.render_cache import RenderCache
+    from app.render_pool import RenderExecutor
+
+    services.render_cache = RenderCache(max_bytes=0)
+    if case == "unlimited":
+        services.rate_limiter = RateLimiter({})
+        services.render_executor = RenderExecutor.from_env()
+        services.render_executor.max_per_key = services.render_executor.workers + services.render_executor.max_queue
+    else:
+        services.rate_limiter = RateLimiter.from_env()
+        services.render_executor = RenderExecutor.from_env()
+    services.render_executor.start()
+    await services.render_executor.warm()
+
+    quiet_latencies, quiet_statuses, noisy_statuses = [], Counter(), Counter()
+    deadline = time.perf_counter() + args.duration
+    transport = httpx.ASGITransport(app=main.app)
+
+    async def quiet_loop(user_id: int):
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': f'quiet-{user_id}', 'uid': user_id})}"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            i = 0
+            # Staggered so the quiet users do not arrive in lockstep
+            await asyncio.sleep(user_id / args.quiet / args.quiet_rate)
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.post("/api/qr/create", json=options(f"quiet-{user_id}", i), headers=headers)
+                elapsed = time.perf_counter() - started
+                quiet_latencies.append(elapsed)
+                quiet_statuses[response.status_code] += 1
+                i += 1
+                await asyncio.sleep(max(0.0, 1 / args.quiet_rate - elapsed))
+
+    async def noisy_loop(slot: int):
+        token = create_access_token({"sub": "noisy", "uid": 0})
+        headers = {"Authorization": f"Bearer {token}"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            i = 0
+            while time.perf_counter() < deadline:
+                response = await client.post("/api/qr/create", json=options(f"noisy-{slot}", i), headers=headers)
+                noisy_statuses[response.status_code] += 1
+                i += 1
+                if response.status_code in (429, 503):
+                    await asyncio.sleep(args.reject_pause)
+
+    loops = [quiet_loop(user_id) for user_id in range(1, args.quiet + 1)]
+    if case != "baseline":
+        loops += [noisy_loop(slot) for slot in range(args.noisy_concurrency)]
+    try:
+        await asyncio.gather(*loops)
+    finally:
+        services.render_executor.shutdown()
+    return {
+        "case": case,
+        "render_workers": services.render_executor.workers,
+        "max_per_key": services.render_executor.max_per_key,
+        "quiet_requests": len(quiet_latencies),
+        "quiet_statuses": {str(status): count for status, count in sorted(quiet_statuses.items())},
+        "noisy_statuses": {str(status): count for status, count in sorted(noisy_statuses.items())},
+        **summarize(quiet_latencies),
+    }
+
+
+async def run(args) -> list:
+    results = []
+    for case in args.cases:
+        results.append(await run_case(case, args))
+        print(json.dumps(results[-1]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per case")
+    parser.add_argument("--quiet", type=int, default=4, help="well-behaved users")
+    parser.add_argument("--quiet-rate", type=float, default=2.0, help="requests per second per quiet user")
+    parser.add_argument("--noisy-concurrency", type=int, default=32)
+    parser.add_argument("--reject-pause", type=float, default=0.05)
+    parser.add_argument("--render-executor", choices=["process", "thread", "inline"],
+                        help="override RENDER_EXECUTOR")
+    parser.add_argument("--output", help="write results as JSON for compare_results")
+    args = parser.parse_args()
+    if args.render_executor:
+        os.environ["RENDER_EXECUTOR"] = args.render_executor
+    results = asyncio.run(run(args))
+    write_results(args.output, "noisy_tenant", vars(args), results)
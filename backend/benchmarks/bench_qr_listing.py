@@ -0,0 +1,149 @@
+"""
+Listing benchmark for /api/qr's keyset pagination. Needs a MySQL with the
+schema from database/init.sql (connection settings as for the app,
+e.g. DB_HOST=127.0.0.1).
+
+Seeds --rows codes for a dedicated user, prints the EXPLAIN plan of the
+page query (failing if it does not use idx_qr_codes_user_created or needs
+a filesort), then times the first page and pages at increasing depths as
+/api/qr builds them (validators included), next to the equivalent OFFSET
+query for comparison, plus the revalidation of each page with its ETag.
+
+    cd backend && DB_HOST=127.0.0.1 python -m benchmarks.bench_qr_listing
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+import mysql.connector
+
+from app.db import load_db_settings
+from app.queries import fetch_user_qr_page
+from app.pagination import DEFAULT_QR_LIST_FIELDS, decode_cursor, encode_cursor
+
+INDEX_NAME = "idx_qr_codes_user_created"
+PNG_STUB = b"\x89PNG\r\n\x1a\n" + os.urandom(1200)
+
+
+def seed(conn, username: str, rows: int) -> int:
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+    row = cursor.fetchone()
+    if row:
+        user_id = row[0]
+        cursor.execute("SELECT COUNT(*) FROM qr_codes WHERE user_id = %s", (user_id,))
+        if cursor.fetchone()[0] >= rows:
+            return user_id
+        cursor.execute("DELETE FROM qr_codes WHERE user_id = %s", (user_id,))
+    else:
+        cursor.execute(
+            "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, 'x')",
+            (username, f"{username}@bench.local"),
+        )
+        user_id = cursor.lastrowid
+
+    chunk = 1000
+    for start in range(0, rows, chunk):
+        count = min(chunk, rows - start)
+        # Spread created_at over time with plenty of equal timestamps, so the
+        # id tiebreaker is exercised
+        values = ", ".join(
+            ["(%s, %s, 'square', '#000000', '#ffffff', %s, %s, 'square', "
+             "TIMESTAMP('2024-01-01') + INTERVAL %s SECOND)"] * count
+        )
+        params = []
+        for i in range(start, start + count):
+            params.extend((user_id, f"https://example.com/{i}", PNG_STUB, "0" * 64, i // 3))
+        cursor.execute(
+            "INSERT INTO qr_codes (user_id, qr_data, dot_style, fill_color, back_color, "
+            f"qr_image, image_hash, eye_style, created_at) VALUES {values}",
+            params,
+        )
+    conn.commit()
+    return user_id
+
+
+def explain(conn, user_id: int, after) -> dict:
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        """EXPLAIN SELECT id, created_at, qr_data FROM qr_codes
+           WHERE user_id = %s AND (created_at < %s OR (created_at = %s AND id < %s))
+           ORDER BY created_at DESC, id DESC LIMIT 51""",
+        (user_id, after[0], after[0], after[1]),
+    )
+    return cursor.fetchone()
+
+
+def cursor_at(conn, user_id: int, depth: int):
+    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT created_at, id FROM qr_codes WHERE user_id = %s
+           ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET %s""",
+        (user_id, depth - 1),
+    )
+    created_at, row_id = cursor.fetchone()
+    return decode_cursor(encode_cursor(created_at, row_id))
+
+
+def timed(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def run(args) -> list:
+    conn = mysql.connector.connect(**load_db_settings())
+    user_id = seed(conn, args.username, args.rows)
+
+    plan = explain(conn, user_id, cursor_at(conn, user_id, args.rows // 2))
+    print(json.dumps({"explain": plan}, default=str))
+    extra = plan.get("Extra") or ""
+    if plan.get("key") != INDEX_NAME or "filesort" in extra:
+        raise SystemExit(f"Unexpected plan: key={plan.get('key')} extra={extra}")
+
+    def offset_page(depth):
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT id, qr_data, created_at FROM qr_codes WHERE user_id = %s
+               ORDER BY created_at DESC, id DESC LIMIT %s OFFSET %s""",
+            (user_id, args.limit, depth),
+        )
+        cursor.fetchall()
+
+    results = []
+    for depth in [0] + [d for d in args.depths if d < args.rows]:
+        after = cursor_at(conn, user_id, depth) if depth else None
+        query = f"{args.limit}:{depth}"
+
+        def page(etags=frozenset()):
+            return fetch_user_qr_page(conn, user_id, args.limit, after, DEFAULT_QR_LIST_FIELDS, etags, query)
+
+        keyset_ms = timed(page, args.repeat)
+        etag = page()[0]
+        revalidate_ms = timed(lambda: page({etag}), args.repeat)
+        offset_ms = timed(lambda: offset_page(depth), args.repeat)
+        result = {
+            "depth": depth,
+            "keyset_ms": round(keyset_ms, 2),
+            "revalidate_ms": round(revalidate_ms, 2),
+            "offset_ms": round(offset_ms, 2),
+        }
+        print(json.dumps(result))
+        results.append(result)
+    conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--username", default="bench_listing")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--depths", nargs="+", type=int, default=[1_000, 10_000, 50_000, 99_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    run(parser.parse_args())
@@ -0,0 +1,152 @@
+"""
+Throughput of the dynamic code redirect, GET /r/{slug}.
+
+Seeds --slugs links in the SQLite shim and sends --requests redirects
+spread over them at each --concurrency level, calling the app as plain
+ASGI so the numbers are the app's own (middleware included) rather than
+an HTTP client's.
+
+- warm: every slug is cached beforehand; the database is not read
+- cold: the cache is off (REDIRECT_CACHE_TTL=0), so every request loads
+  its destination, the behaviour without the cache
+
+Reports throughput, latency, and the destination loads made during the
+run. Afterwards the scan counts are flushed and checked against the
+redirects answered; the script exits non-zero if they differ.
+
+    cd backend && python -m benchmarks.bench_redirect --output redirect.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from app import db as database
+from app import main, queries, services
+from app.db import ConnectionPool
+from app.redirects import RedirectCache, ScanCounter
+
+from benchmarks import sqlite_shim
+from benchmarks.common import summarize, write_results
+
+CASES = ["warm", "cold"]
+
+
+def seed(conn, count: int) -> list:
+    """count links of one user, each with a code row; returns the slugs."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO users (username, email, password_hash) VALUES ('bench_redirect', 'bench_redirect@bench.local', 'x')"
+    )
+    user_id = cursor.lastrowid
+    slugs = []
+    for i in range(count):
+        slug = f"bench{i:07d}"
+        cursor.execute(
+            "INSERT INTO qr_codes (user_id, qr_data, fill_color, back_color) VALUES (%s, %s, '#000000', '#ffffff')",
+            (user_id, f"https://qr.example/r/{slug}"),
+        )
+        cursor.execute(
+            "INSERT INTO qr_links (slug, user_id, qr_code_id, destination) VALUES (%s, %s, %s, %s)",
+            (slug, user_id, cursor.lastrowid, f"https://example.com/landing/{i}"),
+        )
+        slugs.append(slug)
+    conn.commit()
+    return slugs
+
+
+def fetch_scans(conn) -> int:
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(SUM(scans), 0) FROM qr_links")
+    return int(cursor.fetchone()[0])
+
+
+async def redirect(slug: str) -> int:
+    """Status of GET /r/{slug}, answered by the app without an HTTP client."""
+    path = f"/r/{slug}"
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "server": ("bench", 80), "client": ("127.0.0.1", 1234), "headers": [],
+    }
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await main.app(scope, receive, send)
+    return status
+
+
+async def run_case(case: str, concurrency: int, slugs: list, args) -> dict:
+    services.redirect_cache = RedirectCache(ttl=0 if case == "cold" else 300.0)
+    if case == "warm":
+        for slug in slugs:
+            await redirect(slug)
+    loads = services.redirect_cache.loads
+    latencies, failures = [], 0
+    counter = iter(range(args.requests))
+
+    async def client_loop():
+        nonlocal failures
+        for i in counter:
+            started = time.perf_counter()
+            if await redirect(slugs[i % len(slugs)]) != 302:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "case": case,
+        "concurrency": concurrency,
+        "requests": args.requests,
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "failures": failures,
+        "db_loads": services.redirect_cache.loads - loads,
+        **summarize(latencies),
+    }
+
+
+async def run(args) -> tuple:
+    pool = ConnectionPool({}, max_size=args.db_pool_size, connect=sqlite_shim.connector(sqlite_shim.create_database()))
+    database.pool = pool
+    # Flushed once at the end, so the counts are checked in one place
+    services.scan_counter = ScanCounter(interval=3600.0)
+    services.scan_counter.start(lambda counts: pool.run(queries.add_link_scans, counts))
+    results = []
+    try:
+        slugs = await pool.run(seed, args.slugs)
+        for case in args.cases:
+            for concurrency in args.concurrency:
+                results.append(await run_case(case, concurrency, slugs, args))
+                print(json.dumps(results[-1]))
+        await services.scan_counter.shutdown()
+        scans = await pool.run(fetch_scans)
+    finally:
+        database.close_pool()
+    answered = services.scan_counter.scans
+    ok = scans == answered
+    print(json.dumps({"case": "scan_counts", "answered": answered, "written": scans, "ok": ok}))
+    return results, ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=20000, help="redirects per case and concurrency level")
+    parser.add_argument("--slugs", type=int, default=1000)
+    parser.add_argument("--db-pool-size", type=int, default=10)
+    parser.add_argument("--output", help="write results as JSON for compare_results")
+    args = parser.parse_args()
+    results, ok = asyncio.run(run(args))
+    write_results(args.output, "redirect", vars(args), results)
+    sys.exit(0 if ok else 1)
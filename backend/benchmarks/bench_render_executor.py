@@ -0,0 +1,111 @@
+"""
+Compare QR rendering inline on the event loop against the render executor.
+
+Drives /api/qr/create in-process through httpx's ASGI transport at 1, 8
+and 64 concurrent clients while a probe measures /api/hello latency, which
+shows how much rendering stalls unrelated requests.
+
+    cd backend && python -m benchmarks.bench_render_executor
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from app import dependencies, main, services
+from app.auth import Principal
+from app.render_cache import RenderCache
+from app.render_pool import RenderExecutor
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run_case(mode: str, concurrency: int, requests: int) -> dict:
+    # Unique URLs and a disabled cache so every request really renders
+    services.render_cache = RenderCache(max_bytes=0)
+    # All requests come from one user, so the per-user cap is lifted too
+    services.render_executor = RenderExecutor(mode=mode, max_queue=requests, max_per_key=requests)
+    services.render_executor.start()
+    transport = httpx.ASGITransport(app=main.app)
+    latencies, probe_latencies = [], []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm the pool so worker start-up is not measured
+        await asyncio.gather(*(
+            client.post("/api/qr/create", json={
+                "url": f"https://example.com/warm/{i}", "fill_color": "#000000", "back_color": "#ffffff",
+            }) for i in range(services.render_executor.workers)
+        ))
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(requests):
+            queue.put_nowait(i)
+
+        async def client_loop():
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                response = await client.post("/api/qr/create", json={
+                    "url": f"https://example.com/{mode}/{concurrency}/{i}",
+                    "dot_style": "rounded",
+                    "fill_color": "#1a2b3c",
+                    "back_color": "#ffffff",
+                })
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/api/hello")
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    services.render_executor.shutdown()
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+        "render_p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "render_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "hello_p95_ms": round(percentile(probe_latencies, 95) * 1000, 1),
+    }
+
+
+async def run(args) -> list:
+    main.app.dependency_overrides[dependencies.render_user] = lambda: Principal("bench", 0)
+    results = []
+    for mode in args.modes:
+        for concurrency in args.concurrency:
+            requests = max(args.requests, concurrency * 2)
+            results.append(await run_case(mode, concurrency, requests))
+            print(json.dumps(results[-1]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", nargs="+", default=["inline", "thread", "process"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 64])
+    parser.add_argument("--requests", type=int, default=64)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,167 @@
+"""
+Cold-start cost of a web worker.
+
+- import: `python -X importtime -c "import app.main"` in a fresh
+  interpreter, for the total and for each module app.main imports
+  directly (cumulative, so a module's own imports count towards it)
+- first_response: from starting `python -m app.server` (one worker) until
+  GET /api/hello answers, which includes warm-up
+- first_render: from the same start until the first POST /api/qr/create
+  has answered
+
+The server cases run per render executor mode; in process mode the web
+process itself never imports PIL, qrcode or NumPy. No database is needed:
+DB_POOL_PREFILL is 0 and the token carries the user id. Results can be
+diffed across commits with compare_results.
+
+    cd backend && python -m benchmarks.bench_startup --output startup.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+from benchmarks.common import summarize, write_results
+
+# Modules whose presence after `import app.main` is reported
+HEAVY_MODULES = ["PIL", "qrcode", "numpy", "jose", "mysql.connector", "redis"]
+
+
+def parse_importtime(stderr: str, root: str = "app.main") -> Dict[str, float]:
+    """Cumulative seconds of root and of each module root imports directly."""
+    children: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        seconds = int(cumulative) / 1e6
+        if depth == 0:
+            if name.strip() == root:
+                return {root: seconds, **children}
+            children = {}
+        elif depth == 1:
+            children[name.strip()] = seconds
+    raise ValueError(f"{root} not found in -X importtime output")
+
+
+def measure_imports(runs: int) -> List[Dict[str, float]]:
+    samples = []
+    # The first run also writes bytecode caches; not counted
+    for _ in range(runs + 1):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app.main"],
+            capture_output=True, text=True, check=True,
+        )
+        samples.append(parse_importtime(completed.stderr))
+    return samples[1:]
+
+
+def loaded_modules() -> List[str]:
+    script = f"import sys, app.main; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    return completed.stdout.split()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(url: str, body: Optional[dict] = None, token: Optional[str] = None) -> int:
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method="POST" if data else "GET")
+    req.add_header("Content-Type", "application/json")
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(req, timeout=10) as response:
+        return response.status
+
+
+def measure_server(render_executor: str, timeout: float) -> Dict[str, float]:
+    """Seconds from process start to the first answered request and the first render."""
+    from app.auth import create_access_token
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    token = create_access_token({"sub": "bench", "uid": 1})
+    body = {"url": "https://example.com/startup", "fill_color": "#000000", "back_color": "#ffffff"}
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "WEB_CONCURRENCY": "1",
+        "RENDER_EXECUTOR": render_executor,
+        "DB_POOL_PREFILL": "0",
+        "ACCESS_LOG": "0",
+        "LOG_LEVEL": "WARNING",
+    }
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.server"], env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError(f"Server did not answer within {timeout}s")
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with status {server.returncode}")
+            try:
+                request(f"{base}/api/hello")
+                break
+            except OSError:
+                time.sleep(0.005)
+        first_response = time.perf_counter() - started
+        request(f"{base}/api/qr/create", body, token)
+        first_render = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+    return {"first_response": first_response, "first_render": first_render}
+
+
+def run(args) -> list:
+    results = []
+
+    imports = measure_imports(args.runs)
+    total = [sample["app.main"] for sample in imports]
+    results.append({"case": "import", "module": "app.main", **summarize(total)})
+    print(json.dumps({**results[-1], "loaded": loaded_modules()}))
+    modules = sorted(
+        (name for name in imports[0] if name != "app.main"),
+        key=lambda name: statistics.median(sample.get(name, 0.0) for sample in imports),
+        reverse=True,
+    )
+    for name in modules[:args.top]:
+        results.append({"case": "import", "module": name, **summarize([sample.get(name, 0.0) for sample in imports])})
+        print(json.dumps(results[-1]))
+
+    for mode in args.render_executors:
+        samples = [measure_server(mode, args.timeout) for _ in range(args.server_runs)]
+        for case in ("first_response", "first_render"):
+            results.append({"case": case, "render_executor": mode, **summarize([s[case] for s in samples])})
+            print(json.dumps(results[-1]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="import measurements")
+    parser.add_argument("--top", type=int, default=8, help="heaviest direct imports of app.main to report")
+    parser.add_argument("--server-runs", type=int, default=3)
+    parser.add_argument("--render-executors", nargs="+", default=["process", "thread"])
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="write results as JSON for compare_results")
+    args = parser.parse_args()
+    results = run(args)
+    write_results(args.output, "startup", vars(args), results)
@@ -0,0 +1,76 @@
+"""
+Rendering micro-benchmarks: every dot_style x eye_style combination over a
+range of URL lengths (QR versions) and output formats.
+
+Each case is warmed up once, then timed for --rounds calls of
+render_qr_bytes (the same work a render worker does per request), and
+reported with min/mean/stddev/percentiles, pytest-benchmark style.
+--output writes all cases to a JSON file for compare_results.
+
+    cd backend && python -m benchmarks.bench_styles --output styles.json
+"""
+import argparse
+import json
+import time
+
+from app import styles
+from app.rendering import QRCodeOptions, make_qr, render_qr_bytes
+
+from benchmarks.common import summarize, write_results
+
+# Payload sizes chosen to land on roughly versions 2, 6, 14, 27 and 40
+PAYLOAD_LENGTHS = [20, 100, 400, 1200, 2900]
+
+
+def time_case(options: QRCodeOptions, rounds: int) -> list:
+    render_qr_bytes(options)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        render_qr_bytes(options)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run(args) -> list:
+    results = []
+    for length in args.lengths:
+        url = ("https://example.com/" + "x" * length)[:length]
+        for image_format in args.formats:
+            for dot_style in args.dot_styles:
+                for eye_style in args.eye_styles:
+                    options = QRCodeOptions(
+                        url=url,
+                        dot_style=dot_style,
+                        eye_style=eye_style,
+                        fill_color="#1a2b3c",
+                        back_color="#ffeedd",
+                        format=image_format,
+                        box_size=args.box_size,
+                    )
+                    version = make_qr(options).version
+                    result = {
+                        "case": f"{dot_style}/{eye_style}/{image_format}/v{version}",
+                        "dot_style": dot_style,
+                        "eye_style": eye_style,
+                        "format": image_format,
+                        "url_length": length,
+                        "version": version,
+                        **summarize(time_case(options, args.rounds)),
+                    }
+                    print(json.dumps(result))
+                    results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lengths", nargs="+", type=int, default=PAYLOAD_LENGTHS)
+    parser.add_argument("--dot-styles", nargs="+", default=list(styles.DOT_STYLES))
+    parser.add_argument("--eye-styles", nargs="+", default=list(styles.EYE_STYLES))
+    parser.add_argument("--formats", nargs="+", default=["png"])
+    parser.add_argument("--box-size", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+    write_results(args.output, "styles", vars(args), run(args))
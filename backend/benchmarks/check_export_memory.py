@@ -0,0 +1,160 @@
+"""
+Memory bound of GET /api/qr/export. Seeds --small and then --large codes
+(about 1.2 KB of image each) for one user in the SQLite shim, streams
+each export format through the app and records the tracemalloc peak
+over the request, without keeping the body.
+
+NDJSON must stay flat: the large export may peak at most --tolerance
+times the small one plus --slack bytes. ZIP has to keep one central
+directory record per file until the end, which zipfile holds as objects
+of about half a kilobyte, so it is allowed that much per extra row on
+top. Exits non-zero when an export exceeds its bound or leaves a pooled
+connection checked out.
+
+    cd backend && python -m benchmarks.check_export_memory
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tracemalloc
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from app import db as database  # noqa: E402
+from app import main  # noqa: E402
+from app.auth import create_access_token  # noqa: E402
+from app.db import ConnectionPool  # noqa: E402
+
+from benchmarks import sqlite_shim  # noqa: E402
+
+PNG_STUB = b"\x89PNG\r\n\x1a\n" + bytes(1200)
+# Allowance per extra ZIP entry for its central directory record
+ZIP_ENTRY_BYTES = 512
+CASES = {
+    "ndjson": "/api/qr/export",
+    "zip": "/api/qr/export?format=zip",
+}
+
+
+def seed(conn, username: str, rows: int) -> int:
+    """A fresh user owning rows codes with distinct stub images. Returns the user id."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+    row = cursor.fetchone()
+    if row:
+        user_id = row[0]
+        cursor.execute("DELETE FROM qr_codes WHERE user_id = %s", (user_id,))
+    else:
+        cursor.execute(
+            "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, 'x')",
+            (username, f"{username}@check.local"),
+        )
+        user_id = cursor.lastrowid
+    chunk = 500
+    for start in range(0, rows, chunk):
+        count = min(chunk, rows - start)
+        values = ", ".join(["(%s, %s, 'square', '#000000', '#ffffff', %s, %s, 'square')"] * count)
+        params = []
+        for i in range(start, start + count):
+            params.extend((user_id, f"https://example.com/{i}", PNG_STUB + i.to_bytes(4, "big"), "0" * 64))
+        cursor.execute(
+            "INSERT INTO qr_codes (user_id, qr_data, dot_style, fill_color, back_color, "
+            f"qr_image, image_hash, eye_style) VALUES {values}",
+            params,
+        )
+    conn.commit()
+    return user_id
+
+
+async def measure(path: str, headers: dict) -> dict:
+    """
+    Peak bytes allocated above the starting point while the app streams
+    the response. The app is called as plain ASGI with a send that only
+    counts the body, since test clients collect the whole of it.
+    """
+    url, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": url, "raw_path": url.encode(), "query_string": query.encode(),
+        "root_path": "", "server": ("check", 80), "client": ("127.0.0.1", 1234),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    }
+    result = {"status": None, "body_bytes": 0}
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client stays connected until the response is complete
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            result["body_bytes"] += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    await main.app(scope, receive, send)
+    result["peak_bytes"] = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    if result["status"] != 200:
+        raise RuntimeError(f"{path} answered {result['status']}")
+    return result
+
+
+async def run(args) -> bool:
+    pool = ConnectionPool({}, max_size=2, connect=sqlite_shim.connector(sqlite_shim.create_database()))
+    database.pool = pool
+    # Chunks are pushed straight through; compressing them is not what is measured
+    headers = {"Accept-Encoding": "identity"}
+    results = {}
+    try:
+        for rows in (args.small, args.large):
+            user_id = await pool.run(seed, "check_export", rows)
+            token = create_access_token({"sub": "check_export", "uid": user_id})
+            headers["Authorization"] = f"Bearer {token}"
+            for case in args.cases:
+                # Once to warm caches and lazy imports, then measured
+                await measure(CASES[case], headers)
+                results[case, rows] = await measure(CASES[case], headers)
+                results[case, rows]["checked_out"] = pool.stats()["in_use"]
+    finally:
+        database.close_pool()
+
+    ok = True
+    for case in args.cases:
+        small, large = results[case, args.small], results[case, args.large]
+        bound = args.tolerance * small["peak_bytes"] + args.slack
+        if case == "zip":
+            bound += ZIP_ENTRY_BYTES * (args.large - args.small)
+        case_ok = large["peak_bytes"] <= bound and not large["checked_out"]
+        ok = ok and case_ok
+        print(json.dumps({
+            "case": case,
+            "small": {"rows": args.small, **small},
+            "large": {"rows": args.large, **large},
+            "bound_bytes": int(bound),
+            "ok": case_ok,
+        }))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--small", type=int, default=1000)
+    parser.add_argument("--large", type=int, default=10000)
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--slack", type=int, default=512 * 1024)
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    sys.exit(0 if asyncio.run(run(parser.parse_args())) else 1)
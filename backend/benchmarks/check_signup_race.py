@@ -0,0 +1,83 @@
+"""
+Concurrency check for /api/signup. Needs a MySQL or MariaDB with the
+schema from database/init.sql (connection settings as for the app,
+e.g. DB_HOST=127.0.0.1).
+
+Fires --parallel signups at once for the same username (distinct emails),
+then for the same email (distinct usernames), and checks that exactly one
+of each succeeds while the rest get the per-field 400 message. Exits
+non-zero otherwise.
+
+    cd backend && DB_HOST=127.0.0.1 python -m benchmarks.check_signup_race
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+
+# Cheap hashes: the race is in the INSERT, not in bcrypt
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import httpx  # noqa: E402
+
+from app import db as database  # noqa: E402
+from app import main, services  # noqa: E402
+from app.hash_pool import HashExecutor  # noqa: E402
+from app.routes.auth import SIGNUP_CONFLICTS  # noqa: E402
+
+
+async def fire(payloads: list) -> list:
+    async def signup(i: int, payload: dict):
+        # A distinct client address per request keeps per-IP throttling out of the way
+        transport = httpx.ASGITransport(app=main.app, client=(f"10.1.{i // 250}.{i % 250}", 1234))
+        async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+            response = await client.post("/api/signup", json=payload)
+            return response.status_code, response.json()
+
+    return await asyncio.gather(*(signup(i, p) for i, p in enumerate(payloads)))
+
+
+def check(name: str, results: list, expected_detail: str) -> bool:
+    succeeded = [r for r in results if r[0] == 200]
+    conflicts = [r for r in results if r[0] == 400 and r[1].get("detail") == expected_detail]
+    ok = len(succeeded) == 1 and len(conflicts) == len(results) - 1
+    print(json.dumps({
+        "case": name,
+        "requests": len(results),
+        "succeeded": len(succeeded),
+        "conflicts": len(conflicts),
+        "other": [r for r in results if r not in succeeded and r not in conflicts],
+        "ok": ok,
+    }))
+    return ok
+
+
+async def run(args) -> bool:
+    database.init_pool()
+    services.hash_executor = HashExecutor(max_queue=args.parallel, max_per_key=args.parallel)
+    services.hash_executor.start()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        same_username = await fire([
+            {"username": f"race-{tag}", "email": f"race-{tag}-{i}@check.local", "password": "pw"}
+            for i in range(args.parallel)
+        ])
+        same_email = await fire([
+            {"username": f"race-{tag}-{i}", "email": f"race-{tag}@check.local", "password": "pw"}
+            for i in range(args.parallel)
+        ])
+    finally:
+        services.hash_executor.shutdown()
+        database.close_pool()
+    return all([
+        check("same_username", same_username, SIGNUP_CONFLICTS["username"]),
+        check("same_email", same_email, SIGNUP_CONFLICTS["email"]),
+    ])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--parallel", type=int, default=32)
+    sys.exit(0 if asyncio.run(run(parser.parse_args())) else 1)
@@ -0,0 +1,58 @@
+"""Helpers shared by the benchmark scripts: latency summaries and result files."""
+import json
+import platform
+import statistics
+import subprocess
+import time
+from typing import List, Optional
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def summarize(seconds: List[float]) -> dict:
+    """Latency summary in milliseconds, in the shape compare_results expects."""
+    if not seconds:
+        return {"count": 0}
+    ms = [value * 1000 for value in seconds]
+    return {
+        "count": len(ms),
+        "min_ms": round(min(ms), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "stddev_ms": round(statistics.pstdev(ms), 3),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: Optional[str], suite: str, params: dict, results: list) -> None:
+    """Write results with enough context (commit, host, parameters) to diff runs across commits."""
+    if not path:
+        return
+    document = {
+        "suite": suite,
+        "commit": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
@@ -0,0 +1,65 @@
+"""
+Compare two result files written with --output by bench_styles or
+load_test, e.g. from two commits.
+
+Cases are matched on their non-metric fields. Prints one JSON line per
+case with the old and new value of each compared metric and the change
+in percent, and exits non-zero if any p95 got worse by more than
+--threshold percent.
+
+    cd backend && python -m benchmarks.compare_results before.json after.json
+"""
+import argparse
+import json
+import sys
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "throughput_rps"]
+# Fields that describe a measurement rather than identify a case
+MEASURED = set(METRICS) | {
+    "count", "min_ms", "mean_ms", "stddev_ms", "max_ms", "errors", "statuses",
+}
+
+
+def case_key(result: dict) -> tuple:
+    return tuple(sorted((k, json.dumps(v)) for k, v in result.items() if k not in MEASURED))
+
+
+def change(old, new):
+    if not old:
+        return None
+    return round((new - old) / old * 100, 1)
+
+
+def run(args) -> bool:
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    if before["suite"] != after["suite"]:
+        raise SystemExit(f"Cannot compare a {before['suite']} run with a {after['suite']} run")
+
+    old_results = {case_key(result): result for result in before["results"]}
+    ok = True
+    for result in after["results"]:
+        old = old_results.get(case_key(result))
+        if old is None:
+            continue
+        line = {k: v for k, v in result.items() if k not in MEASURED}
+        for metric in METRICS:
+            if metric in result and metric in old:
+                line[metric] = [old[metric], result[metric], change(old[metric], result[metric])]
+        regression = change(old.get("p95_ms"), result.get("p95_ms", 0))
+        if regression is not None and regression > args.threshold:
+            line["regression"] = True
+            ok = False
+        print(json.dumps(line))
+    print(json.dumps({"before": before["commit"], "after": after["commit"], "ok": ok}))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p95 regression in percent")
+    sys.exit(0 if run(parser.parse_args()) else 1)
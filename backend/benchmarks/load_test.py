@@ -0,0 +1,177 @@
+"""
+In-process load harness for the HTTP API.
+
+Drives /api/qr/create, /api/qr/save, /api/qr and /api/login through
+httpx's ASGI transport at each --concurrency level. Every concurrent
+client has its own user and client address, as real traffic would, so
+per-account limits do not skew the numbers. The database is a SQLite
+file through benchmarks.sqlite_shim by default, or the MySQL configured
+as for the app with --db mysql.
+
+Prints one JSON line per (scenario, concurrency) with throughput, error
+counts and p50/p95/p99 latency; --output writes them all to a file for
+compare_results.
+
+    cd backend && python -m benchmarks.load_test --concurrency 1 8 32 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks import sqlite_shim
+from benchmarks.common import summarize, write_results
+
+SCENARIOS = ["create", "save", "list", "login"]
+PASSWORD = "load-test-password"
+
+
+def qr_options(args, case: str, i: int) -> dict:
+    # URLs are unique per case too, so one case never warms the cache for the next
+    n = i % args.distinct_urls if args.distinct_urls else i
+    return {
+        "url": f"https://example.com/load/{case}/{n}",
+        "dot_style": args.dot_style,
+        "eye_style": args.eye_style,
+        "fill_color": "#1a2b3c",
+        "back_color": "#ffffff",
+    }
+
+
+def transport_for(app, client_id: int) -> httpx.ASGITransport:
+    return httpx.ASGITransport(app=app, client=(f"10.2.{client_id // 250}.{client_id % 250}", 4000))
+
+
+async def send(client: httpx.AsyncClient, scenario: str, case: str, user: dict, args, i: int) -> httpx.Response:
+    headers = {"Authorization": f"Bearer {user['token']}"}
+    if scenario == "create":
+        return await client.post("/api/qr/create", json=qr_options(args, case, i), headers=headers)
+    if scenario == "save":
+        return await client.post("/api/qr/save", json=qr_options(args, case, i), headers=headers)
+    if scenario == "list":
+        return await client.get("/api/qr", params={"limit": args.page_size}, headers=headers)
+    if scenario == "login":
+        return await client.post("/api/login", data={"username": user["username"], "password": PASSWORD})
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def create_users(app, count: int, seed: int, run_id: str) -> list:
+    async def create(i: int) -> dict:
+        username = f"load-{run_id}-{i}"
+        async with httpx.AsyncClient(transport=transport_for(app, i), base_url="http://load") as client:
+            response = await client.post("/api/signup", json={
+                "username": username, "email": f"{username}@load.local", "password": PASSWORD,
+            })
+            response.raise_for_status()
+            user = {"username": username, "token": response.json()["access_token"]}
+            if seed:
+                # Codes for the list scenario to page through
+                items = [
+                    {"url": f"https://example.com/seed/{n}", "fill_color": "#000000", "back_color": "#ffffff"}
+                    for n in range(seed)
+                ]
+                response = await client.post(
+                    "/api/qr/batch", params={"save": "true"}, json=items,
+                    headers={"Authorization": f"Bearer {user['token']}"}, timeout=None,
+                )
+                response.raise_for_status()
+        return user
+
+    users = []
+    # Sequential batches keep signup hashing within the hash pool's queue
+    for start in range(0, count, 8):
+        users += await asyncio.gather(*(create(i) for i in range(start, min(count, start + 8))))
+    return users
+
+
+async def run_case(app, scenario: str, concurrency: int, requests: int, users: list, args) -> dict:
+    latencies, statuses = [], Counter()
+    counter = iter(range(requests))
+    case = f"{scenario}-{concurrency}-{os.urandom(4).hex()}"
+
+    async def client_loop(client_id: int):
+        user = users[client_id]
+        async with httpx.AsyncClient(
+            transport=transport_for(app, client_id), base_url="http://load", timeout=None
+        ) as client:
+            for i in counter:
+                started = time.perf_counter()
+                response = await send(client, scenario, case, user, args, i)
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(c) for c in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        **summarize(latencies),
+    }
+
+
+async def run(args) -> list:
+    # Imported here so environment settings from the command line apply
+    from app import db as database
+    from app import main, services
+    from app.db import ConnectionPool
+
+    if args.db == "sqlite":
+        path = sqlite_shim.create_database(args.sqlite_path)
+        database.pool = ConnectionPool({}, max_size=args.db_pool_size, connect=sqlite_shim.connector(path))
+    else:
+        database.init_pool()
+    services.render_executor.start()
+    services.hash_executor.start()
+
+    results = []
+    try:
+        users = await create_users(main.app, max(args.concurrency), args.seed, os.urandom(4).hex())
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                requests = max(args.requests, concurrency * 2)
+                result = await run_case(main.app, scenario, concurrency, requests, users, args)
+                print(json.dumps(result))
+                results.append(result)
+    finally:
+        services.hash_executor.shutdown()
+        services.render_executor.shutdown()
+        database.close_pool()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario and concurrency level")
+    parser.add_argument("--distinct-urls", type=int, default=0,
+                        help="cycle through this many URLs so renders hit the cache (0: every URL is new)")
+    parser.add_argument("--dot-style", default="rounded")
+    parser.add_argument("--eye-style", default="custom")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=60, help="codes saved per user before the run")
+    parser.add_argument("--db", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-path", help="SQLite file to use (default: a new temporary file)")
+    parser.add_argument("--db-pool-size", type=int, default=10)
+    parser.add_argument("--bcrypt-rounds", type=int, help="override BCRYPT_ROUNDS")
+    parser.add_argument("--render-executor", choices=["process", "thread", "inline"],
+                        help="override RENDER_EXECUTOR")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+    # Measures capacity rather than per-user rate limits (see bench_noisy_tenant)
+    os.environ.setdefault("RATE_LIMIT_RENDER_RATE", "0")
+    os.environ.setdefault("RATE_LIMIT_API_RATE", "0")
+    if args.bcrypt_rounds is not None:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    if args.render_executor:
+        os.environ["RENDER_EXECUTOR"] = args.render_executor
+    write_results(args.output, "load", vars(args), asyncio.run(run(args)))
@@ -0,0 +1,144 @@
+"""
+SQLite stand-in for mysql.connector, for benchmarks that drive the app
+without a MySQL server.
+
+Implements only what the app's query helpers use: %s placeholders,
+dictionary cursors, fetchmany, lastrowid, commit/rollback/ping, and
+duplicate-key errors raised as mysql.connector.IntegrityError (errno
+1062) naming the violated key, so signup conflicts map as they do on
+MySQL. Timings are indicative only: SQLite runs in-process and has no
+network round trip.
+"""
+import os
+import sqlite3
+import tempfile
+from typing import Optional
+
+import mysql.connector
+from mysql.connector import errorcode
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(255) NOT NULL UNIQUE,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    password_hash VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    qr_version INT NOT NULL DEFAULT 0,
+    qr_changed_at TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS qr_codes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT REFERENCES users(id) ON DELETE SET NULL,
+    qr_data TEXT NOT NULL,
+    dot_style VARCHAR(20) DEFAULT 'square',
+    fill_color VARCHAR(20) DEFAULT 'black',
+    back_color VARCHAR(20) DEFAULT 'white',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    qr_image BLOB,
+    image_hash CHAR(64),
+    image_type VARCHAR(32),
+    eye_style VARCHAR(20) DEFAULT 'square',
+    status VARCHAR(10) NOT NULL DEFAULT 'ready',
+    render_options TEXT,
+    attempts INT NOT NULL DEFAULT 0,
+    claimed_at TIMESTAMP,
+    error VARCHAR(255)
+);
+CREATE INDEX IF NOT EXISTS idx_qr_codes_user_created ON qr_codes (user_id, created_at, id, status);
+CREATE INDEX IF NOT EXISTS idx_qr_codes_status ON qr_codes (status);
+CREATE TABLE IF NOT EXISTS qr_links (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    slug VARCHAR(32) NOT NULL UNIQUE,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    qr_code_id INT NOT NULL REFERENCES qr_codes(id) ON DELETE CASCADE,
+    destination TEXT NOT NULL,
+    scans BIGINT NOT NULL DEFAULT 0,
+    last_scan_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP
+);
+"""
+
+
+class Cursor:
+    def __init__(self, cursor: sqlite3.Cursor, dictionary: bool):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql: str, params=()):
+        try:
+            self._cursor.execute(sql.replace("%s", "?"), tuple(params))
+        except sqlite3.IntegrityError as e:
+            # "UNIQUE constraint failed: users.username" -> MySQL's wording
+            message = str(e)
+            if message.startswith("UNIQUE constraint failed: "):
+                key = message.rsplit(": ", 1)[1].split(",")[0]
+                raise mysql.connector.IntegrityError(
+                    msg=f"Duplicate entry for key '{key}'", errno=errorcode.ER_DUP_ENTRY
+                )
+            raise mysql.connector.IntegrityError(msg=message)
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip([column[0] for column in self._cursor.description], row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size: int):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+
+    def cursor(self, dictionary: bool = False, **kwargs) -> Cursor:
+        return Cursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect: bool = False):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        self._conn.close()
+
+
+def create_database(path: Optional[str] = None) -> str:
+    """Create the schema in a SQLite file (a fresh temporary one by default) and return its path."""
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="qr-bench-"), "app.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    conn.close()
+    return path
+
+
+def connector(path: str):
+    """A connect(**settings) function for ConnectionPool that opens path."""
+    def connect(**settings):
+        return Connection(path)
+    return connect
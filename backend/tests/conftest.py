@@ -0,0 +1,71 @@
+"""
+The app against the SQLite stand-in from benchmarks.sqlite_shim, with
+renders on threads and cheap password hashes, so the tests need neither
+MySQL nor render processes.
+
+    cd backend && python -m pytest
+"""
+import os
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("RENDER_EXECUTOR", "thread")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from app import db as database  # noqa: E402
+from app import main, services  # noqa: E402
+from app.db import ConnectionPool  # noqa: E402
+from app.rate_limit import RateLimiter  # noqa: E402
+from app.redirects import RedirectCache  # noqa: E402
+from app.render_cache import RenderCache  # noqa: E402
+
+from benchmarks import sqlite_shim  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """A connection pool on a fresh database, installed as the app's."""
+    path = sqlite_shim.create_database(str(tmp_path / "app.sqlite"))
+    database.pool = ConnectionPool({}, max_size=4, connect=sqlite_shim.connector(path))
+    yield database.pool
+    database.close_pool()
+
+
+@pytest.fixture
+def app(pool, monkeypatch):
+    """The app module with its executors started and fresh caches; rate limits are off."""
+    monkeypatch.setattr(services, "render_cache", RenderCache())
+    monkeypatch.setattr(services, "redirect_cache", RedirectCache())
+    monkeypatch.setattr(services, "rate_limiter", RateLimiter({}))
+    services.render_executor.start()
+    services.hash_executor.start()
+    yield main
+    services.hash_executor.shutdown()
+    services.render_executor.shutdown()
+
+
+@pytest.fixture
+async def client(app):
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def signup(client):
+    """signup(username) creates an account and returns its Authorization header."""
+    async def signup(username: str) -> dict:
+        response = await client.post(
+            "/api/signup",
+            json={"username": username, "email": f"{username}@test.local", "password": "secret"},
+        )
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return signup
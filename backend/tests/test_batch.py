@@ -0,0 +1,90 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from app import services
+from app.render_pool import RenderQueueFull
+from app.routes import batch as batch_routes
+
+pytestmark = pytest.mark.anyio
+
+COLORS = {"fill_color": "#000000", "back_color": "#ffffff"}
+
+
+def batch(count: int) -> list:
+    return [{"url": f"https://example.com/batch/{i}", **COLORS} for i in range(count)]
+
+
+def count_codes(conn) -> int:
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM qr_codes")
+    return cursor.fetchone()[0]
+
+
+async def test_full_render_pool_delays_items_instead_of_failing_them(app, client, signup, monkeypatch):
+    headers = await signup("batcher")
+    render_image = services.render_image
+    rejections = []
+
+    async def busy_pool(options, user_id=None):
+        # The first two submissions find the pool full, as under other traffic
+        if len(rejections) < 2:
+            rejections.append(options.url)
+            raise RenderQueueFull()
+        return await render_image(options, user_id)
+
+    monkeypatch.setattr(services, "render_image", busy_pool)
+    response = await client.post("/api/qr/batch", json=batch(3), headers=headers)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rejections) == 2
+    assert lines[-1] == {"done": True, "rendered": 3, "failed": 0}
+
+
+@pytest.mark.parametrize("format", ["ndjson", "zip"])
+async def test_saved_batch_is_inserted_in_chunks(app, pool, client, signup, monkeypatch, format):
+    headers = await signup("batcher")
+    monkeypatch.setattr(batch_routes, "BATCH_SAVE_CHUNK", 2)
+    inserts = []
+    insert_qr_codes = batch_routes.insert_qr_codes
+
+    def counted_insert(conn, user_id, rows):
+        inserts.append(len(rows))
+        return insert_qr_codes(conn, user_id, rows)
+
+    monkeypatch.setattr(batch_routes, "insert_qr_codes", counted_insert)
+    response = await client.post(f"/api/qr/batch?save=true&format={format}", json=batch(5), headers=headers)
+    if format == "zip":
+        summary = json.loads(zipfile.ZipFile(io.BytesIO(response.content)).read("manifest.json"))
+    else:
+        summary = json.loads(response.text.splitlines()[-1])
+    assert summary["saved"] == 5
+    assert inserts == [2, 2, 1]
+    assert await pool.run(count_codes) == 5
+
+
+async def test_malformed_ndjson_line_is_reported(client, signup):
+    headers = {**await signup("batcher"), "Content-Type": "application/x-ndjson"}
+    body = json.dumps(batch(1)[0]) + "\n{not json\n"
+    response = await client.post("/api/qr/batch", content=body, headers=headers)
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert detail["line"] == 2
+    assert detail["errors"][0]["type"] == "json_invalid"
+
+
+@pytest.mark.parametrize("field, value", [
+    ("dot_style", "zigzag"),
+    ("eye_style", "zigzag"),
+    ("box_size", 10_000),
+    ("border", 10_000),
+])
+async def test_invalid_item_is_reported(client, signup, field, value):
+    headers = await signup("batcher")
+    items = batch(2)
+    items[1][field] = value
+    response = await client.post("/api/qr/batch", json=items, headers=headers)
+    assert response.status_code == 422
+    error = response.json()["detail"][0]
+    assert error["loc"][:2] == [1, field]
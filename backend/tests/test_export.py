@@ -0,0 +1,128 @@
+import asyncio
+import base64
+import io
+import json
+import threading
+import zipfile
+
+import pytest
+
+from app.auth import create_access_token
+from app.routes import export as export_routes
+
+from benchmarks.check_export_memory import CASES, ZIP_ENTRY_BYTES, measure, seed
+
+pytestmark = pytest.mark.anyio
+
+CODES = [
+    {"url": "https://example.com/first", "fill_color": "#000000", "back_color": "#ffffff"},
+    {"url": "https://example.com/second", "fill_color": "#112233", "back_color": "#ffffff", "format": "svg"},
+]
+OTHER = {"url": "https://example.com/not-mine", "fill_color": "#000000", "back_color": "#ffffff"}
+
+
+async def saved_codes(client, signup) -> tuple:
+    """Headers of a user owning CODES, and the images of those codes by URL."""
+    headers = await signup("exporter")
+    for code in CODES:
+        assert (await client.post("/api/qr/save", json=code, headers=headers)).status_code == 200
+    other = await signup("other")
+    assert (await client.post("/api/qr/save", json=OTHER, headers=other)).status_code == 200
+
+    images = {}
+    for code in (await client.get("/api/qr", headers=headers)).json():
+        response = await client.get(f"/api/qr/{code['id']}/image", headers=headers)
+        images[code["url"]] = response.content
+    return headers, images
+
+
+async def test_ndjson_export_holds_the_users_codes(client, signup):
+    headers, images = await saved_codes(client, signup)
+    response = await client.get("/api/qr/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["url"] for row in rows] == [code["url"] for code in CODES]
+    for row in rows:
+        assert row["status"] == "ready"
+        assert base64.b64decode(row["image"]) == images[row["url"]]
+
+
+async def test_zip_export_holds_the_users_codes(client, signup):
+    headers, images = await saved_codes(client, signup)
+    response = await client.get("/api/qr/export?format=zip", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        manifest = [json.loads(line) for line in archive.read("manifest.ndjson").splitlines()]
+        assert [row["url"] for row in manifest] == [code["url"] for code in CODES]
+        assert [row["file"].rsplit(".", 1)[1] for row in manifest] == ["png", "svg"]
+        for row in manifest:
+            assert "image" not in row
+            assert archive.read(row["file"]) == images[row["url"]]
+        assert sorted(archive.namelist()) == sorted([row["file"] for row in manifest] + ["manifest.ndjson"])
+
+
+async def connections_returned(pool) -> bool:
+    # The export's connection goes back on a database thread once the stream ends
+    for _ in range(100):
+        if pool.stats()["in_use"] == 0:
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+@pytest.mark.parametrize("case", list(CASES))
+async def test_export_memory_does_not_grow_with_the_library(app, pool, case):
+    small, large = 200, 2000
+    # Chunks are pushed straight through; compressing them is not what is measured
+    headers = {"Accept-Encoding": "identity"}
+    peaks = {}
+    for rows in (small, large):
+        user_id = await pool.run(seed, "check_export", rows)
+        headers["Authorization"] = f"Bearer {create_access_token({'sub': 'check_export', 'uid': user_id})}"
+        # Once to warm caches and lazy imports, then measured
+        await measure(CASES[case], headers)
+        peaks[rows] = (await measure(CASES[case], headers))["peak_bytes"]
+        assert await connections_returned(pool)
+
+    # The bounds of benchmarks.check_export_memory at its default tolerance and slack
+    bound = 1.5 * peaks[small] + 512 * 1024
+    if case == "zip":
+        bound += ZIP_ENTRY_BYTES * (large - small)
+    assert peaks[large] <= bound
+
+
+async def test_concurrent_exports_are_limited(app, client, signup, monkeypatch):
+    headers, _ = await saved_codes(client, signup)
+    monkeypatch.setattr(export_routes, "EXPORT_MAX_CONCURRENT", 1)
+    release = threading.Event()
+    iter_user_qr_export = export_routes.iter_user_qr_export
+
+    def held_export(conn, user_id, chunk_size):
+        # Runs on a database thread: the first export holds its slot until released
+        release.wait(5)
+        yield from iter_user_qr_export(conn, user_id, chunk_size)
+
+    monkeypatch.setattr(export_routes, "iter_user_qr_export", held_export)
+    exports = [asyncio.ensure_future(client.get("/api/qr/export", headers=headers)) for _ in range(4)]
+    try:
+        # Three are turned away at once while the fourth is held
+        for _ in range(200):
+            if sum(export.done() for export in exports) == 3:
+                break
+            await asyncio.sleep(0.01)
+        held = [export for export in exports if not export.done()]
+        refused = [export.result() for export in exports if export.done()]
+        assert len(held) == 1
+        assert [response.status_code for response in refused] == [503] * 3
+        assert all(response.headers["retry-after"] == "5" for response in refused)
+    finally:
+        release.set()
+    assert (await held[0]).status_code == 200
+
+    # The slot is free again once the export has been sent
+    assert export_routes.exports_running == 0
+    assert (await client.get("/api/qr/export", headers=headers)).status_code == 200
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.hash_pool import HashExecutor, HashThrottled
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_client_address_gets_its_own_larger_limit():
+    executor = HashExecutor(workers=8, max_per_key=2, key_limits={"ip": 4})
+    executor.start()
+    release = threading.Event()
+    try:
+        # Four accounts behind one address all get in; a fifth does not
+        running = [
+            asyncio.ensure_future(executor.submit(release.wait, keys=(f"user:{name}", "ip:10.0.0.1")))
+            for name in "abcd"
+        ]
+        await asyncio.sleep(0.05)
+        with pytest.raises(HashThrottled):
+            await executor.submit(release.wait, keys=("user:e", "ip:10.0.0.1"))
+
+        # One account is still held to max_per_key, whatever its addresses
+        running.append(asyncio.ensure_future(executor.submit(release.wait, keys=("user:a", "ip:10.0.0.2"))))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HashThrottled):
+            await executor.submit(release.wait, keys=("user:a", "ip:10.0.0.3"))
+
+        release.set()
+        assert all(await asyncio.gather(*running))
+    finally:
+        release.set()
+        executor.shutdown()
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app import services
+from app.jobs import JobRunner
+
+pytestmark = pytest.mark.anyio
+
+CODE = {"url": "https://example.com/listed", "fill_color": "#000000", "back_color": "#ffffff"}
+
+
+async def list_etag(client, headers: dict, query: str = "") -> str:
+    response = await client.get(f"/api/qr{query}", headers=headers)
+    assert response.status_code == 200
+    return response.headers["etag"]
+
+
+async def test_list_etag_moves_with_every_change(app, client, signup, monkeypatch):
+    headers = await signup("lister")
+    etags = [await list_etag(client, headers)]
+
+    assert (await client.post("/api/qr/save", json=CODE, headers=headers)).status_code == 200
+    etags.append(await list_etag(client, headers))
+
+    # A save made in the background moves it again once its render lands
+    runner = JobRunner(workers=1)
+    monkeypatch.setattr(services, "save_jobs", runner)
+    runner.start(services.process_save_job, services.fail_save_job)
+    try:
+        response = await client.post("/api/qr/save?async=true", json=CODE, headers=headers)
+        assert response.status_code == 202
+        status_url = response.json()["status_url"]
+        for _ in range(100):
+            if (await client.get(status_url, headers=headers)).json()["status"] != "pending":
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await runner.shutdown()
+    etags.append(await list_etag(client, headers))
+
+    code = (await client.get("/api/qr", headers=headers)).json()[0]
+    assert (await client.delete(f"/api/qr/{code['id']}", headers=headers)).status_code == 200
+    etags.append(await list_etag(client, headers))
+
+    assert len(set(etags)) == len(etags)
+
+
+async def test_unchanged_list_revalidates_without_a_body(client, signup):
+    headers = await signup("lister")
+    assert (await client.post("/api/qr/save", json=CODE, headers=headers)).status_code == 200
+    etag = await list_etag(client, headers)
+
+    response = await client.get("/api/qr", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Each page has its own validator
+    assert await list_etag(client, headers, "?limit=1") != etag
+
+    # Another user's changes leave this list's validator alone
+    other = await signup("other")
+    assert (await client.post("/api/qr/save", json=CODE, headers=other)).status_code == 200
+    assert await list_etag(client, headers) == etag
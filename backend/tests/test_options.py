@@ -0,0 +1,40 @@
+import pytest
+from pydantic import ValidationError
+
+from app.options import MAX_IMAGE_SIZE, QRCodeOptions
+
+pytestmark = pytest.mark.anyio
+
+COLORS = {"fill_color": "#000000", "back_color": "#ffffff"}
+
+
+def test_oversized_image_is_rejected():
+    with pytest.raises(ValidationError, match=f"over {MAX_IMAGE_SIZE} pixels"):
+        QRCodeOptions(url="https://example.com", box_size=50, border=20, version=40, **COLORS)
+
+
+def test_largest_box_size_is_allowed_for_small_codes():
+    options = QRCodeOptions(url="https://example.com", box_size=50, border=4, version=5, **COLORS)
+    assert (17 + 4 * options.version + 2 * options.border) * options.box_size <= MAX_IMAGE_SIZE
+
+
+async def test_create_rejects_oversized_image(client, signup):
+    headers = await signup("sizes")
+    response = await client.post(
+        "/api/qr/create",
+        json={"url": "https://example.com", "box_size": 50, "border": 20, "version": 40, **COLORS},
+        headers=headers,
+    )
+    assert response.status_code == 422
+
+
+async def test_render_rejects_url_too_long_for_the_box_size(client, signup):
+    # Passes validation as a small code, but the URL needs a version over 20
+    headers = await signup("sizes")
+    response = await client.post(
+        "/api/qr/create",
+        json={"url": "https://example.com/" + "a" * 1000, "box_size": 50, **COLORS},
+        headers=headers,
+    )
+    assert response.status_code == 422
+    assert f"over {MAX_IMAGE_SIZE} pixels" in response.json()["detail"]
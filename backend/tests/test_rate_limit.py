@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import rate_limit
+from app import services
+from app.rate_limit import Budget, RateLimited, RateLimiter
+
+pytestmark = pytest.mark.anyio
+
+CODE = {"url": "https://example.com/limited", "fill_color": "#000000", "back_color": "#ffffff"}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """The buckets' clock, moved on by hand."""
+    class Clock:
+        now = 1000.0
+
+        def advance(self, seconds: float) -> None:
+            self.now += seconds
+
+    clock = Clock()
+    # Only the module's own reference, so the event loop keeps the real clock
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+async def admitted(limiter: RateLimiter, requests: int, cost: float = 1) -> int:
+    """How many of requests in a row are let through before the first is limited."""
+    for count in range(requests):
+        try:
+            await limiter.check("render", "user", cost)
+        except RateLimited:
+            return count
+    return requests
+
+
+async def test_burst_is_admitted_then_limited(clock):
+    limiter = RateLimiter({"render": Budget(rate=2, burst=5)})
+    assert await admitted(limiter, 10) == 5
+    with pytest.raises(RateLimited) as limited:
+        await limiter.check("render", "user")
+    assert limited.value.budget == "render"
+    assert limited.value.retry_after == pytest.approx(0.5)
+    # Other keys have buckets of their own
+    await limiter.check("render", "other")
+
+
+async def test_bucket_refills_at_its_rate_up_to_the_burst(clock):
+    limiter = RateLimiter({"render": Budget(rate=2, burst=5)})
+    await admitted(limiter, 5)
+    clock.advance(1.5)
+    assert await admitted(limiter, 10) == 3
+    clock.advance(3600)
+    assert await admitted(limiter, 10) == 5
+
+
+async def test_request_above_the_burst_leaves_the_bucket_in_debt(clock):
+    limiter = RateLimiter({"render": Budget(rate=1, burst=4)})
+    await limiter.check("render", "user", cost=10)
+    with pytest.raises(RateLimited) as limited:
+        await limiter.check("render", "user")
+    # Six tokens owed, then one for this request
+    assert limited.value.retry_after == pytest.approx(7)
+
+
+async def test_unlimited_budget_and_failing_backend_let_requests_through(clock):
+    limiter = RateLimiter({"render": Budget(rate=0, burst=0)})
+    assert await admitted(limiter, 100) == 100
+
+    class Unreachable:
+        async def take(self, key, budget, cost):
+            raise ConnectionError("redis is down")
+
+    limiter = RateLimiter({"render": Budget(rate=1, burst=1)})
+    limiter.buckets = Unreachable()
+    assert await admitted(limiter, 3) == 3
+    assert limiter.errors == 3
+
+
+async def test_routes_answer_429_with_retry_after(app, client, signup, clock, monkeypatch):
+    headers = await signup("limited")
+    monkeypatch.setattr(services, "rate_limiter", RateLimiter({
+        "render": Budget(rate=0.25, burst=2),
+        "api": Budget(rate=0.5, burst=1),
+    }))
+
+    for _ in range(2):
+        assert (await client.post("/api/qr/create", json=CODE, headers=headers)).status_code == 200
+    response = await client.post("/api/qr/create", json=CODE, headers=headers)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "4"
+
+    assert (await client.get("/api/qr", headers=headers)).status_code == 200
+    response = await client.get("/api/qr", headers=headers)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "2"
+
+    # A batch takes a token per code
+    clock.advance(8)
+    response = await client.post("/api/qr/batch", json=[CODE] * 2, headers=headers)
+    assert response.status_code == 200
+    response = await client.post("/api/qr/batch", json=[CODE], headers=headers)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "4"
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.redirects import RedirectCache
+
+from benchmarks import sqlite_shim
+
+pytestmark = pytest.mark.anyio
+
+CODE = {"url": "https://example.com/landing", "fill_color": "#000000", "back_color": "#ffffff"}
+
+
+async def create_dynamic(client, headers) -> dict:
+    response = await client.post("/api/qr/dynamic", json=CODE, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_deleted_dynamic_code_stops_redirecting(client, signup):
+    headers = await signup("dynamic")
+    code = await create_dynamic(client, headers)
+    response = await client.get(f"/r/{code['slug']}")
+    assert response.status_code == 302
+    assert response.headers["location"] == CODE["url"]
+
+    assert (await client.delete(f"/api/qr/{code['id']}", headers=headers)).status_code == 200
+    assert (await client.get(f"/r/{code['slug']}")).status_code == 404
+
+
+async def test_bulk_deleted_dynamic_codes_stop_redirecting(client, signup):
+    headers = await signup("dynamic")
+    by_id = await create_dynamic(client, headers)
+    by_cutoff = await create_dynamic(client, headers)
+
+    response = await client.request("DELETE", "/api/qr", json={"ids": [by_id["id"]]}, headers=headers)
+    assert response.json()["deleted"] == 1
+    assert (await client.get(f"/r/{by_id['slug']}")).status_code == 404
+    assert (await client.get(f"/r/{by_cutoff['slug']}")).status_code == 302
+
+    response = await client.request(
+        "DELETE", "/api/qr", json={"created_before": "2999-01-01T00:00:00Z"}, headers=headers
+    )
+    assert response.json()["deleted"] == 1
+    assert (await client.get(f"/r/{by_cutoff['slug']}")).status_code == 404
+
+
+async def test_load_under_way_when_invalidated_is_not_cached():
+    cache = RedirectCache()
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def load(slug):
+        started.set()
+        await release.wait()
+        return "https://example.com/old", 7
+
+    lookup = asyncio.ensure_future(cache.get("abc", load))
+    await started.wait()
+    # Deleted by id while the load runs: which slug it had is not known yet
+    cache.invalidate_code(7)
+    release.set()
+    await lookup
+
+    async def load_deleted(slug):
+        return None
+
+    assert await cache.get("abc", load_deleted) is None
+
+
+async def test_cached_slug_is_dropped_by_its_code_id():
+    cache = RedirectCache()
+    cache.put("abc", "https://example.com/landing", 7)
+    cache.put("def", "https://example.com/other", 8)
+    cache.invalidate_code(7)
+    cache.invalidate_code(9)
+
+    async def load(slug):
+        return None
+
+    assert await cache.get("abc", load) is None
+    assert await cache.get("def", load) == "https://example.com/other"
+    assert cache.loads == 1
+
+
+async def test_delete_does_not_look_up_links(client, signup, monkeypatch):
+    headers = await signup("static")
+    assert (await client.post("/api/qr/save", json=CODE, headers=headers)).status_code == 200
+    code = (await client.get("/api/qr", headers=headers)).json()[0]
+
+    statements = []
+    execute = sqlite_shim.Cursor.execute
+
+    def recorded(self, sql, params=()):
+        statements.append(sql)
+        return execute(self, sql, params)
+
+    monkeypatch.setattr(sqlite_shim.Cursor, "execute", recorded)
+    assert (await client.delete(f"/api/qr/{code['id']}", headers=headers)).status_code == 200
+    assert not [sql for sql in statements if "qr_links" in sql]
+    assert [sql.split()[0] for sql in statements] == ["DELETE", "UPDATE"]
+
+
+async def test_updated_destination_is_followed_at_once(client, signup):
+    headers = await signup("dynamic")
+    code = await create_dynamic(client, headers)
+    assert (await client.get(f"/r/{code['slug']}")).headers["location"] == CODE["url"]
+
+    moved = "https://example.com/moved"
+    response = await client.put(f"/api/qr/dynamic/{code['slug']}", json={"url": moved}, headers=headers)
+    assert response.status_code == 200
+    assert (await client.get(f"/r/{code['slug']}")).headers["location"] == moved
+
+    # Loaded again with its code id, so deleting the code still drops it
+    assert (await client.delete(f"/api/qr/{code['id']}", headers=headers)).status_code == 200
+    assert (await client.get(f"/r/{code['slug']}")).status_code == 404
@@ -0,0 +1,52 @@
+import os
+
+from app.render_cache import RenderCache
+
+ENTRY = 1024
+
+
+def disk_usage(root: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(root) for name in names)
+
+
+def keys(count: int) -> list:
+    return [f"{i:02x}{'0' * 62}" for i in range(count)]
+
+
+def put(cache: RenderCache, key: str) -> None:
+    cache.put(key, bytes(ENTRY))
+    if cache._sweeper is not None:
+        cache._sweeper.join()
+
+
+def test_writes_keep_the_disk_tier_within_its_bound(tmp_path):
+    cache = RenderCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=10 * ENTRY)
+    for key in keys(30):
+        put(cache, key)
+        assert disk_usage(str(tmp_path)) <= 10 * ENTRY
+    assert cache.stats()["disk_evictions"] >= 20
+
+
+def test_sweep_deletes_the_least_recently_used_entries(tmp_path):
+    cache = RenderCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=100 * ENTRY)
+    written = keys(30)
+    for age, key in enumerate(written):
+        put(cache, key)
+        # Oldest first, a second apart, so the sweep order is known
+        os.utime(cache._disk_path(key), (1_000_000 + age, 1_000_000 + age))
+    # Read just now, so the most recently used of all
+    assert cache.get(written[5]) is not None
+
+    cache.disk_max_bytes = 10 * ENTRY
+    cache.sweep_disk()
+    assert disk_usage(str(tmp_path)) <= 9 * ENTRY
+    kept = [key for key in written if os.path.exists(cache._disk_path(key))]
+    assert kept == [written[5]] + written[22:]
+
+
+def test_disk_tier_under_its_bound_is_left_alone(tmp_path):
+    cache = RenderCache(disk_dir=str(tmp_path), disk_max_bytes=100 * ENTRY)
+    for key in keys(10):
+        put(cache, key)
+    assert disk_usage(str(tmp_path)) == 10 * ENTRY
+    assert cache.stats()["disk_evictions"] == 0
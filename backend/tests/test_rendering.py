@@ -0,0 +1,52 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app import styles
+from app.rendering import QRCodeOptions, render_qr_bytes, render_qr_image, render_qr_image_styled
+
+from benchmarks.bench_fast_render import TOLERANCE
+
+# Version 6 at the default box size: every sprite shape and all three eyes
+URL = "https://example.com/" + "x" * 80
+COLORS = {"fill_color": "#1a2b3c", "back_color": "#ffeedd"}
+
+
+def pixels(image: Image.Image) -> np.ndarray:
+    return np.asarray(image.convert("RGB"), dtype=np.int16)
+
+
+def max_diff(image: Image.Image, reference: Image.Image) -> int:
+    return int(np.abs(pixels(image) - pixels(reference)).max())
+
+
+@pytest.mark.parametrize("eye_style", list(styles.EYE_STYLES))
+@pytest.mark.parametrize("dot_style", list(styles.DOT_STYLES))
+def test_vectorized_renderer_matches_styled_renderer(dot_style, eye_style):
+    options = QRCodeOptions(url=URL, dot_style=dot_style, eye_style=eye_style, **COLORS)
+    reference = render_qr_image_styled(options)
+    image = render_qr_image(options)
+    assert image.size == reference.size
+    assert max_diff(image, reference) <= TOLERANCE
+
+
+@pytest.mark.parametrize("eye_style", ["square", "rounded"])
+@pytest.mark.parametrize("dot_style", ["square", "circle", "gapped"])
+def test_palette_image_has_the_colours_of_the_rgb_image(dot_style, eye_style):
+    options = QRCodeOptions(url=URL, dot_style=dot_style, eye_style=eye_style, **COLORS)
+    image = render_qr_image(options, palette=True)
+    assert image.mode == "P"
+    assert max_diff(image, render_qr_image(options)) == 0
+
+
+@pytest.mark.parametrize("format", ["png", "png-palette", "webp"])
+@pytest.mark.parametrize("dot_style", ["rounded", "vertical"])
+def test_encoded_image_matches_styled_renderer(dot_style, format):
+    options = QRCodeOptions(url=URL, dot_style=dot_style, eye_style="circle", format=format, **COLORS)
+    with Image.open(io.BytesIO(render_qr_bytes(options))) as decoded:
+        decoded.load()
+        # Lossless in every format, so exactly what was drawn
+        assert max_diff(decoded, render_qr_image(options)) == 0
+        assert max_diff(decoded, render_qr_image_styled(options)) <= TOLERANCE
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from app import queries, services
+from app.jobs import JobLeased, JobRunner
+from app.options import QRCodeOptions
+
+pytestmark = pytest.mark.anyio
+
+OPTIONS = QRCodeOptions(url="https://example.com/saved", fill_color="#000000", back_color="#ffffff")
+
+
+def fetch_job(conn, qr_id: int) -> dict:
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT status, attempts, claimed_at, error FROM qr_codes WHERE id = %s", (qr_id,))
+    return cursor.fetchone()
+
+
+async def pending_code(pool) -> int:
+    user_id = await pool.run(queries.insert_user, "saver", "saver@test.local", "x")
+    return await pool.run(queries.insert_pending_qr_code, user_id, OPTIONS)
+
+
+async def test_job_queued_twice_is_saved_once(app, pool, monkeypatch):
+    qr_id = await pending_code(pool)
+    # One attempt allowed: counting the duplicate as an attempt would fail the save
+    runner = JobRunner(workers=2, max_attempts=1, lease=0.5)
+    monkeypatch.setattr(services, "save_jobs", runner)
+    runner.start(services.process_save_job, services.fail_save_job)
+    try:
+        await runner.submit(qr_id)
+        await runner.submit(qr_id)
+        # Both runs end, the one that lost the claim possibly after a deferral
+        for _ in range(100):
+            if runner.completed == 2:
+                break
+            await asyncio.sleep(0.05)
+    finally:
+        await runner.shutdown()
+
+    job = await pool.run(fetch_job, qr_id)
+    assert job["status"] == "ready"
+    assert job["attempts"] == 1
+    assert runner.completed == 2
+    assert runner.failed == 0
+
+
+async def test_claim_is_exclusive_until_its_lease_runs_out(app, pool):
+    qr_id = await pending_code(pool)
+    render_options, attempts = await pool.run(queries.claim_qr_job, qr_id, 60)
+    assert QRCodeOptions.model_validate_json(render_options) == OPTIONS
+    assert attempts == 1
+
+    with pytest.raises(JobLeased):
+        await pool.run(queries.claim_qr_job, qr_id, 60)
+
+    # A run that died holding the claim: once its lease is over the code is claimed again
+    def expire(conn):
+        cursor = conn.cursor()
+        cursor.execute("UPDATE qr_codes SET claimed_at = %s WHERE id = %s", ("2000-01-01 00:00:00", qr_id))
+        conn.commit()
+
+    await pool.run(expire)
+    _, attempts = await pool.run(queries.claim_qr_job, qr_id, 60)
+    assert attempts == 2
+    assert (await pool.run(fetch_job, qr_id))["attempts"] == 2
+
+
+async def test_failure_is_recorded_once_the_claim_is_released(app, pool):
+    qr_id = await pending_code(pool)
+    _, attempts = await pool.run(queries.claim_qr_job, qr_id, 60)
+
+    # Not while the claim is held
+    await pool.run(queries.fail_qr_job, qr_id, "QR generation failed")
+    assert (await pool.run(fetch_job, qr_id))["status"] == "pending"
+
+    await pool.run(queries.release_qr_job, qr_id, attempts)
+    await pool.run(queries.fail_qr_job, qr_id, "QR generation failed")
+    job = await pool.run(fetch_job, qr_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "QR generation failed"
+
+
+async def test_workers_recovering_the_same_codes_render_each_once(app, pool, monkeypatch):
+    user_id = await pool.run(queries.insert_user, "saver", "saver@test.local", "x")
+    qr_ids = [await pool.run(queries.insert_pending_qr_code, user_id, OPTIONS) for _ in range(5)]
+    renders = []
+    render_image = services.render_image
+
+    async def counted_render(options, user_id=None):
+        renders.append(options.url)
+        return await render_image(options, user_id)
+
+    monkeypatch.setattr(services, "render_image", counted_render)
+    # As every worker process does at startup with the in-process queue; the
+    # lease outlasts any render, so only the duplicates are deferred
+    runners = [JobRunner(workers=2, max_attempts=1, lease=30) for _ in range(2)]
+    monkeypatch.setattr(services, "save_jobs", runners[0])
+    for runner in runners:
+        runner.start(services.process_save_job, services.fail_save_job)
+        await runner.recover(lambda: pool.run(queries.fetch_pending_qr_ids))
+    try:
+        for _ in range(200):
+            jobs = [await pool.run(fetch_job, qr_id) for qr_id in qr_ids]
+            if all(job["status"] != "pending" for job in jobs):
+                break
+            await asyncio.sleep(0.05)
+    finally:
+        for runner in runners:
+            await runner.shutdown()
+
+    assert [(job["status"], job["attempts"]) for job in jobs] == [("ready", 1)] * len(qr_ids)
+    assert len(renders) == len(qr_ids)
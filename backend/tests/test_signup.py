@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from app import services
+from app.routes.auth import SIGNUP_CONFLICTS
+
+pytestmark = pytest.mark.anyio
+
+RACERS = 8
+
+
+@pytest.fixture
+def racers(app, monkeypatch):
+    # Every racer is hashed at once rather than throttled per account
+    monkeypatch.setattr(services.hash_executor, "max_per_key", RACERS)
+
+
+def count_users(conn) -> int:
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM users")
+    return cursor.fetchone()[0]
+
+
+async def race(client, accounts: list) -> list:
+    return await asyncio.gather(*(
+        client.post("/api/signup", json={"username": username, "email": email, "password": "secret"})
+        for username, email in accounts
+    ))
+
+
+def outcome(responses: list) -> tuple:
+    created = [r for r in responses if r.status_code == 200]
+    conflicts = [r.json()["detail"] for r in responses if r.status_code == 400]
+    return created, conflicts
+
+
+@pytest.mark.parametrize("key, accounts", [
+    ("username", [("racer", f"racer{i}@test.local") for i in range(RACERS)]),
+    ("email", [(f"racer{i}", "racer@test.local") for i in range(RACERS)]),
+])
+async def test_concurrent_signups_create_one_account(client, pool, racers, key, accounts):
+    created, conflicts = outcome(await race(client, accounts))
+    assert len(created) == 1
+    assert conflicts == [SIGNUP_CONFLICTS[key]] * (RACERS - 1)
+    assert await pool.run(count_users) == 1
+
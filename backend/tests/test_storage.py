@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from app import queries
+from app.storage import FileStorage
+
+pytestmark = pytest.mark.anyio
+
+CODE = {"url": "https://example.com/stored", "fill_color": "#000000", "back_color": "#ffffff"}
+
+
+@pytest.fixture
+def files(app, tmp_path, monkeypatch):
+    storage = FileStorage(str(tmp_path / "images"))
+    monkeypatch.setattr(queries, "image_storage", storage)
+    return storage
+
+
+@pytest.mark.parametrize("fmt, media_type, extension", [
+    ("png", "image/png", "png"),
+    ("webp", "image/webp", "webp"),
+    ("svg", "image/svg+xml", "svg"),
+])
+async def test_file_is_named_by_its_format(client, signup, files, fmt, media_type, extension):
+    headers = await signup("files")
+    response = await client.post("/api/qr/save", json={**CODE, "format": fmt}, headers=headers)
+    assert response.status_code == 200, response.text
+
+    code = (await client.get("/api/qr", headers=headers)).json()[0]
+    response = await client.get(f"/api/qr/{code['id']}/image", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == media_type
+
+    digest = response.headers["etag"].removeprefix("W/").strip('"')
+    path = files.path_for(digest, media_type)
+    assert path.endswith(f"{digest}.{extension}")
+    with open(path, "rb") as f:
+        assert f.read() == response.content
+
+
+def test_rows_without_a_type_load_from_png_files(tmp_path):
+    storage = FileStorage(str(tmp_path))
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 16
+    stored = storage.store(png)
+    assert stored.image_type == "image/png"
+    assert os.path.exists(storage.path_for(stored.image_hash))
+    assert storage.load(None, stored.image_hash) == png
@@ -25,5 +25,68 @@ ALTER TABLE qr_codes ADD COLUMN qr_image TEXT;
 -- Add eye_style column to qr_codes table
 ALTER TABLE qr_codes ADD COLUMN eye_style VARCHAR(20) DEFAULT 'square';
 
+-- Store QR images as raw PNG bytes instead of base64 TEXT (about 25% smaller).
+-- Existing rows are decoded in place; image_hash is the sha256 of the PNG, used
+-- as the ETag and as the file name when images are kept on disk (QR_STORAGE=file).
+ALTER TABLE qr_codes ADD COLUMN qr_image_blob MEDIUMBLOB, ADD COLUMN image_hash CHAR(64);
+UPDATE qr_codes
+SET qr_image_blob = FROM_BASE64(qr_image),
+    image_hash = SHA2(FROM_BASE64(qr_image), 256)
+WHERE qr_image IS NOT NULL;
+ALTER TABLE qr_codes DROP COLUMN qr_image;
+ALTER TABLE qr_codes RENAME COLUMN qr_image_blob TO qr_image;
+
+-- Media type of the stored image (PNG, WebP or SVG), which also gives the
+-- file extension with QR_STORAGE=file. NULL for rows stored before it was
+-- recorded, which are all PNG.
+ALTER TABLE qr_codes ADD COLUMN image_type VARCHAR(32) NULL;
+
+-- Saves made with ?async=true insert a 'pending' row first; a save worker
+-- renders the image from render_options and marks it 'ready', or 'failed'
+-- with an error once retries run out. Pending rows are re-queued on startup.
+-- A worker claims a row by setting claimed_at (its lease, SAVE_LEASE
+-- seconds) and counting an attempt, so a row queued twice is rendered once.
+ALTER TABLE qr_codes
+    ADD COLUMN status VARCHAR(10) NOT NULL DEFAULT 'ready',
+    ADD COLUMN render_options TEXT NULL,
+    ADD COLUMN attempts INT NOT NULL DEFAULT 0,
+    ADD COLUMN claimed_at TIMESTAMP NULL,
+    ADD COLUMN error VARCHAR(255) NULL;
+CREATE INDEX idx_qr_codes_status ON qr_codes (status);
+
+-- Keyset pagination of a user's codes (newest first) reads this index in order
+-- instead of filesorting every row of the user. The list ETag counts pending
+-- and failed codes; with status in the index that query reads the index alone.
+-- Created once, after status exists: MySQL may adopt it for the user_id foreign
+-- key, after which it cannot be dropped (ERROR 1553).
+CREATE INDEX idx_qr_codes_user_created ON qr_codes (user_id, created_at, id, status);
+
+-- Dynamic codes encode a short /r/{slug} URL instead of their destination,
+-- which lives here and can change without re-rendering the image. scans is
+-- advanced by the app in batched increments.
+CREATE TABLE IF NOT EXISTS qr_links (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    slug VARCHAR(32) NOT NULL UNIQUE,
+    user_id INT NOT NULL,
+    qr_code_id INT NOT NULL,
+    destination TEXT NOT NULL,
+    scans BIGINT NOT NULL DEFAULT 0,
+    last_scan_at TIMESTAMP NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE,
+    FOREIGN KEY (qr_code_id) REFERENCES qr_codes(id)
+        ON DELETE CASCADE
+);
+
+-- Version of each user's code list, moved on whenever one of their codes is
+-- inserted, deleted or changes status. The /api/qr ETag is derived from it,
+-- so validating a page is a primary key read rather than an aggregate over
+-- every code the user has.
+ALTER TABLE users
+    ADD COLUMN qr_version INT NOT NULL DEFAULT 0,
+    ADD COLUMN qr_changed_at TIMESTAMP NULL;
+
 -- Remove or update the initial insert since we need a proper password hash
--- It's better to create users through the application interface
\ No newline at end of file
+-- It's better to create users through the application interface
@@ -3,27 +3,67 @@ import Sidebar from './Sidebar';
 import './ManageQR.css';
 import { FaDownload, FaTrash } from 'react-icons/fa';
 
+const API_ORIGIN = 'http://localhost:8000';
+
+// Fetch a QR image with the auth header (img tags cannot send it).
+// The browser's HTTP cache revalidates it with the image ETag.
+const fetchQRImage = async (imageUrl) => {
+  const response = await fetch(`${API_ORIGIN}${imageUrl}`, {
+    headers: {
+      'Authorization': `Bearer ${localStorage.getItem('token')}`
+    }
+  });
+  if (!response.ok) throw new Error('Failed to fetch QR image');
+  return response.blob();
+};
+
+// Renders a QR image served by /api/qr/{id}/image
+function QRImage({ imageUrl, alt }) {
+  const [src, setSrc] = useState(null);
+
+  useEffect(() => {
+    let objectUrl = null;
+    let cancelled = false;
+    fetchQRImage(imageUrl)
+      .then(blob => {
+        if (cancelled) return;
+        objectUrl = URL.createObjectURL(blob);
+        setSrc(objectUrl);
+      })
+      .catch(() => {});
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [imageUrl]);
+
+  return src ? <img src={src} alt={alt} className="qr-image" /> : <div className="qr-image" />;
+}
+
 function ManageQR({ onLogout }) {
   // State management for sidebar and QR codes
   const [isSidebarOpen, setIsSidebarOpen] = useState(false);
   const [qrCodes, setQrCodes] = useState([]);
   const [error, setError] = useState('');
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
 
   // Get username from localStorage
   const username = localStorage.getItem("username") || "User";
 
-  // Fetch user's QR codes on component mount
-  const fetchQRCodes = async () => {
+  // Fetch a page of the user's QR codes; without a cursor the list starts over
+  const fetchQRCodes = async (cursor = null) => {
     try {
-      const response = await fetch('http://localhost:8000/api/qr', {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`${API_ORIGIN}/api/qr${query}`, {
         headers: {
           'Authorization': `Bearer ${localStorage.getItem('token')}`
         }
       });
       if (!response.ok) throw new Error('Failed to fetch QR codes');
       const data = await response.json();
-      setQrCodes(data);
+      setQrCodes(previous => cursor ? [...previous, ...data] : data);
+      setNextCursor(response.headers.get('X-Next-Cursor'));
     } catch (err) {
       setError(err.message);
     } finally {
@@ -45,7 +85,7 @@ function ManageQR({ onLogout }) {
     }
 
     try {
-      const response = await fetch(`http://localhost:8000/api/qr/${qrId}`, {
+      const response = await fetch(`${API_ORIGIN}/api/qr/${qrId}`, {
         method: 'DELETE',
         headers: {
           'Authorization': `Bearer ${localStorage.getItem('token')}`
@@ -63,24 +103,31 @@ function ManageQR({ onLogout }) {
     }
   };
 
-  // Updated handleDownload function to ensure proper data URI is used for the QR code image
-  const handleDownload = (qrCode, url) => {
-    // Check if the qrCode string already contains the data URI prefix
-    // If not, prepend it.
-    const dataUri = qrCode.startsWith('data:') 
-      ? qrCode 
-      : `data:image/png;base64,${qrCode}`;
+  // Download the QR code image from its image endpoint
+  const handleDownload = async (imageUrl, url) => {
+    let objectUrl;
+    let extension;
+    try {
+      const blob = await fetchQRImage(imageUrl);
+      // Saved codes may be PNG, WebP or SVG
+      extension = { 'image/webp': 'webp', 'image/svg+xml': 'svg' }[blob.type] || 'png';
+      objectUrl = URL.createObjectURL(blob);
+    } catch (err) {
+      setError(err.message);
+      return;
+    }
     
     // Create a temporary link element for triggering the download
     const link = document.createElement('a');
-    link.href = dataUri;
-    // Encode url to safely use it in the file name, and set file extension to .png
-    link.download = `qr-code-${encodeURIComponent(url)}.png`;
+    link.href = objectUrl;
+    // Encode url to safely use it in the file name, and set the image's file extension
+    link.download = `qr-code-${encodeURIComponent(url)}.${extension}`;
     
     // Append the link, trigger click, and then remove the link from the document
     document.body.appendChild(link);
     link.click();
     document.body.removeChild(link);
+    URL.revokeObjectURL(objectUrl);
   };
 
   return (
@@ -114,13 +161,13 @@ function ManageQR({ onLogout }) {
             {qrCodes.length > 0 ? (
               qrCodes.map(qr => (
                 <div key={qr.id} className="qr-code-item">
-                  <img src={`data:image/png;base64,${qr.qr_image}`} alt={`QR Code for ${qr.url}`} className="qr-image" />
+                  <QRImage imageUrl={qr.image_url} alt={`QR Code for ${qr.url}`} />
                   <div className="qr-info">
                     <p className="qr-url">Link: <a href={qr.url} target="_blank" rel="noopener noreferrer">{qr.url}</a></p>
                     <p className="qr-date">Created: {formatDate(qr.created_at)}</p>
                     <div className="button-group">
                       <button 
-                        onClick={() => handleDownload(qr.qr_image, qr.url)}
+                        onClick={() => handleDownload(qr.image_url, qr.url)}
                         className="action-button download-button"
                         title="Download QR Code"
                       >
@@ -140,6 +187,14 @@ function ManageQR({ onLogout }) {
             ) : (
               <p>No QR codes generated yet.</p>
             )}
+            {nextCursor && (
+              <button
+                onClick={() => fetchQRCodes(nextCursor)}
+                className="action-button load-more-button"
+              >
+                Load more
+              </button>
+            )}
           </div>
         )}
       </div>